@@ -8,6 +8,38 @@ const authHeaders = () => {
   };
 };
 
+// List endpoints return one page at a time and send the next page's cursor in
+// the X-Next-Cursor header; follow it until the whole list is loaded.
+const fetchAllPages = async (url: string, headers: HeadersInit) => {
+  const items = [];
+  let cursor: string | null = null;
+
+  do {
+    const params = new URLSearchParams({ limit: "100" });
+    if (cursor) params.set("cursor", cursor);
+    const response = await fetch(`${url}${url.includes("?") ? "&" : "?"}${params}`, { headers });
+
+    const contentType = response.headers.get("content-type");
+    let responseData;
+
+    if (contentType && contentType.includes("application/json")) {
+      responseData = await response.json();
+    } else {
+      const text = await response.text();
+      throw new Error(`Non-JSON response: ${text.substring(0, 80)}...`);
+    }
+
+    if (!response.ok) {
+      throw { status: response.status, message: responseData?.error || "Request failed" };
+    }
+
+    items.push(...responseData);
+    cursor = response.headers.get("X-Next-Cursor");
+  } while (cursor);
+
+  return items;
+};
+
 export const api = {
   // ==================== AUTH ROUTES ====================
   async register(data: {
@@ -184,23 +216,7 @@ export const api = {
     console.log("🚀 Final headers sent:", headers);
 
     const url = category ? `${API_BASE}/product/list?category=${category}` : `${API_BASE}/product/list`;
-    const response = await fetch(url, { headers });
-
-    const contentType = response.headers.get("content-type");
-    let responseData;
-
-    if (contentType && contentType.includes("application/json")) {
-      responseData = await response.json();
-    } else {
-      const text = await response.text();
-      throw new Error(`Non-JSON response: ${text.substring(0, 80)}...`);
-    }
-
-    if (!response.ok) {
-      throw { status: response.status, message: responseData?.error || "Request failed" };
-    }
-
-    return responseData;
+    return fetchAllPages(url, headers);
   },
 
   async getProduct(productId: number) {
@@ -233,23 +249,7 @@ export const api = {
     const headers = authHeaders();
     console.log("🚀 Final headers sent:", headers);
 
-    const response = await fetch(`${API_BASE}/product/orders/mine`, { headers });
-
-    const contentType = response.headers.get("content-type");
-    let responseData;
-
-    if (contentType && contentType.includes("application/json")) {
-      responseData = await response.json();
-    } else {
-      const text = await response.text();
-      throw new Error(`Non-JSON response: ${text.substring(0, 80)}...`);
-    }
-
-    if (!response.ok) {
-      throw { status: response.status, message: responseData?.error || "Request failed" };
-    }
-
-    return responseData;
+    return fetchAllPages(`${API_BASE}/product/orders/mine`, headers);
   },
 
   async getOrder(orderId: number) {
@@ -78,6 +78,56 @@ from celery import Celery
 
 celery = Celery(__name__) 
 
+
+def init_celery(app):
+    """Point the shared Celery instance at this app's config and run tasks in its context."""
+    # Publishing gives up after one retry of CELERY_BROKER_TIMEOUT each, instead of
+    # kombu's default of retrying (or waiting on a silent socket) indefinitely. Tasks
+    # are fire-and-forget, so .delay() doesn't subscribe to a result in Redis either.
+    timeout = app.config["CELERY_BROKER_TIMEOUT"]
+    celery.conf.update(
+        broker_url=app.config["CELERY_BROKER_URL"],
+        result_backend=app.config["CELERY_RESULT_BACKEND"],
+        task_always_eager=app.config["CELERY_TASK_ALWAYS_EAGER"],
+        broker_connection_timeout=timeout,
+        broker_transport_options={"socket_connect_timeout": timeout, "socket_timeout": timeout, "max_retries": 1},
+        task_publish_retry_policy={"max_retries": 1, "interval_start": 0, "interval_step": 0.2, "interval_max": 0.2},
+        task_ignore_result=True,
+        beat_schedule={
+            "reconcile-platform-metrics": {
+                "task": "app.tasks.reconcile_platform_metrics",
+                "schedule": app.config["PLATFORM_METRICS_RECONCILE_SECONDS"],
+            },
+            "reconcile-block-supply": {
+                "task": "app.tasks.reconcile_block_supply",
+                "schedule": app.config["SUPPLY_RECONCILE_SECONDS"],
+            },
+            "sweep-paystack-events": {
+                "task": "app.tasks.process_paystack_events",
+                "schedule": app.config["PAYSTACK_EVENT_SWEEP_SECONDS"],
+            },
+            "resume-stalled-withdrawals": {
+                "task": "app.tasks.resume_stalled_withdrawals",
+                "schedule": app.config["WITHDRAWAL_SWEEP_SECONDS"],
+            },
+            "purge-revoked-tokens": {
+                "task": "app.tasks.purge_revoked_tokens",
+                "schedule": app.config["REVOKED_TOKEN_PURGE_SECONDS"],
+            },
+            "resume-stalled-account-provisioning": {
+                "task": "app.tasks.resume_stalled_account_provisioning",
+                "schedule": app.config["ACCOUNT_PROVISION_SWEEP_SECONDS"],
+            },
+        },
+    )
+
+    class ContextTask(celery.Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery.Task = ContextTask
+
 import os, random, string, subprocess, uuid
 
 def convert_to_webm(input_file, upload_folder):
@@ -144,7 +194,8 @@ def create_app(config_class=Config):
 
     #CORS(app, resources={r"/*": {"origins": ["*", "http://localhost:8080/", "http://127.0.0.1:5000",]}}, supports_credentials=True)
     #CORS(app, supports_credentials=True)
-    CORS(app, origins=["http://localhost:8080"], supports_credentials=True)
+    # Paged list endpoints send the next page's cursor in X-Next-Cursor
+    CORS(app, origins=["http://localhost:8080"], supports_credentials=True, expose_headers=["X-Next-Cursor"])
     app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 
@@ -195,7 +246,13 @@ def create_app(config_class=Config):
     login.init_app(app)
     moment.init_app(app)
     csrf.init_app(app) 
-    socketio.init_app(app, cors_allowed_origins="*")
+    # Workers share emits through Redis; with no queue configured they stay in-process
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        message_queue=app.config.get("SOCKETIO_MESSAGE_QUEUE") or None,
+    )
+    init_celery(app)
 
     
 
@@ -209,11 +266,6 @@ def create_app(config_class=Config):
     
 
     
-    @app.before_request
-    def log_all_requests():
-        print("🛰️  Incoming:", request.path)
-
-    
     @app.before_request
     def before_request():
         if not request.is_secure and not app.debug:
@@ -282,7 +334,19 @@ def create_app(config_class=Config):
     from app.admin.views import admin_bp
     from app.exchange.views import exchange_bp
     from app.ledger.views import ledger_bp
-    from app.auth.views import auth_bp
+    from app.auth.views import auth_bp, principal_cache
+
+    principal_cache.configure(
+        maxsize=app.config.get("PRINCIPAL_CACHE_SIZE"),
+        ttl=app.config.get("PRINCIPAL_CACHE_TTL"),
+    )
+    from app.auth.revocation import revocations
+    revocations.configure(
+        capacity=app.config.get("TOKEN_REVOCATION_CAPACITY"),
+        error_rate=app.config.get("TOKEN_REVOCATION_ERROR_RATE"),
+        sync_seconds=app.config.get("TOKEN_REVOCATION_SYNC_SECONDS"),
+        rebuild_seconds=app.config.get("TOKEN_REVOCATION_REBUILD_SECONDS"),
+    )
 
     @app.errorhandler(404)
     def not_found(e):
@@ -301,11 +365,22 @@ def create_app(config_class=Config):
     app.register_blueprint(admin_bp, url_prefix="/api")
 
     from app.paystack import bp as paystack_bp
+    from app.paystack.client import paystack
     app.register_blueprint(paystack_bp, url_prefix="/api")
+    paystack.init_app(app)
+    from app.paystack import lookups
+    lookups.init_app(app)
 
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
 
+    from app import tasks  # registers Celery tasks
+    from app import realtime  # registers SocketIO handlers and post-commit pushes
+    from app import telemetry  # JSON request logs, latency/query histograms and /metrics
+    telemetry.init_app(app)
+    from app import profiler  # opt-in per-request SQL profile, N+1 flags and query budgets
+    profiler.init_app(app)
+
 
     return app
 
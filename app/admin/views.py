@@ -2,8 +2,12 @@
 
 from flask import Blueprint, jsonify, request
 from decimal import Decimal
-from app.models import db, User, Wallet, Category, Transaction
-from app.auth.views import token_required
+from app.models import db, User, Wallet, Category, Transaction, LedgerEntryType
+from app.auth.views import token_required, invalidate_principal, principal_cache
+from app.ledger import platform, supply
+from app.pagination import parse_limit, iter_csv, iter_json_object, iter_ndjson, streamed_json, CursorError
+from app.product import escrow
+from app.wallet.service import credit_blocks, debit_blocks, WalletError
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -88,24 +92,27 @@ def adjust_block_balance(user):
     action = data.get("action")
 
     target_user = User.query.get(user_id)
-    wallet = Wallet.query.filter_by(user_id=user_id).first()
-
-    if not target_user or not wallet:
+    if not target_user:
         return jsonify({"error": "User not found"}), 404
+    if amount <= 0:
+        return jsonify({"error": "Invalid amount"}), 400
 
-    with db.session.begin():
+    reason = f"Admin adjustment by user {user.id}"
+    try:
         if action == "add":
-            wallet.block_balance += amount
+            new_balance = credit_blocks(user_id, amount, reason, LedgerEntryType.ALLOCATION)
         elif action == "deduct":
-            if wallet.block_balance < amount:
-                return jsonify({"error": "Insufficient block balance"}), 400
-            wallet.block_balance -= amount
+            new_balance = debit_blocks(user_id, amount, reason, LedgerEntryType.ALLOCATION)
         else:
             return jsonify({"error": "Invalid action"}), 400
+    except WalletError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    db.session.commit()
 
     return jsonify({
         "message": f"Wallet updated successfully for user {user_id}",
-        "new_balance": str(wallet.block_balance)
+        "new_balance": str(new_balance)
     })
 
 
@@ -134,6 +141,7 @@ def freeze_user(user):
 
     target_user.is_frozen = freeze
     db.session.commit()
+    invalidate_principal(target_user.id)
 
     status = "frozen" if freeze else "unfrozen"
     return jsonify({"message": f"User {target_user.name} has been {status}"}), 200
@@ -147,34 +155,37 @@ def freeze_user(user):
 @admin_required
 def get_escrow_summary(user):
     """
-    Returns total escrow funds per seller and overall escrow balance.
+    Returns escrow funds per seller, largest balance first, and the overall
+    escrow balance, from the seller_escrow rollup.
+    Query params:
+      - limit, cursor: pages of sellers (pass next_cursor back as ?cursor=)
+      - include_empty=1: also list sellers with nothing currently held
+      - format=csv|ndjson: stream every seller instead of one page (finance exports)
     """
-    escrow_data = (
-        db.session.query(
-            Transaction.seller_id,
-            db.func.sum(Transaction.amount).label("total_held")
+    export = request.args.get("format")
+    if export == "csv":
+        return streamed_json(
+            iter_csv(escrow.iter_escrow(request.args), escrow.EXPORT_FIELDS, escrow.serialize_escrow),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=escrow_summary.csv"},
         )
-        .filter(Transaction.status == "escrow")
-        .group_by(Transaction.seller_id)
-        .all()
-    )
-
-    results = []
-    total_escrow = Decimal("0")
-
-    for record in escrow_data:
-        seller = User.query.get(record.seller_id)
-        results.append({
-            "seller_id": record.seller_id,
-            "seller_name": seller.name if seller else "Unknown",
-            "escrow_balance": str(record.total_held)
-        })
-        total_escrow += record.total_held or Decimal("0")
+    if export == "ndjson":
+        return streamed_json(
+            iter_ndjson(escrow.iter_escrow(request.args), escrow.serialize_escrow),
+            mimetype="application/x-ndjson",
+        )
+    if export not in (None, "", "json"):
+        return jsonify({"error": "format must be json, csv or ndjson"}), 400
 
-    return jsonify({
-        "escrow_summary": results,
-        "total_escrow": str(total_escrow)
-    })
+    try:
+        rows, next_cursor = escrow.query_escrow_page(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return streamed_json(iter_json_object(
+        "escrow_summary", rows, escrow.serialize_escrow,
+        next_cursor=next_cursor, **escrow.escrow_totals()
+    ))
 
 
 # -----------------------------------
@@ -185,19 +196,52 @@ def get_escrow_summary(user):
 @admin_required
 def get_platform_stats(user):
     """
-    Returns platform user and transaction metrics.
+    Returns platform user and transaction metrics from the platform_metrics rollup.
+    """
+    metrics = platform.get_platform_metrics()
+    count = lambda name: int(metrics.get(name, 0))
+
+    return jsonify({
+        "total_users": count(platform.TOTAL_USERS),
+        "total_businesses": count(platform.users_metric("venture")),
+        "total_companies": count(platform.users_metric("company")),
+        "total_transactions": count(platform.TOTAL_TRANSACTIONS),
+        "active_wallets": count(platform.ACTIVE_WALLETS)
+    })
+
+
+# -----------------------------------
+# Principal cache counters
+# -----------------------------------
+@admin_bp.route("/principal_cache", methods=["GET"])
+@token_required
+@admin_required
+def get_principal_cache_stats(user):
+    """
+    Returns this worker's token principal cache size and hit/miss counters.
     """
-    total_users = User.query.count()
-    total_businesses = User.query.filter_by(role="business").count()
-    total_companies = User.query.filter_by(role="company").count()
-    total_transactions = Transaction.query.count()
+    return jsonify(principal_cache.stats())
+
 
-    active_wallets = db.session.query(db.func.count(Wallet.id)).filter(Wallet.block_balance > 0).scalar()
+# -----------------------------------
+# Block supply reconciliation
+# -----------------------------------
+@admin_bp.route("/supply_reconciliation", methods=["GET"])
+@token_required
+@admin_required
+def get_supply_reconciliation(user):
+    """
+    Returns the supply reconciler's checkpoint and the wallets that disagree with
+    their ledger sum, largest drift first. ?limit= caps the wallet list.
+    """
+    try:
+        limit = parse_limit(request.args.get("limit"))
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
 
+    checkpoint = supply.get_supply_status()
+    supply.publish_metrics(checkpoint)
     return jsonify({
-        "total_users": total_users,
-        "total_businesses": total_businesses,
-        "total_companies": total_companies,
-        "total_transactions": total_transactions,
-        "active_wallets": active_wallets
+        "checkpoint": checkpoint.to_dict(),
+        "drifting_wallets": [b.to_dict() for b in supply.drifting_wallets(limit)],
     })
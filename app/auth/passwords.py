@@ -0,0 +1,227 @@
+# app/auth/passwords.py
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash, gen_salt
+
+try:  # optional: pip install argon2-cffi
+    import argon2
+except ImportError:  # pragma: no cover - depends on the deployment
+    argon2 = None
+
+
+class PasswordHasherError(ValueError):
+    """The configured hasher is unknown or not installed."""
+
+
+# -------------------------------------------------
+# Hashers
+# -------------------------------------------------
+# Each hasher writes hashes that identify their own algorithm and cost, so any
+# stored hash can still be verified after the configured hasher changes, and
+# needs_rehash() can tell which ones were made with outdated parameters.
+
+class PBKDF2Hasher:
+    """werkzeug-compatible "pbkdf2:sha256:<iterations>$salt$hex" hashes."""
+    prefix = "pbkdf2:"
+
+    def __init__(self, iterations=600_000, digest="sha256"):
+        self.iterations = iterations
+        self.digest = digest
+        self.method = f"pbkdf2:{digest}:{iterations}"
+
+    def hash(self, password):
+        salt = gen_salt(16)
+        value = hashlib.pbkdf2_hmac(self.digest, password.encode(), salt.encode(), self.iterations).hex()
+        return f"{self.method}${salt}${value}"
+
+    def verify(self, stored, password):
+        return check_password_hash(stored, password)
+
+    def needs_rehash(self, stored):
+        return stored.split("$", 1)[0] != self.method
+
+
+class ScryptHasher:
+    """werkzeug-compatible "scrypt:<n>:<r>:<p>$salt$hex" hashes."""
+    prefix = "scrypt:"
+
+    def __init__(self, n=2 ** 15, r=8, p=1):
+        self.n, self.r, self.p = n, r, p
+        self.method = f"scrypt:{n}:{r}:{p}"
+
+    def hash(self, password):
+        salt = gen_salt(16)
+        value = hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=self.n, r=self.r, p=self.p,
+            maxmem=132 * self.n * self.r * self.p,
+        ).hex()
+        return f"{self.method}${salt}${value}"
+
+    def verify(self, stored, password):
+        return check_password_hash(stored, password)
+
+    def needs_rehash(self, stored):
+        return stored.split("$", 1)[0] != self.method
+
+
+class Argon2Hasher:
+    """Standard "$argon2id$..." hashes via argon2-cffi."""
+    prefix = "$argon2"
+
+    def __init__(self, time_cost=3, memory_cost=65536, parallelism=1):
+        if argon2 is None:
+            raise PasswordHasherError("argon2 hashing needs the argon2-cffi package")
+        self._hasher = argon2.PasswordHasher(
+            time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism,
+        )
+
+    def hash(self, password):
+        return self._hasher.hash(password)
+
+    def verify(self, stored, password):
+        try:
+            return self._hasher.verify(stored, password)
+        except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+            return False
+
+    def needs_rehash(self, stored):
+        return self._hasher.check_needs_rehash(stored)
+
+
+def _build_hasher(config, name):
+    if name == "pbkdf2":
+        return PBKDF2Hasher(iterations=config["PASSWORD_PBKDF2_ITERATIONS"])
+    if name == "scrypt":
+        return ScryptHasher(
+            n=config["PASSWORD_SCRYPT_N"], r=config["PASSWORD_SCRYPT_R"], p=config["PASSWORD_SCRYPT_P"],
+        )
+    if name == "argon2":
+        return Argon2Hasher(
+            time_cost=config["PASSWORD_ARGON2_TIME_COST"],
+            memory_cost=config["PASSWORD_ARGON2_MEMORY_KIB"],
+            parallelism=config["PASSWORD_ARGON2_PARALLELISM"],
+        )
+    raise PasswordHasherError(f"Unknown password hasher {name!r}")
+
+
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def get_hasher(name=None):
+    """The hasher for `name` (default: PASSWORD_HASHER) with this app's cost settings, built once."""
+    config = current_app.config
+    name = name or config["PASSWORD_HASHER"]
+    key = (current_app.import_name, name)
+    with _hashers_lock:
+        hasher = _hashers.get(key)
+        if hasher is None:
+            hasher = _hashers[key] = _build_hasher(config, name)
+    return hasher
+
+
+def _hasher_for(stored):
+    """The hasher family that wrote `stored`, or None if it is not a hash we know."""
+    for name, cls in (("pbkdf2", PBKDF2Hasher), ("scrypt", ScryptHasher), ("argon2", Argon2Hasher)):
+        if stored.startswith(cls.prefix):
+            return get_hasher(name)
+    return None
+
+
+# -------------------------------------------------
+# Offloading
+# -------------------------------------------------
+# Hashing releases the GIL (hashlib and argon2-cffi both do), so a small thread
+# pool lets a threaded worker keep serving other requests. The pool is bounded
+# by PASSWORD_HASH_WORKERS, which also caps how many cores a burst of logins can
+# take from one worker; 0 hashes on the request thread.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    workers = current_app.config["PASSWORD_HASH_WORKERS"]
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    return _pool
+
+
+def _run(fn, *args):
+    pool = _executor()
+    if pool is None:
+        return fn(*args)
+    return pool.submit(fn, *args).result()
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+
+def hash_password(password):
+    """Hash with the configured hasher and cost parameters."""
+    return _run(get_hasher().hash, password)
+
+
+def verify_password(stored, password):
+    """
+    Check `password` against a stored hash from any supported hasher.
+    Unknown formats (and missing hashes) never verify.
+    """
+    hasher = _hasher_for(stored or "")
+    if hasher is None:
+        return False
+    return _run(hasher.verify, stored, password)
+
+
+def needs_rehash(stored):
+    """True if `stored` was not made with the configured hasher and parameters."""
+    hasher = get_hasher()
+    return not stored.startswith(hasher.prefix) or hasher.needs_rehash(stored)
+
+
+def verify_and_update(stored, password):
+    """
+    Verify, and if the hash is outdated return a fresh one to store.
+    Returns (valid, new_hash_or_None); the caller saves the new hash.
+    """
+    if not verify_password(stored, password):
+        return False, None
+    if needs_rehash(stored):
+        return True, hash_password(password)
+    return True, None
+
+
+def benchmark(name=None, seconds=2.0, threads=1):
+    """
+    Hashes/second for `name` (default: the configured hasher) using `threads`
+    concurrent threads for about `seconds`. Used to size workers.
+    """
+    hasher = get_hasher(name)
+    deadline = time.perf_counter() + seconds
+    counts = [0] * threads
+    password = os.urandom(12).hex()
+
+    def work(slot):
+        while time.perf_counter() < deadline:
+            hasher.hash(password)
+            counts[slot] += 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=work, args=(slot,)) for slot in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    return sum(counts) / elapsed
@@ -0,0 +1,187 @@
+# app/auth/revocation.py
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app.metrics import Counter, Gauge
+from app.models import db, RevokedToken
+
+revocation_lookups = Counter(
+    "auth_revocation_lookups_total",
+    "Token revocation checks that reached the database after a Bloom filter hit.",
+    ("outcome",),
+)
+revocation_filter_size = Gauge(
+    "auth_revocation_filter_entries",
+    "Revoked token ids loaded into this worker's Bloom filter.",
+)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings: no false negatives, false positives
+    at about `error_rate` once `capacity` items are in. Uses double hashing of
+    one blake2b digest for the k bit positions.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Per-worker view of revoked_tokens for token_required.
+
+    Every check is a Bloom filter lookup; only a filter hit is confirmed
+    against the table by primary key, so an unrevoked token costs no query.
+    The filter is topped up from rows revoked since the last sync at most
+    every `sync_seconds` (an indexed range read, re-reading `overlap_seconds`
+    to catch rows committed late), and rebuilt from the unexpired rows every
+    `rebuild_seconds` so expired revocations drop out. Revocations made by this
+    worker are added immediately; other workers see them within `sync_seconds`.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001, sync_seconds=5,
+                 rebuild_seconds=3600, overlap_seconds=60):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.overlap_seconds = overlap_seconds
+        self._lock = threading.Lock()
+        self._filter = None
+        self._synced_at = 0
+        self._rebuilt_at = 0
+        self._watermark = None
+
+    def configure(self, capacity=None, error_rate=None, sync_seconds=None, rebuild_seconds=None):
+        """Apply config values once the Flask app is available."""
+        if capacity is not None:
+            self.capacity = capacity
+        if error_rate is not None:
+            self.error_rate = error_rate
+        if sync_seconds is not None:
+            self.sync_seconds = sync_seconds
+        if rebuild_seconds is not None:
+            self.rebuild_seconds = rebuild_seconds
+        with self._lock:
+            self._filter = None
+
+    def _rebuild(self, now):
+        rows = db.session.query(RevokedToken.jti, RevokedToken.revoked_at).filter(
+            RevokedToken.expires_at > datetime.utcnow()
+        ).all()
+        # Leave headroom so the error rate holds until the next rebuild
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for jti, _ in rows:
+            bloom.add(jti)
+        self._filter = bloom
+        self._watermark = max((revoked_at for _, revoked_at in rows), default=datetime.utcnow())
+        self._rebuilt_at = self._synced_at = now
+
+    def _top_up(self, now):
+        since = self._watermark - timedelta(seconds=self.overlap_seconds)
+        rows = db.session.query(RevokedToken.jti, RevokedToken.revoked_at).filter(
+            RevokedToken.revoked_at > since
+        ).all()
+        for jti, revoked_at in rows:
+            if jti not in self._filter:
+                self._filter.add(jti)
+            self._watermark = max(self._watermark, revoked_at)
+        self._synced_at = now
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if (force or self._filter is None or now - self._rebuilt_at >= self.rebuild_seconds
+                    or self._filter.count > self._filter.capacity):
+                self._rebuild(now)
+            elif now - self._synced_at >= self.sync_seconds:
+                self._top_up(now)
+            revocation_filter_size.set(self._filter.count)
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self._filter:
+            return False
+        revoked = db.session.get(RevokedToken, jti) is not None
+        revocation_lookups.inc(outcome="revoked" if revoked else "false_positive")
+        return revoked
+
+    def remember(self, jti):
+        """Add a token this worker just revoked, without waiting for the next sync."""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+
+revocations = RevocationList()
+
+
+def revoke(claims):
+    """
+    Record a decoded token's jti as revoked until it would have expired.
+    Returns True only if this call inserted the row: False if the token has no
+    jti or was already revoked, including by a concurrent request whose insert
+    commits first (the unique key makes this one wait, then fail). Safe to
+    repeat; the caller commits.
+    """
+    jti = claims.get("jti")
+    if not jti:
+        return False
+    try:
+        with db.session.begin_nested():
+            db.session.add(RevokedToken(
+                jti=jti,
+                user_id=claims.get("id"),
+                token_type=claims.get("type", "access"),
+                expires_at=datetime.utcfromtimestamp(claims["exp"]),
+            ))
+    except IntegrityError:
+        revocations.remember(jti)
+        return False  # already revoked
+    revocations.remember(jti)
+    return True
+
+
+def is_revoked(claims):
+    """True if the token was revoked. Tokens issued before jtis existed can't be."""
+    jti = claims.get("jti")
+    return bool(jti) and revocations.is_revoked(jti)
+
+
+def purge_expired(batch_size=10000):
+    """Delete revocations whose tokens have expired anyway. Returns the number removed."""
+    expired = (
+        db.select(RevokedToken.jti)
+        .where(RevokedToken.expires_at <= datetime.utcnow())
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    result = db.session.execute(db.delete(RevokedToken).where(RevokedToken.jti.in_(expired)))
+    db.session.commit()
+    return result.rowcount
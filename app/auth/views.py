@@ -1,122 +1,140 @@
 # app/routes/auth_routes.py
-from flask import Blueprint, request, jsonify,flash,redirect,url_for
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify,flash,redirect,url_for,current_app
+import click
+from app.auth.passwords import hash_password, verify_and_update
+from app.auth import revocation
 from datetime import datetime, timedelta
-import requests
 import jwt
+import logging
 from functools import wraps
 
-from app.models import db, User, Wallet, BlockLedger
+from app.models import db, User, Wallet, BlockLedger, LedgerEntryType
+from app.cache import TTLCache
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
 from decimal import Decimal
 import os
 import traceback
+import uuid
 
 from dotenv import load_dotenv
 
 auth_bp = Blueprint("auth", __name__)
+logger = logging.getLogger("app.auth")
 load_dotenv()  # loads variables from .env file into environment
 
-PAYSTACK_SECRET = os.getenv("PAYSTACK_SECRET")
-
 # Secret key (should come from environment variable)
 SECRET_KEY = os.getenv("SECRET_KEY")
 
 # --------------------------
-# JWT helpers
+# Principal cache
 # --------------------------
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-
-        token = request.headers.get("Authorization")
-        if not token:
-            return jsonify({"error": "Token is missing"}), 401
-
-        # ✅ Handle "Bearer " prefix
-        if token.startswith("Bearer "):
-            token = token.split(" ")[1]
-
-        try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user = User.query.get(data["id"])
-            print("🔑 Token received:", token)
-            print("🧩 SECRET_KEY:", SECRET_KEY)
+# Per-worker cache of resolved users, keyed by the user id carried in the token.
+# Only column values are cached; relationships still lazy-load per request.
+# Entries live for PRINCIPAL_CACHE_TTL seconds (15 by default), which bounds how
+# long other workers keep serving a user after it is edited or frozen.
+principal_cache = TTLCache()
 
-            if not user:
-                return jsonify({"error": "User not found"}), 401
-        except Exception as e:
-            return jsonify({"error": f"Invalid token: {str(e)}"}), 401
-        return f(user, *args, **kwargs)
-    return decorated
-
-
-def create_a_main_account(user):
 
-    wallet = Wallet.query.filter_by(user=user).first()
+def _snapshot_user(user):
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
 
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET}",
-        "Content-Type": "application/json"
-
-    }
 
-    full_name = user.name.strip()
-    name_parts = full_name.split()
+def load_principal(user_id):
+    """
+    Resolve the user for a verified token, hitting the users table only on a cache miss.
+    Cached snapshots are attached to the current session without a SELECT.
+    """
+    snapshot = principal_cache.get(user_id)
+    if snapshot is None:
+        user = User.query.get(user_id)
+        if user:
+            principal_cache.set(user_id, _snapshot_user(user))
+        return user
 
-    first_name = name_parts[0] if len(name_parts) > 0 else ""
-    last_name = name_parts[-1] if len(name_parts) > 1 else ""
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
 
 
-    # ---------------------------
-    # STEP 1: Create Customer
-    # ---------------------------
-    customer_payload = {
-        "email": user.email,
-        "first_name": first_name,
-        "last_name": last_name,
-        "phone": '+234'+ user.phone # must be valid, required
-    }
+def invalidate_principal(user_id):
+    """
+    Drop a cached user after it is edited, frozen or deleted. Only this
+    worker's cache is cleared; the others pick the change up when their
+    entry expires after PRINCIPAL_CACHE_TTL.
+    """
+    principal_cache.pop(user_id)
 
-    r = requests.post("https://api.paystack.co/customer", headers=headers, json=customer_payload)
-    customer_data = r.json()
-    print("CUSTOMER RESPONSE:", customer_data)
 
-    if not customer_data.get("status"):
-        return jsonify({"error": customer_data.get("message")}), 400
+# --------------------------
+# JWT helpers
+# --------------------------
+ACCESS = "access"
+REFRESH = "refresh"
 
-    customer_code = customer_data["data"]["customer_code"]
 
-    # ---------------------------
-    # STEP 2: Create Dedicated Virtual Account
-    # ---------------------------
-    dedicated_payload = {
-        "customer": customer_code,
-        "phone": '+234'+ user.phone,
-        "preferred_bank": "wema-bank",   # or "titan-paystack"
-        "country": "NG"
+def issue_tokens(user):
+    """
+    An access token plus a longer-lived refresh token, each with its own jti
+    so it can be revoked. Lifetimes come from ACCESS_TOKEN_MINUTES / REFRESH_TOKEN_DAYS.
+    """
+    now = datetime.utcnow()
+    access_ttl = timedelta(minutes=current_app.config["ACCESS_TOKEN_MINUTES"])
+    refresh_ttl = timedelta(days=current_app.config["REFRESH_TOKEN_DAYS"])
+
+    def encode(token_type, ttl):
+        claims = {"id": user.id, "type": token_type, "jti": str(uuid.uuid4()), "iat": now, "exp": now + ttl}
+        return jwt.encode(claims, SECRET_KEY, algorithm="HS256")
+
+    return {
+        "token": encode(ACCESS, access_ttl),
+        "refresh_token": encode(REFRESH, refresh_ttl),
+        "expires_in": int(access_ttl.total_seconds()),
     }
 
-    r = requests.post("https://api.paystack.co/dedicated_account", headers=headers, json=dedicated_payload)
-    resp = r.json()
-    print("DEDICATED RESPONSE:", resp)
 
-    if not resp.get("status"):
-        return jsonify(resp), 400
+def decode_token(token, token_type=ACCESS):
+    """
+    Verify a JWT (with or without a "Bearer " prefix) and return its claims.
+    Raises jwt.InvalidTokenError if it is bad, expired, revoked or the wrong
+    type. Tokens issued before refresh tokens existed carry no type and count
+    as access tokens.
+    """
+    if token.startswith("Bearer "):
+        token = token.split(" ")[1]
+    claims = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    if claims.get("type", ACCESS) != token_type:
+        raise jwt.InvalidTokenError(f"Wrong token type (expected {token_type})")
+    if revocation.is_revoked(claims):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return claims
 
-    acct_data = resp["data"]  # <-- contains all dedicated account info
 
-    # ---------------------------
-    # STEP 3: Save to DB
-    # ---------------------------
+def principal_from_token(token):
+    """
+    Verify an access token and return its user, or None if the user no
+    longer exists. Raises jwt.InvalidTokenError if the token is bad, expired
+    or revoked.
+    """
+    return load_principal(decode_token(token)["id"])
 
-    wallet.paystack_customer_code=customer_code,
-    wallet.paystack_dedicated_account=acct_data["account_number"],
-    wallet.paystack_bank_name=acct_data["bank"]["name"]
-    db.session.commit()
 
-    return jsonify("Account successfully created!", "success")
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
 
+        token = request.headers.get("Authorization")
+        if not token:
+            return jsonify({"error": "Token is missing"}), 401
 
+        try:
+            user = principal_from_token(token)
+            if not user:
+                return jsonify({"error": "User not found"}), 401
+        except Exception as e:
+            return jsonify({"error": f"Invalid token: {str(e)}"}), 401
+        return f(user, *args, **kwargs)
+    return decorated
 
 
 @auth_bp.route("/register", methods=["POST"])
@@ -128,6 +146,7 @@ def register():
       - Creates user & wallet
       - Allocates 100,000 initial Block Amount
       - Creates ledger entry
+      - Queues Paystack dedicated-account provisioning (see /api/wallet for its status)
     """
     data = request.get_json() or {}
     name = data.get("name")
@@ -143,8 +162,8 @@ def register():
     if User.query.filter_by(phone=phone).first():
         return jsonify({"error": "Phone already registered"}), 400
 
-    # ✅ Hash password
-    hashed_pw = generate_password_hash(password)
+    # ✅ Hash password (configured hasher, see PASSWORD_HASHER)
+    hashed_pw = hash_password(password)
 
     try:
         # Create user
@@ -159,39 +178,44 @@ def register():
         db.session.flush()  # to get user.id
 
 
-        # Create wallet
-        wallet = Wallet(user_id=user.id, block_balance=Decimal("100000.00"))
+        # Create wallet, then mint the initial allocation into it.
+        # Imported here: the ledger and paystack packages import token_required from this module
+        from app.ledger.posting import post, Entry, MINT
+        from app.paystack.accounts import queue_provisioning
+        from app.tasks import provision_dedicated_account
+        wallet = Wallet(user_id=user.id, block_balance=Decimal("0.00"))
         db.session.add(wallet)
 
-        # Create ledger entry
-        ledger = BlockLedger(
-            user_id=user.id,
-            change=Decimal("100000.00"),
-            balance_after=Decimal("100000.00"),
-            reason="Initial allocation"
+        post(
+            [
+                Entry(user.id, Decimal("100000.00"), "Initial allocation", LedgerEntryType.ALLOCATION),
+                Entry(MINT, Decimal("-100000.00")),
+            ],
+            reference=f"register:{user.id}",
         )
-        db.session.add(ledger)
-
-        try:
-            create_a_main_account(user)
-         
-        except Exception as e:
-            return jsonify({"error": f"Can't create account number right now {str(e)}"}), 401
-
 
+        # The Paystack customer and dedicated account are created by a worker
+        # after this commits, so signup never waits on Paystack.
+        provisioning = queue_provisioning(user)
         db.session.commit()
-        
-
-        return jsonify({
-            "message": "Registration successful",
-            "user_id": user.id
-        }), 201
 
     except Exception as e:
         db.session.rollback()
         traceback.print_exc()
         return jsonify({"error": "Registration failed", "details": str(e)}), 500
 
+    try:
+        provision_dedicated_account.delay(user.id)
+    except Exception:
+        # Still PENDING; the resume-stalled-account-provisioning sweep will pick it up
+        logger.warning("could not enqueue account provisioning", extra={"user_id": user.id}, exc_info=True)
+
+    return jsonify({
+        "message": "Registration successful",
+        "user_id": user.id,
+        "account_provisioning": provisioning.to_dict(),
+    }), 201
+
 
 # -----------------------------
 # LOGIN
@@ -214,19 +238,21 @@ def login():
         return jsonify({"error": "Invalid credentials"}), 401
 
     # ✅ Check password hash properly
-    if not check_password_hash(user.password, password):
+    valid, new_hash = verify_and_update(user.password, password)
+    if not valid:
         return jsonify({"error": "Invalid credentials"}), 401
+    if new_hash:
+        # Hashed with an older hasher or cost; upgrade it now that we have the password
+        user.password = new_hash
+        db.session.commit()
+        invalidate_principal(user.id)
 
-    # ✅ Create token
-    token = jwt.encode(
-        {"id": user.id, "exp": datetime.utcnow() + timedelta(hours=12)},
-        SECRET_KEY,
-        algorithm="HS256"
-    )
+    # ✅ Create access + refresh tokens
+    tokens = issue_tokens(user)
 
     wallet = user.wallet
     return jsonify({
-        "token": token,
+        **tokens,
         "user": {
             "id": user.id,
             "name": user.name,
@@ -241,6 +267,62 @@ def login():
 
 
 
+# -----------------------------
+# REFRESH / LOGOUT
+# -----------------------------
+@auth_bp.route("/refresh", methods=["POST"])
+def refresh():
+    """
+    Exchange a refresh token for a new access/refresh pair.
+    Body: {refresh_token}
+    The old refresh token is revoked, so each one can be used once: of two
+    concurrent requests with the same token only the one whose revocation
+    inserts the row gets new tokens.
+    """
+    data = request.get_json() or {}
+    token = data.get("refresh_token")
+    if not token:
+        return jsonify({"error": "refresh_token is required"}), 400
+
+    try:
+        claims = decode_token(token, REFRESH)
+    except jwt.InvalidTokenError as e:
+        return jsonify({"error": f"Invalid refresh token: {str(e)}"}), 401
+
+    user = load_principal(claims["id"])
+    if not user:
+        return jsonify({"error": "User not found"}), 401
+
+    if not revocation.revoke(claims):
+        db.session.rollback()
+        return jsonify({"error": "Invalid refresh token: Token has been revoked"}), 401
+    tokens = issue_tokens(user)
+    db.session.commit()
+    return jsonify(tokens), 200
+
+
+@auth_bp.route("/logout", methods=["POST"])
+@token_required
+def logout(user):
+    """
+    Revoke the access token used for this call and, if given, the refresh token.
+    Body (optional): {refresh_token}
+    """
+    revocation.revoke(decode_token(request.headers["Authorization"]))
+
+    token = (request.get_json(silent=True) or {}).get("refresh_token")
+    if token:
+        try:
+            claims = decode_token(token, REFRESH)
+        except jwt.InvalidTokenError:
+            claims = None
+        if claims and claims["id"] == user.id:
+            revocation.revoke(claims)
+
+    db.session.commit()
+    return jsonify({"message": "Logged out"}), 200
+
+
 @auth_bp.route("/verify_token", methods=["GET"])
 @token_required
 def verify_token(user):
@@ -254,3 +336,21 @@ def verify_token(user):
         "fiat_balance": str(wallet.fiat_balance),
     })
 
+
+
+# -----------------------------
+# Maintenance commands
+# -----------------------------
+@auth_bp.cli.command("bench-passwords")
+@click.option("--hasher", "name", default=None, help="pbkdf2, scrypt or argon2 (default: PASSWORD_HASHER)")
+@click.option("--seconds", default=2.0, show_default=True)
+@click.option("--threads", default=os.cpu_count() or 1, show_default=True)
+def bench_passwords_command(name, seconds, threads):
+    """Hashes/sec for the configured cost parameters, to size login workers (flask auth bench-passwords)."""
+    from app.auth import passwords
+
+    single = passwords.benchmark(name, seconds=seconds, threads=1)
+    parallel = passwords.benchmark(name, seconds=seconds, threads=threads)
+    print(f"✅ {name or current_app.config['PASSWORD_HASHER']}: {single:.1f} hashes/sec on one core "
+          f"({1000 / single:.0f} ms per login)")
+    print(f"✅ {parallel:.1f} hashes/sec across {threads} threads ({parallel / threads:.1f} per thread)")
@@ -0,0 +1,211 @@
+# app/cache.py
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache with a per-entry time-to-live.
+    Each gunicorn worker gets its own copy, so keep values cheap to rebuild.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def add(self, key, value, ttl=None):
+        """Set only if the key is absent or expired; returns True if it was set."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                return False
+            self._data[key] = (now + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def pop(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[1] if item else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def configure(self, maxsize=None, ttl=None):
+        """Apply config values once the Flask app is available."""
+        if maxsize is not None:
+            self.maxsize = maxsize
+        if ttl is not None:
+            self.ttl = ttl
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SharedCache:
+    """
+    Two-tier cache for values every gunicorn worker should share.
+
+    Values are JSON-encoded into Redis under `namespace:` keys with a TTL, and
+    kept in a small per-worker TTLCache (LRU) in front of it. When Redis is not
+    configured or stops answering, the cache keeps working from the local tier
+    alone and retries Redis after a short back-off.
+    """
+
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self, namespace, maxsize=1000, ttl=300):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._redis = None
+        self._redis_down_until = 0
+
+    def init_redis(self, url):
+        if not url:
+            self._redis = None
+            return
+        import redis
+
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+    def configure(self, maxsize=None, ttl=None):
+        if ttl is not None:
+            self.ttl = ttl
+        self.local.configure(maxsize=maxsize, ttl=ttl)
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _client(self):
+        if self._redis is None or time.monotonic() < self._redis_down_until:
+            return None
+        return self._redis
+
+    def _redis_failed(self):
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_SECONDS
+
+    def get(self, key, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return self._fetch(key, default)
+
+    def reload(self, key, default=None):
+        """
+        Re-read `key` from Redis, replacing this worker's copy, to pick up a
+        value another process wrote. Falls back to the local copy when Redis
+        is not available.
+        """
+        local = self.local.get(key, default)
+        if self._client() is None:
+            return local
+        return self._fetch(key, local)
+
+    def _fetch(self, key, default):
+        client = self._client()
+        if client is None:
+            return default
+        try:
+            raw = client.get(self._key(key))
+            ttl = client.ttl(self._key(key)) if raw is not None else None
+        except Exception:
+            self._redis_failed()
+            return default
+        if raw is None:
+            return default
+
+        value = json.loads(raw)
+        # Never keep the local copy longer than Redis will
+        self.local.set(key, value, ttl=min(self.ttl, ttl) if ttl and ttl > 0 else None)
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl=ttl)
+        client = self._client()
+        if client is None:
+            return
+        try:
+            client.set(self._key(key), json.dumps(value), ex=max(int(ttl), 1))
+        except Exception:
+            self._redis_failed()
+
+    def add(self, key, value, ttl=None):
+        """Set only if absent; returns True when this caller set it (a cheap lock)."""
+        ttl = self.ttl if ttl is None else ttl
+        client = self._client()
+        if client is not None:
+            try:
+                return bool(client.set(self._key(key), json.dumps(value), ex=max(int(ttl), 1), nx=True))
+            except Exception:
+                self._redis_failed()
+        return self.local.add(key, value, ttl=ttl)
+
+    def pop(self, key):
+        self.local.pop(key)
+        client = self._client()
+        if client is None:
+            return
+        try:
+            client.delete(self._key(key))
+        except Exception:
+            self._redis_failed()
+
+    def stats(self):
+        return {
+            "namespace": self.namespace,
+            "redis": self._redis is not None and time.monotonic() >= self._redis_down_until,
+            "local": self.local.stats(),
+        }
@@ -0,0 +1,182 @@
+# app/exchange/market.py
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, inspect
+
+from app.cache import TTLCache
+from app.models import db, ExchangeTx, ExchangeCandle
+from app.rollups import upsert_increment
+
+CENT = Decimal("0.01")
+EPOCH = datetime(1970, 1, 1)
+
+# Candle interval name -> bucket length in seconds
+INTERVALS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+ticker_cache = TTLCache(maxsize=4, ttl=5)
+
+
+def bucket_start(timestamp, seconds):
+    """Start of the `seconds`-long bucket containing `timestamp` (naive UTC)."""
+    elapsed = int((timestamp - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+
+def _trade(tx):
+    """(completed_at, price per block, blocks, naira) for one completed ExchangeTx."""
+    quantity = Decimal(tx.block_value)
+    value = Decimal(tx.fiat_value)
+    return (tx.completed_at or datetime.utcnow(), (value / quantity).quantize(CENT), quantity, value)
+
+
+# -------------------------------------------------
+# Incremental maintenance
+# -------------------------------------------------
+
+def apply_trades(connection, trades):
+    """
+    Fold (completed_at, price, quantity, value) trades into exchange_candles
+    for every interval. A candle's close is the price of its latest trade by
+    completed_at (close_at), whatever order the transactions commit in. Must
+    run on the writing transaction's connection.
+    """
+    now = datetime.utcnow()
+    candles = {}
+    for completed_at, price, quantity, value in trades:
+        for interval, seconds in INTERVALS.items():
+            key = (interval, bucket_start(completed_at, seconds))
+            row = candles.get(key)
+            if row is None:
+                row = candles[key] = {
+                    "interval": interval, "bucket_start": key[1],
+                    "open": price, "high": price, "low": price,
+                    "close": price, "close_at": completed_at,
+                    "volume": Decimal("0"), "quote_volume": Decimal("0"),
+                    "trade_count": 0, "updated_at": now,
+                }
+            row["high"] = max(row["high"], price)
+            row["low"] = min(row["low"], price)
+            if completed_at >= row["close_at"]:
+                row["close"], row["close_at"] = price, completed_at
+            row["volume"] += quantity
+            row["quote_volume"] += value
+            row["trade_count"] += 1
+
+    # Sorted so concurrent transactions lock candle rows in the same order
+    rows = [candles[key] for key in sorted(candles)]
+    upsert_increment(
+        connection, ExchangeCandle.__table__, ("interval", "bucket_start"), rows,
+        replace=("updated_at",), keep=("open",), greatest=("high",), least=("low",),
+        latest={"close": "close_at"},
+    )
+
+
+def _completed(tx):
+    history = inspect(tx).attrs.status.history
+    return "COMPLETED" in (history.added or ()) and "COMPLETED" not in (history.deleted or ())
+
+
+@event.listens_for(db.session, "after_flush")
+def _record_completed_trades(session, flush_context):
+    trades = [
+        _trade(obj) for obj in session.new
+        if isinstance(obj, ExchangeTx) and obj.status == "COMPLETED"
+    ]
+    trades += [
+        _trade(obj) for obj in session.dirty
+        if isinstance(obj, ExchangeTx) and _completed(obj)
+    ]
+    if trades:
+        trades.sort(key=lambda trade: trade[0])
+        apply_trades(session.connection(), trades)
+
+
+def rebuild_candles(batch_size=1000):
+    """Recompute exchange_candles from completed exchange_transactions. Returns the trade count."""
+    db.session.execute(db.delete(ExchangeCandle))
+    connection = db.session.connection()
+
+    count = 0
+    batch = []
+    query = (
+        ExchangeTx.query.filter_by(status="COMPLETED")
+        .order_by(ExchangeTx.completed_at, ExchangeTx.id)
+        .yield_per(batch_size)
+    )
+    for tx in query:
+        batch.append(_trade(tx))
+        if len(batch) == batch_size:
+            apply_trades(connection, batch)
+            count += len(batch)
+            batch = []
+    apply_trades(connection, batch)
+    count += len(batch)
+
+    db.session.commit()
+    return count
+
+
+# -------------------------------------------------
+# Reads
+# -------------------------------------------------
+
+def get_candles(interval, limit, start=None, end=None):
+    """Up to `limit` candles of `interval`, the most recent ones, oldest first."""
+    query = ExchangeCandle.query.filter(ExchangeCandle.interval == interval)
+    if start is not None:
+        query = query.filter(ExchangeCandle.bucket_start >= bucket_start(start, INTERVALS[interval]))
+    if end is not None:
+        query = query.filter(ExchangeCandle.bucket_start <= end)
+    candles = query.order_by(ExchangeCandle.bucket_start.desc()).limit(limit).all()
+    return candles[::-1]
+
+
+def get_ticker():
+    """
+    Last price and rolling 24h open/high/low/volume, from the minute candles.
+    Cached for a few seconds per worker, so bursts of ticker requests cost one
+    index range read.
+    """
+    ticker = ticker_cache.get("ticker")
+    if ticker is not None:
+        return ticker
+
+    since = bucket_start(datetime.utcnow() - timedelta(hours=24), INTERVALS["1m"])
+    candles = (
+        ExchangeCandle.query.filter(ExchangeCandle.interval == "1m", ExchangeCandle.bucket_start >= since)
+        .order_by(ExchangeCandle.bucket_start)
+        .all()
+    )
+    last = candles[-1] if candles else (
+        ExchangeCandle.query.filter_by(interval="1m")
+        .order_by(ExchangeCandle.bucket_start.desc())
+        .first()
+    )
+
+    ticker = {
+        "last_price": str(last.close) if last else None,
+        "last_trade_at": last.close_at.isoformat() if last and last.close_at else None,
+        "open_24h": None,
+        "high_24h": None,
+        "low_24h": None,
+        "change_24h": None,
+        "change_percent_24h": None,
+        "volume_24h": str(sum((c.volume for c in candles), Decimal("0.00"))),
+        "quote_volume_24h": str(sum((c.quote_volume for c in candles), Decimal("0.00"))),
+        "trades_24h": sum(c.trade_count for c in candles),
+    }
+    if candles:
+        opened = candles[0].open
+        change = last.close - opened
+        ticker.update({
+            "open_24h": str(opened),
+            "high_24h": str(max(c.high for c in candles)),
+            "low_24h": str(min(c.low for c in candles)),
+            "change_24h": str(change),
+            "change_percent_24h": str((change * 100 / opened).quantize(CENT)) if opened else None,
+        })
+
+    ticker_cache.set("ticker", ticker)
+    return ticker
@@ -0,0 +1,233 @@
+# app/exchange/matching.py
+
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from app.models import db, ExchangeListing, ExchangeTx, PlatformAccount, LedgerEntryType
+from app.exchange.orderbook import OrderBook, Ask
+from app.ledger.posting import post, Entry, ESCROW
+from app.wallet.service import credit_fiat, debit_fiat
+
+CENT = Decimal("0.01")
+MAX_ATTEMPTS = 3
+
+# One book per worker process, rebuilt from exchange_listings the first time
+# the worker matches and every EXCHANGE_BOOK_REFRESH_SECONDS after that. The
+# database stays the source of truth: every fill is re-checked against the
+# locked listing row before it is settled.
+book = OrderBook()
+_lock = threading.Lock()
+_state = {"rebuilt_at": None, "last_listing_id": 0}
+
+
+class MatchError(ValueError):
+    """The order could not be matched (nothing to buy, book kept changing)."""
+
+
+class _StaleBook(Exception):
+    def __init__(self, listing_ids):
+        super().__init__(listing_ids)
+        self.listing_ids = listing_ids
+
+
+def ask_from_listing(listing):
+    return Ask(
+        id=listing.id,
+        seller_id=listing.seller_id,
+        rate=Decimal(listing.rate_per_block),
+        created_at=listing.created_at,
+        remaining=listing.remaining_amount,
+        min_purchase=Decimal(listing.min_purchase or 0),
+        max_purchase=Decimal(listing.max_purchase or 0),
+    )
+
+
+# -------------------------------------------------
+# Keeping the book in step with exchange_listings
+# -------------------------------------------------
+
+def rebuild_book():
+    """Reload every ACTIVE listing into this worker's book. Returns the number of asks."""
+    with _lock:
+        _rebuild()
+    return len(book)
+
+
+def _rebuild():
+    book.clear()
+    _state["last_listing_id"] = db.session.query(func.max(ExchangeListing.id)).scalar() or 0
+    listings = (
+        ExchangeListing.query.filter_by(status="ACTIVE")
+        .filter(ExchangeListing.id <= _state["last_listing_id"])
+        .yield_per(1000)
+    )
+    for listing in listings:
+        book.add(ask_from_listing(listing))
+    _state["rebuilt_at"] = time.monotonic()
+
+
+def _sync():
+    """
+    Pick up listings other workers created since the last look. A listing
+    whose lower id commits after a higher one is caught by the periodic rebuild.
+    """
+    rebuilt_at = _state["rebuilt_at"]
+    if rebuilt_at is None or time.monotonic() - rebuilt_at > current_app.config["EXCHANGE_BOOK_REFRESH_SECONDS"]:
+        _rebuild()
+        return
+    listings = (
+        ExchangeListing.query.filter(ExchangeListing.id > _state["last_listing_id"])
+        .order_by(ExchangeListing.id)
+        .all()
+    )
+    for listing in listings:
+        if listing.status == "ACTIVE":
+            book.add(ask_from_listing(listing))
+        _state["last_listing_id"] = listing.id
+
+
+def _reload(listing_ids):
+    """Replace the given asks with what the database says now."""
+    found = ExchangeListing.query.filter(ExchangeListing.id.in_(listing_ids)).all()
+    for listing in found:
+        if listing.status == "ACTIVE":
+            book.add(ask_from_listing(listing))
+        else:
+            book.remove(listing.id)
+    for listing_id in set(listing_ids) - {listing.id for listing in found}:
+        book.remove(listing_id)
+
+
+def depth(levels=None):
+    """This worker's book aggregated by rate, best first (see OrderBook.depth)."""
+    with _lock:
+        _sync()
+        return book.depth(levels)
+
+
+def best_ask():
+    with _lock:
+        _sync()
+        ask = book.best()
+        return (ask.rate, ask.remaining) if ask else None
+
+
+def add_listing(listing):
+    """Put a just-committed listing in this worker's book."""
+    with _lock:
+        if _state["rebuilt_at"] is not None and listing.status == "ACTIVE":
+            book.add(ask_from_listing(listing))
+
+
+# -------------------------------------------------
+# Matching and settlement
+# -------------------------------------------------
+
+def _credit_platform_fee(amount):
+    updated = db.session.execute(
+        update(PlatformAccount)
+        .where(PlatformAccount.id == 1)
+        .values(fiat_balance=PlatformAccount.fiat_balance + amount, last_updated=datetime.utcnow())
+    ).rowcount
+    if not updated:
+        db.session.add(PlatformAccount(id=1, fiat_balance=amount))
+
+
+def _settle(buyer_id, fills):
+    """
+    Settle fills in one transaction: lock the listings, check the book was
+    right about them, move the buyer's naira to the sellers and the platform,
+    release the blocks from escrow to the buyer and record an ExchangeTx per fill.
+    """
+    listings = {
+        listing.id: listing for listing in
+        ExchangeListing.query.filter(ExchangeListing.id.in_({f.listing_id for f in fills}))
+        .order_by(ExchangeListing.id)
+        .with_for_update()
+        .populate_existing()
+    }
+    stale = [
+        f.listing_id for f in fills
+        if f.listing_id not in listings
+        or listings[f.listing_id].status != "ACTIVE"
+        or listings[f.listing_id].remaining_amount < f.quantity
+    ]
+    if stale:
+        raise _StaleBook(stale)
+
+    fee_rate = Decimal(str(current_app.config["EXCHANGE_FEE_RATE"]))
+    now = datetime.utcnow()
+    proceeds = defaultdict(Decimal)
+    txs = []
+    for f in fills:
+        value = (f.quantity * f.rate).quantize(CENT)
+        fee = (value * fee_rate).quantize(CENT)
+        proceeds[f.seller_id] += value - fee
+
+        listing = listings[f.listing_id]
+        listing.filled_amount = Decimal(listing.filled_amount or 0) + f.quantity
+        if listing.remaining_amount <= 0:
+            listing.status = "COMPLETED"
+        txs.append(ExchangeTx(
+            listing_id=f.listing_id,
+            buyer_id=buyer_id,
+            seller_id=f.seller_id,
+            fiat_value=value,
+            block_value=f.quantity,
+            admin_fee=fee,
+            status="COMPLETED",
+            completed_at=now,
+        ))
+
+    total = sum(tx.fiat_value for tx in txs)
+    debit_fiat(buyer_id, total)
+    for seller_id in sorted(proceeds):
+        credit_fiat(seller_id, proceeds[seller_id])
+    fees = sum(tx.admin_fee for tx in txs)
+    if fees:
+        _credit_platform_fee(fees)
+
+    post(
+        [Entry(buyer_id, f.quantity, f"Bought {f.quantity} blocks from listing {f.listing_id}",
+               LedgerEntryType.TRANSFER) for f in fills]
+        + [Entry(ESCROW, -sum(f.quantity for f in fills))]
+    )
+    db.session.add_all(txs)
+    db.session.commit()
+    return txs
+
+
+def buy(buyer_id, quantity, limit_rate=None):
+    """
+    Immediate-or-cancel buy of up to `quantity` blocks at the best asks,
+    priced no higher than `limit_rate` if given. Returns the committed
+    ExchangeTx rows (one per fill). Raises MatchError when nothing matches,
+    WalletError when the buyer's naira doesn't cover the fills.
+
+    Matching is serialized per worker; the listing row locks taken while
+    settling serialize workers against each other. If another worker changed
+    a listing, that ask is reloaded and the order is matched again.
+    """
+    quantity = Decimal(quantity)
+    with _lock:
+        _sync()
+        for _ in range(MAX_ATTEMPTS):
+            fills = book.match(quantity, limit_rate, exclude_seller=buyer_id)
+            if not fills:
+                raise MatchError("No listings match this order")
+            try:
+                return _settle(buyer_id, fills)
+            except _StaleBook as e:
+                db.session.rollback()
+                _reload({f.listing_id for f in fills} | set(e.listing_ids))
+            except Exception:
+                db.session.rollback()
+                _reload({f.listing_id for f in fills})
+                raise
+    raise MatchError("The order book is changing too quickly, please retry")
@@ -0,0 +1,150 @@
+# app/exchange/orderbook.py
+
+import heapq
+from collections import namedtuple
+from decimal import Decimal
+
+MARKET = "BLOCK/NGN"
+ZERO = Decimal("0")
+
+Fill = namedtuple("Fill", "listing_id seller_id quantity rate")
+
+
+class Ask:
+    """A resting sell order: what is left of one ACTIVE exchange listing."""
+    __slots__ = ("id", "seller_id", "rate", "created_at", "remaining", "min_purchase", "max_purchase")
+
+    def __init__(self, id, seller_id, rate, created_at, remaining, min_purchase=ZERO, max_purchase=ZERO):
+        self.id = id
+        self.seller_id = seller_id
+        self.rate = rate
+        self.created_at = created_at
+        self.remaining = remaining
+        self.min_purchase = min_purchase or ZERO
+        self.max_purchase = max_purchase or ZERO   # 0 = no cap
+
+    def fill_size(self, wanted):
+        """How much of `wanted` this ask can fill in one purchase (0 if none)."""
+        size = min(wanted, self.remaining)
+        if self.max_purchase:
+            size = min(size, self.max_purchase)
+        # The final piece of a listing may be smaller than min_purchase
+        if size < self.min_purchase and size < self.remaining:
+            return ZERO
+        return size
+
+
+class OrderBook:
+    """
+    Price-time priority book of asks for one market, held in memory.
+
+    Asks live in a heap keyed by (rate_per_block, created_at, id), so the best
+    ask is always at the top. Removed asks are dropped lazily when they reach
+    the top instead of being searched for. The total remaining at each rate is
+    kept alongside for depth queries. Buys are immediate-or-cancel: they take
+    liquidity and never rest in the book.
+    """
+
+    def __init__(self, market=MARKET):
+        self.market = market
+        self.clear()
+
+    def clear(self):
+        self._heap = []
+        self._asks = {}
+        self._queued = set()   # ids with an entry in the heap
+        self._levels = {}      # rate -> total remaining at that rate
+
+    def __len__(self):
+        return len(self._asks)
+
+    def __contains__(self, listing_id):
+        return listing_id in self._asks
+
+    def get(self, listing_id):
+        return self._asks.get(listing_id)
+
+    def _level_change(self, rate, delta):
+        total = self._levels.get(rate, ZERO) + delta
+        if total > 0:
+            self._levels[rate] = total
+        else:
+            self._levels.pop(rate, None)
+
+    def add(self, ask):
+        """Insert or replace an ask; asks with nothing left are removed instead."""
+        if ask.remaining <= 0:
+            self.remove(ask.id)
+            return
+        self.remove(ask.id)
+        self._asks[ask.id] = ask
+        self._level_change(ask.rate, ask.remaining)
+        if ask.id not in self._queued:
+            self._queued.add(ask.id)
+            heapq.heappush(self._heap, (ask.rate, ask.created_at, ask.id))
+
+    def remove(self, listing_id):
+        ask = self._asks.pop(listing_id, None)
+        if ask is not None:
+            self._level_change(ask.rate, -ask.remaining)
+        return ask
+
+    def best(self):
+        """The best live ask, or None."""
+        heap = self._heap
+        while heap:
+            listing_id = heap[0][2]
+            ask = self._asks.get(listing_id)
+            if ask is not None:
+                return ask
+            heapq.heappop(heap)
+            self._queued.discard(listing_id)
+        return None
+
+    def match(self, quantity, limit_rate=None, exclude_seller=None):
+        """
+        Fill up to `quantity` blocks from the best asks, at most once per ask,
+        honouring each ask's min/max purchase and skipping `exclude_seller`'s
+        own listings. Stops at asks priced above `limit_rate`. The filled
+        quantities are taken out of the book; returns the fills in priority order.
+        """
+        heap = self._heap
+        asks = self._asks
+        fills = []
+        passed = []
+        wanted = quantity
+
+        while wanted > 0 and heap:
+            entry = heap[0]
+            ask = asks.get(entry[2])
+            if ask is None:
+                heapq.heappop(heap)
+                self._queued.discard(entry[2])
+                continue
+            if limit_rate is not None and ask.rate > limit_rate:
+                break
+            heapq.heappop(heap)
+
+            size = ZERO if ask.seller_id == exclude_seller else ask.fill_size(wanted)
+            if size:
+                ask.remaining -= size
+                wanted -= size
+                self._level_change(ask.rate, -size)
+                fills.append(Fill(ask.id, ask.seller_id, size, ask.rate))
+
+            if ask.remaining > 0:
+                # Same key, so it keeps its place in the queue
+                passed.append(entry)
+            else:
+                del asks[ask.id]
+                self._queued.discard(ask.id)
+
+        for entry in passed:
+            heapq.heappush(heap, entry)
+        return fills
+
+    def depth(self, levels=None):
+        """[(rate, total remaining)] for the best `levels` price levels (all if None), best first."""
+        if levels is None:
+            return sorted(self._levels.items())
+        return heapq.nsmallest(levels, self._levels.items())
@@ -1,82 +1,81 @@
 # app/routes/exchange_routes.py
 
+import random
+import time
+
+import click
 from flask import Blueprint, request, jsonify
-from decimal import Decimal
-from datetime import datetime
-from app.models import db, User, Wallet, ExchangeListing, BlockLedger
+from decimal import Decimal, InvalidOperation
+from datetime import datetime, timedelta
+from app.models import db, User, Wallet, ExchangeListing, BlockLedger, LedgerEntryType
 from app.auth.views import token_required
+from app.wallet.service import debit_blocks, WalletError
+from app.ledger.posting import ESCROW
+from app.exchange import market, matching
+from app.exchange.matching import MatchError
+from app.exchange.orderbook import OrderBook, Ask, MARKET
+from app.pagination import parse_limit, CursorError
+from app.profiler import query_budget
 
 exchange_bp = Blueprint("exchange", __name__)
-'''
-@exchange_bp.route("/exchange/buy", methods=["POST"])
-@token_required
-def buy_blocks(user):
-    print("✅ /exchange/buy route hit")
 
-    data = request.get_json() or {}
-    listing_id = data.get("listing_id")
-
-    listing = ExchangeListing.query.get(listing_id)
-    if not listing or listing.status != "ACTIVE":
-        return jsonify({"error": "Listing not found or inactive"}), 404
+CENT = Decimal("0.01")
+MAX_AMOUNT = Decimal("9999999999999999.99")   # Numeric(18, 2)
 
-    total_price = listing.block_amount * listing.rate_per_block
-    seller_wallet = Wallet.query.filter_by(user_id=listing.seller_id).first()
-    buyer_wallet = Wallet.query.filter_by(user_id=user.id).first()
-    admin_wallet = Wallet.query.filter_by(user_id=1).first()  # Admin
-
-    fee = total_price * Decimal("0.20")
-    seller_earning = total_price - fee
-    mined_fee_blocks = listing.block_amount * Decimal("0.20")
 
+def parse_amount(value, allow_zero=False):
+    """
+    A block quantity or naira rate from a request body, quantized to 0.01.
+    Raises ValueError for anything non-numeric, NaN or infinite, out of range,
+    or not above zero once quantized (so sub-cent amounts can't buy blocks for free).
+    """
     try:
-        buyer_wallet.block_balance += listing.block_amount
-        db.session.add(BlockLedger(
-            user_id=user.id,
-            change=listing.block_amount,
-            balance_after=buyer_wallet.block_balance,
-            reason=f"Purchased {listing.block_amount} blocks from seller {listing.seller_id}"
-        ))
-
-        if admin_wallet:
-            admin_wallet.block_balance += mined_fee_blocks
-            db.session.add(BlockLedger(
-                user_id=admin_wallet.user_id,
-                change=mined_fee_blocks,
-                balance_after=admin_wallet.block_balance,
-                reason="Platform mining reward (exchange fee)"
-            ))
-
-        listing.status = "SOLD"
-        listing.sold_at = datetime.utcnow()
-        listing.buyer_id = user.id
-
-        db.session.commit()
-
-    except Exception as e:
-        db.session.rollback()
-        print("❌ Transaction failed:", e)
-        return jsonify({"error": "Purchase failed"}), 500
-
-    return jsonify({
-        "message": "Purchase completed successfully",
-        "blocks_transferred": str(listing.block_amount),
-        "seller_earning": str(seller_earning),
-        "platform_fee": str(fee),
-        "buyer_new_balance": str(buyer_wallet.block_balance)
-    })
+        amount = Decimal(str(value))
+        if not amount.is_finite():
+            raise ValueError(f"{value!r} is not a finite amount")
+        amount = amount.quantize(CENT)
+    except InvalidOperation:
+        raise ValueError(f"{value!r} is not an amount")
+    if amount < 0 or (amount == 0 and not allow_zero) or amount > MAX_AMOUNT:
+        raise ValueError(f"{value!r} is out of range")
+    return amount
 
-'''
 
+# -----------------------------------
+# Buyer takes blocks from the order book
+# -----------------------------------
 @exchange_bp.route("/exchange/buy", methods=["POST"])
 @token_required
 def buy_blocks(user):
     """
-    Temporarily disabled purchase logic.
-    Simply tells the user to fund their wallet before buying.
+    Buy blocks from the cheapest listings first (oldest first at the same rate).
+    Fills immediately as much as the book allows, then cancels the rest.
+    Example body:
+    {
+        "quantity": 50,
+        "max_rate": 200      # optional: don't pay more than this per block
+    }
     """
-    print("✅ /exchange/buy route hit — logic disabled for now")
-    return jsonify({"message": "Fund your wallet to buy"}), 200
+    data = request.get_json() or {}
+    try:
+        quantity = parse_amount(data.get("quantity"))
+        max_rate = parse_amount(data["max_rate"]) if data.get("max_rate") is not None else None
+    except ValueError:
+        return jsonify({"error": "Invalid quantity or rate"}), 400
+
+    try:
+        fills = matching.buy(user.id, quantity, max_rate)
+    except (MatchError, WalletError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    bought = sum(tx.block_value for tx in fills)
+    return jsonify({
+        "message": "Purchase completed successfully",
+        "blocks_bought": str(bought),
+        "blocks_unfilled": str(quantity - bought),
+        "total_paid": str(sum(tx.fiat_value for tx in fills)),
+        "fills": [tx.to_dict() for tx in fills],
+    }), 200
 
 # -----------------------------------
 # Seller lists blocks for sale
@@ -89,43 +88,54 @@ def list_blocks_for_sale(user):
     Example body:
     {
         "quantity": 50,
-        "rate_per_block": 200
+        "rate_per_block": 200,
+        "min_purchase": 5,      # optional, smallest single purchase
+        "max_purchase": 20      # optional, largest single purchase
     }
     """
     data = request.get_json() or {}
-    quantity = Decimal(str(data.get("quantity", 0)))
-    price_per_unit = Decimal(str(data.get("price_per_unit", 0)))
-
-    if quantity <= 0 or price_per_unit <= 0:
+    try:
+        quantity = parse_amount(data.get("quantity"))
+        price_per_unit = parse_amount(data.get("price_per_unit"))
+    except ValueError:
         return jsonify({"error": "Invalid quantity or price"}), 400
+    try:
+        min_purchase = parse_amount(data.get("min_purchase") or 0, allow_zero=True)
+        max_purchase = parse_amount(data.get("max_purchase") or 0, allow_zero=True)
+    except ValueError:
+        return jsonify({"error": "Invalid purchase limits"}), 400
+    if max_purchase and min_purchase > max_purchase:
+        return jsonify({"error": "Invalid purchase limits"}), 400
 
-    wallet = Wallet.query.filter_by(user_id=user.id).first()
-    if wallet.block_balance < quantity:
-        return jsonify({"error": "Insufficient block balance"}), 400
-
-    # Lock blocks in escrow for sale
-    wallet.block_balance -= quantity
+    # Lock blocks in escrow for sale (conditional UPDATE, so no double-listing)
+    try:
+        remaining = debit_blocks(
+            user.id,
+            quantity,
+            reason=f"Listed {quantity} blocks for sale",
+            entry_type=LedgerEntryType.LISTING,
+            sink=ESCROW,
+        )
+    except WalletError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
 
     listing = ExchangeListing(
         seller_id=user.id,
         block_amount=quantity,
-        rate_per_block=price_per_unit
+        rate_per_block=price_per_unit,
+        min_purchase=min_purchase,
+        max_purchase=max_purchase,
     )
     db.session.add(listing)
 
-    db.session.add(BlockLedger(
-        user_id=user.id,
-        change=-quantity,
-        balance_after=wallet.block_balance,
-        reason=f"Listed {quantity} blocks for sale"
-    ))
-
     db.session.commit()  # ✅ safe explicit commit
+    matching.add_listing(listing)
 
     return jsonify({
         "message": "Blocks listed for sale successfully",
         "listing_id": listing.id,
-        "remaining_balance": str(wallet.block_balance)
+        "remaining_balance": str(remaining)
     }), 201
 
 
@@ -133,20 +143,25 @@ def list_blocks_for_sale(user):
 # Get all active listings
 # -----------------------------------
 @exchange_bp.route("/exchange/listings", methods=["GET"])
+@query_budget(3)
 def get_all_listings():
-    listings = ExchangeListing.query.all()
+    rows = (
+        db.session.query(ExchangeListing, User.name)
+        .outerjoin(User, User.id == ExchangeListing.seller_id)
+        .all()
+    )
     data = []
 
-    for l in listings:
-        seller = User.query.get(l.seller_id)
+    for l, seller_name in rows:
         total_price = l.block_amount * l.rate_per_block
         data.append({
             "id": l.id,
             "seller_id": l.seller_id,
-            "seller_name": seller.name if seller else "Unknown",
+            "seller_name": seller_name or "Unknown",
             "quantity": str(l.block_amount),
             "price_per_unit": str(l.rate_per_block),
             "total_price": str(total_price),
+            "remaining": str(l.remaining_amount),
             "min_purchase": str(l.min_purchase),
             "max_purchase": str(l.max_purchase),
             "status": l.status,
@@ -157,5 +172,116 @@ def get_all_listings():
 
 
 # -----------------------------------
-# Buyer purchases listed blocks
+# Market data
+# -----------------------------------
+@exchange_bp.route("/exchange/depth", methods=["GET"])
+def get_market_depth():
+    """
+    Asks aggregated by price level, cheapest first, from the in-memory order book.
+    ?levels= caps the number of price levels (default 20, max 100).
+    """
+    try:
+        levels = parse_limit(request.args.get("levels"))
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "market": MARKET,
+        "asks": [
+            {"price": str(rate), "quantity": str(quantity)}
+            for rate, quantity in matching.depth(levels)
+        ],
+    })
+
+
+@exchange_bp.route("/exchange/ticker", methods=["GET"])
+def get_market_ticker():
+    """Last trade price, best ask and rolling 24h stats."""
+    best = matching.best_ask()
+    return jsonify(dict(
+        market.get_ticker(),
+        market=MARKET,
+        best_ask=str(best[0]) if best else None,
+        best_ask_quantity=str(best[1]) if best else None,
+    ))
+
+
+@exchange_bp.route("/exchange/candles", methods=["GET"])
+def get_market_candles():
+    """
+    OHLCV candles from the exchange_candles rollup, oldest first.
+    Query params:
+      - interval=1m|1h|1d (default 1h)
+      - start / end: ISO datetimes (UTC) bounding the buckets
+      - limit: most recent N candles in range (default 100, max 1000)
+    """
+    interval = request.args.get("interval", "1h")
+    if interval not in market.INTERVALS:
+        return jsonify({"error": f"interval must be one of {', '.join(market.INTERVALS)}"}), 400
+
+    try:
+        limit = parse_limit(request.args.get("limit"), default=100, maximum=1000)
+        start = datetime.fromisoformat(request.args["start"]) if request.args.get("start") else None
+        end = datetime.fromisoformat(request.args["end"]) if request.args.get("end") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    candles = market.get_candles(interval, limit, start, end)
+    return jsonify({
+        "market": MARKET,
+        "interval": interval,
+        "candles": [c.to_dict() for c in candles],
+    })
+
+
+# -----------------------------------
+# Maintenance commands
 # -----------------------------------
+@exchange_bp.cli.command("rebuild-candles")
+def rebuild_candles_command():
+    """Recompute exchange_candles from completed trades (flask exchange rebuild-candles)."""
+    count = market.rebuild_candles()
+    print(f"✅ Rebuilt exchange candles from {count} trades")
+
+
+@exchange_bp.cli.command("bench-matching")
+@click.option("--asks", default=20000, help="Resting asks to load into the book.")
+@click.option("--orders", default=50000, help="Buy orders to match against it.")
+@click.option("--seed", default=1, help="Random seed, for repeatable runs.")
+def bench_matching_command(asks, orders, seed):
+    """Time the in-memory order book on one core (flask exchange bench-matching)."""
+    rng = random.Random(seed)
+    started = datetime(2026, 1, 1)
+    book = OrderBook()
+
+    def random_ask(listing_id):
+        return Ask(
+            id=listing_id,
+            seller_id=rng.randint(1, 1000),
+            rate=Decimal(rng.randint(150, 250)),
+            created_at=started + timedelta(seconds=listing_id),
+            remaining=Decimal(rng.randint(1, 500)),
+            min_purchase=Decimal(rng.choice((0, 0, 5))),
+            max_purchase=Decimal(rng.choice((0, 0, 100))),
+        )
+
+    t0 = time.perf_counter()
+    for listing_id in range(1, asks + 1):
+        book.add(random_ask(listing_id))
+    load_seconds = time.perf_counter() - t0
+
+    # Replenish the book as it drains so every order has something to match
+    next_id = asks + 1
+    fills = 0
+    t0 = time.perf_counter()
+    for _ in range(orders):
+        quantity = Decimal(rng.randint(1, 300))
+        limit = Decimal(rng.randint(180, 260)) if rng.random() < 0.5 else None
+        fills += len(book.match(quantity, limit, exclude_seller=rng.randint(1, 1000)))
+        if len(book) < asks:
+            book.add(random_ask(next_id))
+            next_id += 1
+    match_seconds = time.perf_counter() - t0
+
+    print(f"Loaded {asks} asks in {load_seconds:.3f}s ({asks / load_seconds:,.0f}/s)")
+    print(f"Matched {orders} orders ({fills} fills) in {match_seconds:.3f}s ({orders / match_seconds:,.0f} orders/s)")
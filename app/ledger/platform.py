@@ -0,0 +1,204 @@
+# app/ledger/platform.py
+
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event, func, inspect
+
+from app.models import (
+    db, User, Wallet, Transaction, BlockLedger, ExchangeListing, ExchangeTx,
+    PlatformMetric, LedgerEntryType,
+)
+from app.rollups import upsert_increment
+
+CIRCULATING_SUPPLY = "circulating_supply"   # SUM(wallets.block_balance)
+MINTED_SUPPLY = "minted_supply"             # blocks created by mining, allocation and referral rewards
+ACTIVE_WALLETS = "active_wallets"           # wallets with a positive block balance
+TOTAL_TRANSACTIONS = "total_transactions"
+PLATFORM_FEES = "platform_fees"
+TOTAL_USERS = "users_total"
+
+# Ledger entry types that create new blocks rather than move them
+MINTING_TYPES = (LedgerEntryType.MINING, LedgerEntryType.ALLOCATION, LedgerEntryType.REFERRAL)
+
+FEE_TX_TYPES = ("ADMIN_FEE",)
+
+
+def users_metric(user_type):
+    return f"users_{(user_type or 'individual').lower()}"
+
+
+def listings_metric(status):
+    return f"listings_{(status or 'ACTIVE').lower()}"
+
+
+# -------------------------------------------------
+# Incremental maintenance
+# -------------------------------------------------
+
+def add_ledger_deltas(deltas, entry_type, change, balance_after):
+    """Accumulate the metric changes implied by one ledger entry into `deltas`."""
+    change = Decimal(change)
+    after = Decimal(balance_after)
+    before = after - change
+
+    deltas[CIRCULATING_SUPPLY] += change
+    if entry_type in MINTING_TYPES:
+        deltas[MINTED_SUPPLY] += change
+    deltas[ACTIVE_WALLETS] += int(after > 0) - int(before > 0)
+
+
+def add_transaction_deltas(deltas, tx_type, amount):
+    """Accumulate the metric changes implied by one new Transaction row."""
+    deltas[TOTAL_TRANSACTIONS] += 1
+    if tx_type in FEE_TX_TYPES:
+        deltas[PLATFORM_FEES] += Decimal(amount)
+
+
+@event.listens_for(ExchangeListing.status, "set", active_history=True)
+@event.listens_for(ExchangeTx.status, "set", active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    # active_history loads the current status before it is overwritten, so a
+    # change on an expired row still has its old value in _status_changes
+    pass
+
+
+def _status_changes(obj):
+    history = inspect(obj).attrs.status.history
+    return history.deleted or (), history.added or ()
+
+
+def collect_metric_deltas(session):
+    """Metric deltas for everything pending in a flush; call from after_flush."""
+    deltas = defaultdict(Decimal)
+
+    for obj in session.new:
+        if isinstance(obj, BlockLedger):
+            add_ledger_deltas(deltas, obj.entry_type, obj.change, obj.balance_after)
+        elif isinstance(obj, User):
+            deltas[TOTAL_USERS] += 1
+            deltas[users_metric(obj.user_type)] += 1
+        elif isinstance(obj, Transaction):
+            add_transaction_deltas(deltas, obj.tx_type, obj.amount)
+        elif isinstance(obj, ExchangeListing):
+            deltas[listings_metric(obj.status)] += 1
+        elif isinstance(obj, ExchangeTx) and obj.status == "COMPLETED":
+            deltas[PLATFORM_FEES] += Decimal(obj.admin_fee)
+
+    for obj in session.dirty:
+        if isinstance(obj, ExchangeListing):
+            old, new = _status_changes(obj)
+            for status in old:
+                deltas[listings_metric(status)] -= 1
+            for status in new:
+                deltas[listings_metric(status)] += 1
+        elif isinstance(obj, ExchangeTx):
+            old, new = _status_changes(obj)
+            if "COMPLETED" in new and "COMPLETED" not in old:
+                deltas[PLATFORM_FEES] += Decimal(obj.admin_fee)
+
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            deltas[TOTAL_USERS] -= 1
+            deltas[users_metric(obj.user_type)] -= 1
+        elif isinstance(obj, ExchangeListing):
+            deltas[listings_metric(obj.status)] -= 1
+
+    return {name: value for name, value in deltas.items() if value}
+
+
+def apply_metric_deltas(connection, deltas):
+    """Increment platform_metrics rows; run on the writing transaction's connection."""
+    now = datetime.utcnow()
+    rows = [
+        {"name": name, "value": deltas[name], "updated_at": now}
+        for name in sorted(deltas)
+    ]
+    upsert_increment(connection, PlatformMetric.__table__, ("name",), rows, replace=("updated_at",))
+
+
+@event.listens_for(db.session, "after_flush")
+def _update_platform_metrics(session, flush_context):
+    deltas = collect_metric_deltas(session)
+    if deltas:
+        apply_metric_deltas(session.connection(), deltas)
+
+
+# -------------------------------------------------
+# Reads and reconciliation
+# -------------------------------------------------
+
+def get_platform_metrics():
+    """All rollup values as {name: Decimal}; one indexed scan of a tiny table."""
+    return {m.name: m.value for m in PlatformMetric.query.all()}
+
+
+def compute_platform_metrics():
+    """Recompute every metric from the source tables (full scans; reconciliation only)."""
+    metrics = defaultdict(Decimal)
+
+    metrics[CIRCULATING_SUPPLY] = db.session.query(func.sum(Wallet.block_balance)).scalar() or Decimal("0")
+    metrics[ACTIVE_WALLETS] = Decimal(
+        db.session.query(func.count(Wallet.id)).filter(Wallet.block_balance > 0).scalar() or 0
+    )
+    metrics[MINTED_SUPPLY] = (
+        db.session.query(func.sum(BlockLedger.change))
+        .filter(BlockLedger.entry_type.in_(MINTING_TYPES))
+        .scalar()
+    ) or Decimal("0")
+    metrics[TOTAL_TRANSACTIONS] = Decimal(db.session.query(func.count(Transaction.id)).scalar() or 0)
+
+    tx_fees = (
+        db.session.query(func.sum(Transaction.amount))
+        .filter(Transaction.tx_type.in_(FEE_TX_TYPES))
+        .scalar()
+    ) or Decimal("0")
+    exchange_fees = (
+        db.session.query(func.sum(ExchangeTx.admin_fee))
+        .filter(ExchangeTx.status == "COMPLETED")
+        .scalar()
+    ) or Decimal("0")
+    metrics[PLATFORM_FEES] = Decimal(tx_fees) + Decimal(exchange_fees)
+
+    for user_type, count in db.session.query(User.user_type, func.count(User.id)).group_by(User.user_type):
+        metrics[users_metric(user_type)] += count
+        metrics[TOTAL_USERS] += count
+
+    for status, count in db.session.query(ExchangeListing.status, func.count(ExchangeListing.id)).group_by(ExchangeListing.status):
+        metrics[listings_metric(status)] += count
+
+    return {name: Decimal(value) for name, value in metrics.items()}
+
+
+def reconcile_platform_metrics():
+    """
+    Correct any drift between the rollup and the source tables.
+
+    The stored values and every recount are read in one REPEATABLE READ
+    transaction (on Postgres), so they describe the same moment even while
+    after_flush deltas keep landing. That snapshot is then closed and the
+    corrections applied as increments in a fresh transaction: writes committed
+    after the snapshot carry their own deltas, so adding (actual - stored) as
+    of the snapshot keeps them, and never conflicts with their row updates.
+    Returns {name: correction} for metrics that were off.
+    """
+    db.session.commit()
+    if db.engine.dialect.name == "postgresql":
+        db.session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    try:
+        stored = get_platform_metrics()
+        actual = compute_platform_metrics()
+    finally:
+        db.session.rollback()   # read-only; releases the snapshot
+
+    drift = {}
+    for name in set(stored) | set(actual):
+        correction = actual.get(name, Decimal("0")) - Decimal(stored.get(name, 0))
+        if correction:
+            drift[name] = correction
+
+    if drift:
+        apply_metric_deltas(db.session.connection(), drift)
+        db.session.commit()
+    return drift
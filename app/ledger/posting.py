@@ -0,0 +1,168 @@
+# app/ledger/posting.py
+
+import uuid
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from sqlalchemy import case, insert, or_, select, update
+
+from app.models import db, Wallet, BlockLedger, Transaction
+from app.ledger.platform import add_ledger_deltas, add_transaction_deltas, apply_metric_deltas
+from app.ledger.summaries import apply_ledger_entries
+from app.realtime import notify_balance
+
+# System accounts: the other side of legs that create, destroy or park blocks.
+# They have no wallet row; their legs balance the journal but are not stored.
+MINT = "MINT"       # newly created blocks (mining, allocation, referral rewards)
+BURN = "BURN"       # blocks removed from circulation (admin deductions)
+ESCROW = "ESCROW"   # blocks held against open exchange listings
+SYSTEM_ACCOUNTS = frozenset((MINT, BURN, ESCROW))
+
+
+class WalletError(ValueError):
+    pass
+
+
+class WalletNotFound(WalletError):
+    pass
+
+
+class InsufficientFunds(WalletError):
+    pass
+
+
+class PostingError(ValueError):
+    """The journal itself is malformed (does not balance, unknown account)."""
+
+
+class Entry(namedtuple("Entry", "account amount reason entry_type")):
+    """
+    One leg of a journal. `account` is a user id or a system account;
+    `amount` is signed (positive credits the account).
+    """
+    __slots__ = ()
+
+    def __new__(cls, account, amount, reason=None, entry_type=None):
+        return super().__new__(cls, account, Decimal(amount), reason, entry_type)
+
+
+def _validate(entries):
+    if len(entries) < 2:
+        raise PostingError("A journal needs at least two legs")
+    for entry in entries:
+        if isinstance(entry.account, str) and entry.account not in SYSTEM_ACCOUNTS:
+            raise PostingError(f"Unknown system account {entry.account}")
+        if entry.amount == 0:
+            raise PostingError("Journal legs must move a non-zero amount")
+    total = sum(entry.amount for entry in entries)
+    if total != 0:
+        raise PostingError(f"Journal does not balance (off by {total})")
+
+
+def _apply_wallet_deltas(deltas):
+    """
+    One statement for every wallet in the journal: lock the rows in wallet-id
+    order (CTE ... FOR UPDATE on PostgreSQL), then add each user's net change, refusing any
+    that would go negative. Returns {user_id: new balance}.
+    """
+    user_ids = sorted(deltas)
+    delta = case({user_id: deltas[user_id] for user_id in user_ids}, value=Wallet.user_id)
+
+    stmt = (
+        update(Wallet)
+        .where(Wallet.user_id.in_(user_ids))
+        .where(or_(delta >= 0, Wallet.block_balance + delta >= 0))
+        .values(block_balance=Wallet.block_balance + delta)
+        .returning(Wallet.user_id, Wallet.block_balance)
+        .execution_options(synchronize_session="fetch")
+    )
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Row locks are otherwise taken in scan order; take them in id order first.
+        # (SQLite has no row locks, and pysqlite would run a WITH ... UPDATE outside
+        # the transaction, so it gets the plain UPDATE.)
+        locked = (
+            select(Wallet.id)
+            .where(Wallet.user_id.in_(user_ids))
+            .order_by(Wallet.id)
+            .with_for_update()
+            .cte("locked_wallets")
+        )
+        stmt = stmt.where(Wallet.id.in_(select(locked.c.id))).add_cte(locked)
+    balances = {user_id: Decimal(balance) for user_id, balance in db.session.execute(stmt)}
+
+    missing = [user_id for user_id in user_ids if user_id not in balances]
+    if missing:
+        existing = {
+            user_id for (user_id,) in
+            db.session.query(Wallet.user_id).filter(Wallet.user_id.in_(missing))
+        }
+        for user_id in missing:
+            if user_id not in existing:
+                raise WalletNotFound(f"Wallet not found for user {user_id}")
+        raise InsufficientFunds("Insufficient block balance")
+    return balances
+
+
+def post(entries, reference=None, transactions=()):
+    """
+    Post one balanced journal of block movements.
+
+    Every user's net change is applied in a single locked, conditional
+    UPDATE ... RETURNING; balance_after is stamped on each leg from the returned
+    balances; the user legs and any `transactions` (Transaction column dicts)
+    are bulk-inserted with one executemany each; and ledger_summaries and
+    platform_metrics are updated on the same connection (the after_flush hooks
+    never see bulk inserts). The statement count is fixed per journal, however
+    many legs it has.
+
+    All user legs share `reference` (generated if not given) so a journal can be
+    found again. Returns {user_id: new block balance}; the caller commits.
+    On WalletError some wallets may already be updated, so the caller must roll back.
+    """
+    entries = list(entries)
+    _validate(entries)
+
+    deltas = defaultdict(Decimal)
+    for entry in entries:
+        if not isinstance(entry.account, str):
+            deltas[entry.account] += entry.amount
+
+    balances = _apply_wallet_deltas(deltas) if deltas else {}
+
+    reference = reference or f"jrnl_{uuid.uuid4().hex}"
+    running = {user_id: balances[user_id] - deltas[user_id] for user_id in balances}
+    rows = []
+    for entry in entries:
+        if isinstance(entry.account, str):
+            continue
+        running[entry.account] += entry.amount
+        rows.append({
+            "user_id": entry.account,
+            "change": entry.amount,
+            "balance_after": running[entry.account],
+            "reason": entry.reason,
+            "reference": reference,
+            "entry_type": entry.entry_type,
+        })
+
+    if rows:
+        db.session.execute(insert(BlockLedger), rows)
+    transactions = list(transactions)
+    if transactions:
+        db.session.execute(insert(Transaction), transactions)
+
+    connection = db.session.connection()
+    apply_ledger_entries(connection, [(r["user_id"], r["entry_type"], r["change"]) for r in rows])
+
+    metric_deltas = defaultdict(Decimal)
+    for r in rows:
+        add_ledger_deltas(metric_deltas, r["entry_type"], r["change"], r["balance_after"])
+    for tx in transactions:
+        add_transaction_deltas(metric_deltas, tx.get("tx_type"), tx["amount"])
+    metric_deltas = {name: value for name, value in metric_deltas.items() if value}
+    if metric_deltas:
+        apply_metric_deltas(connection, metric_deltas)
+
+    for user_id, balance in balances.items():
+        notify_balance(user_id, block_balance=balance)
+    return balances
@@ -0,0 +1,114 @@
+# app/ledger/summaries.py
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import and_, case, event, func
+
+from app.models import db, BlockLedger, LedgerSummary, LedgerEntryType
+from app.rollups import upsert_increment
+
+ZERO = Decimal("0.00")
+
+TOTAL_FIELDS = (
+    "total_mined",
+    "total_referral",
+    "total_transferred_in",
+    "total_transferred_out",
+    "total_listed",
+    "total_allocated",
+)
+
+
+def summary_deltas(entry_type, change):
+    """Map one ledger change onto the LedgerSummary totals it moves."""
+    change = Decimal(change)
+    if entry_type == LedgerEntryType.MINING:
+        return {"total_mined": change}
+    if entry_type == LedgerEntryType.REFERRAL:
+        return {"total_referral": change}
+    if entry_type == LedgerEntryType.TRANSFER:
+        if change >= 0:
+            return {"total_transferred_in": change}
+        return {"total_transferred_out": -change}
+    if entry_type == LedgerEntryType.LISTING:
+        # Listing moves blocks out of the wallet; a cancelled listing moves them back
+        return {"total_listed": -change}
+    if entry_type == LedgerEntryType.ALLOCATION:
+        return {"total_allocated": change}
+    return {}
+
+
+def apply_ledger_entries(connection, entries):
+    """
+    Fold (user_id, entry_type, change) tuples into ledger_summaries.
+    Must run on the connection/transaction that writes the ledger rows.
+    """
+    now = datetime.utcnow()
+    totals = {}
+    for user_id, entry_type, change in entries:
+        row = totals.get(user_id)
+        if row is None:
+            row = totals[user_id] = dict(
+                {field: ZERO for field in TOTAL_FIELDS},
+                user_id=user_id, entry_count=0, updated_at=now,
+            )
+        for field, delta in summary_deltas(entry_type, change).items():
+            row[field] += delta
+        row["entry_count"] += 1
+
+    # Sorted so concurrent transactions lock summary rows in the same order
+    rows = [totals[user_id] for user_id in sorted(totals)]
+    upsert_increment(connection, LedgerSummary.__table__, ("user_id",), rows, replace=("updated_at",))
+
+
+@event.listens_for(db.session, "after_flush")
+def _summarize_new_entries(session, flush_context):
+    entries = [
+        (obj.user_id, obj.entry_type, obj.change)
+        for obj in session.new
+        if isinstance(obj, BlockLedger)
+    ]
+    if entries:
+        apply_ledger_entries(session.connection(), entries)
+
+
+def get_summary(user_id):
+    """Return the user's LedgerSummary, or an all-zero one if they have no entries yet."""
+    summary = LedgerSummary.query.get(user_id)
+    if summary is None:
+        summary = LedgerSummary(
+            user_id=user_id,
+            entry_count=0,
+            **{field: ZERO for field in TOTAL_FIELDS},
+        )
+    return summary
+
+
+def rebuild_summaries():
+    """Recompute every user's summary from block_ledger. Returns the number of users."""
+    t = BlockLedger
+
+    def total(condition, value=t.change):
+        return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+    select = db.select(
+        t.user_id,
+        total(t.entry_type == LedgerEntryType.MINING),
+        total(t.entry_type == LedgerEntryType.REFERRAL),
+        total(and_(t.entry_type == LedgerEntryType.TRANSFER, t.change >= 0)),
+        total(and_(t.entry_type == LedgerEntryType.TRANSFER, t.change < 0), -t.change),
+        total(t.entry_type == LedgerEntryType.LISTING, -t.change),
+        total(t.entry_type == LedgerEntryType.ALLOCATION),
+        func.count(t.id),
+        db.literal(datetime.utcnow(), db.DateTime),
+    ).group_by(t.user_id)
+
+    db.session.execute(db.delete(LedgerSummary))
+    db.session.execute(
+        db.insert(LedgerSummary).from_select(
+            ["user_id", *TOTAL_FIELDS, "entry_count", "updated_at"], select
+        )
+    )
+    db.session.commit()
+    return LedgerSummary.query.count()
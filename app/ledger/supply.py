@@ -0,0 +1,214 @@
+# app/ledger/supply.py
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import case, func, select
+
+from app.metrics import Counter, Gauge
+from app.models import db, Wallet, BlockLedger, PlatformMetric, SupplyCheckpoint, ReconciledBalance
+from app.ledger.platform import CIRCULATING_SUPPLY, MINTED_SUPPLY, MINTING_TYPES
+from app.rollups import upsert_increment
+
+CHECKPOINT = "block_ledger"
+ZERO = Decimal("0.00")
+
+SUPPLY_DRIFT = Gauge(
+    "supply_drift_blocks",
+    "Blocks by which the books disagree with the ledger at the last reconciliation",
+    label_names=("kind",),
+)
+DRIFTING_WALLETS = Gauge("supply_drifting_wallets", "Wallets whose balance differs from their ledger sum")
+RECONCILE_LAG = Gauge("supply_reconcile_lag_entries", "Ledger entries not yet folded by the reconciler")
+ENTRIES_FOLDED = Counter("supply_reconcile_entries_total", "Ledger entries folded by the reconciler")
+
+
+def _lock_checkpoint():
+    """The checkpoint row, locked for this run; None if another run holds it."""
+    if SupplyCheckpoint.query.get(CHECKPOINT) is None:
+        upsert_increment(
+            db.session.connection(), SupplyCheckpoint.__table__, ("name",),
+            [{"name": CHECKPOINT, "last_ledger_id": 0, "entries_folded": 0}],
+        )
+    return (
+        SupplyCheckpoint.query.filter_by(name=CHECKPOINT)
+        .with_for_update(skip_locked=True)
+        .populate_existing()
+        .first()
+    )
+
+
+def _batch_end(after_id, batch_size, cutoff):
+    """
+    Highest ledger id in the next batch after `after_id`. Stops short of any
+    entry newer than `cutoff`, since entries with lower ids may still be
+    uncommitted around it. Only scans ids above the checkpoint.
+    """
+    first_recent = (
+        db.session.query(func.min(BlockLedger.id))
+        .filter(BlockLedger.id > after_id, BlockLedger.timestamp >= cutoff)
+        .scalar()
+    )
+    ids = select(BlockLedger.id).where(BlockLedger.id > after_id)
+    if first_recent is not None:
+        ids = ids.where(BlockLedger.id < first_recent)
+    ids = ids.order_by(BlockLedger.id).limit(batch_size).subquery()
+    return db.session.query(func.max(ids.c.id)).scalar()
+
+
+def _fold_batch(checkpoint, end_id, now):
+    """Fold ledger ids (checkpoint.last_ledger_id, end_id] and re-check the wallets they touch."""
+    t = BlockLedger
+    in_batch = (t.id > checkpoint.last_ledger_id, t.id <= end_id)
+    per_user = (
+        db.session.query(
+            t.user_id,
+            func.sum(t.change),
+            func.sum(case((t.entry_type.in_(MINTING_TYPES), t.change), else_=0)),
+            func.count(t.id),
+        )
+        .filter(*in_batch)
+        .group_by(t.user_id)
+        .all()
+    )
+    user_ids = [user_id for user_id, *_ in per_user]
+
+    previous = dict(
+        db.session.query(ReconciledBalance.user_id, ReconciledBalance.ledger_balance)
+        .filter(ReconciledBalance.user_id.in_(user_ids))
+    )
+
+    # Wallet balance and the user's not-yet-folded entries read in one statement,
+    # so a journal committing meanwhile is seen on both sides or neither.
+    tail = (
+        select(func.coalesce(func.sum(t.change), 0))
+        .where(t.user_id == Wallet.user_id, t.id > end_id)
+        .scalar_subquery()
+    )
+    wallets = {
+        user_id: (Decimal(balance), Decimal(pending))
+        for user_id, balance, pending in
+        db.session.query(Wallet.user_id, Wallet.block_balance, tail).filter(Wallet.user_id.in_(user_ids))
+    }
+
+    rows = []
+    for user_id, change, minted, count in per_user:
+        ledger_balance = Decimal(previous.get(user_id, ZERO)) + Decimal(change)
+        balance, pending = wallets.get(user_id, (ZERO, ZERO))
+        rows.append({
+            "user_id": user_id,
+            "ledger_balance": ledger_balance,
+            "last_ledger_id": end_id,
+            "drift": balance - (ledger_balance + pending),
+            "checked_at": now,
+        })
+        checkpoint.ledger_total += Decimal(change)
+        checkpoint.minted_total += Decimal(minted)
+        checkpoint.entries_folded += count
+
+    rows.sort(key=lambda row: row["user_id"])
+    upsert_increment(
+        db.session.connection(), ReconciledBalance.__table__, ("user_id",), rows,
+        replace=("ledger_balance", "last_ledger_id", "drift", "checked_at"),
+    )
+    checkpoint.last_ledger_id = end_id
+    return sum(count for *_, count in per_user)
+
+
+def _check_totals(checkpoint):
+    """Compare the folded totals with the platform_metrics supply rollups."""
+    t = BlockLedger
+    after = t.id > checkpoint.last_ledger_id
+
+    def metric(name):
+        return select(func.coalesce(func.max(PlatformMetric.value), 0)).where(PlatformMetric.name == name).scalar_subquery()
+
+    circulating, minted, pending, pending_minted = db.session.execute(select(
+        metric(CIRCULATING_SUPPLY),
+        metric(MINTED_SUPPLY),
+        select(func.coalesce(func.sum(t.change), 0)).where(after).scalar_subquery(),
+        select(func.coalesce(func.sum(t.change), 0))
+        .where(after, t.entry_type.in_(MINTING_TYPES)).scalar_subquery(),
+    )).one()
+
+    checkpoint.circulating_drift = Decimal(circulating) - (checkpoint.ledger_total + Decimal(pending))
+    checkpoint.minted_drift = Decimal(minted) - (checkpoint.minted_total + Decimal(pending_minted))
+
+    count, total = (
+        db.session.query(func.count(ReconciledBalance.user_id), func.sum(func.abs(ReconciledBalance.drift)))
+        .filter(ReconciledBalance.drift != 0)
+        .one()
+    )
+    checkpoint.wallets_drifting = count
+    checkpoint.wallet_drift_total = Decimal(total or 0)
+
+
+def publish_metrics(checkpoint):
+    SUPPLY_DRIFT.set(float(checkpoint.circulating_drift), kind="circulating")
+    SUPPLY_DRIFT.set(float(checkpoint.minted_drift), kind="minted")
+    SUPPLY_DRIFT.set(float(checkpoint.wallet_drift_total), kind="wallets")
+    DRIFTING_WALLETS.set(checkpoint.wallets_drifting)
+    latest = db.session.query(func.max(BlockLedger.id)).scalar() or 0
+    RECONCILE_LAG.set(max(latest - checkpoint.last_ledger_id, 0))
+
+
+def reconcile_supply(max_batches=None):
+    """
+    Fold ledger entries written since the last run into reconciled_balances and
+    the checkpoint totals, one committed batch of SUPPLY_RECONCILE_BATCH_SIZE
+    entries at a time, then compare the totals with platform_metrics.
+
+    Each batch re-checks only the wallets it touches, so a run costs time in
+    proportion to the new entries, not the ledger's history. Entries younger
+    than SUPPLY_RECONCILE_LAG_SECONDS wait for the next run.
+
+    Returns the checkpoint as a dict, or None if another run is in progress.
+    """
+    batch_size = current_app.config["SUPPLY_RECONCILE_BATCH_SIZE"]
+    lag = timedelta(seconds=current_app.config["SUPPLY_RECONCILE_LAG_SECONDS"])
+
+    batches = 0
+    while True:
+        checkpoint = _lock_checkpoint()
+        if checkpoint is None:
+            db.session.rollback()
+            return None
+
+        now = datetime.utcnow()
+        end_id = None
+        if max_batches is None or batches < max_batches:
+            end_id = _batch_end(checkpoint.last_ledger_id, batch_size, now - lag)
+
+        if end_id is None:
+            _check_totals(checkpoint)
+            checkpoint.last_run_at = now
+            db.session.commit()
+            publish_metrics(checkpoint)
+            return checkpoint.to_dict()
+
+        ENTRIES_FOLDED.inc(_fold_batch(checkpoint, end_id, now))
+        db.session.commit()
+        batches += 1
+
+
+def get_supply_status():
+    """The last reconciliation's findings (an empty checkpoint if it has never run)."""
+    checkpoint = SupplyCheckpoint.query.get(CHECKPOINT)
+    if checkpoint is None:
+        checkpoint = SupplyCheckpoint(
+            name=CHECKPOINT, last_ledger_id=0, entries_folded=0,
+            ledger_total=ZERO, minted_total=ZERO, circulating_drift=ZERO,
+            minted_drift=ZERO, wallets_drifting=0, wallet_drift_total=ZERO,
+        )
+    return checkpoint
+
+
+def drifting_wallets(limit):
+    """Reconciled balances that disagree with their wallet, largest drift first."""
+    return (
+        ReconciledBalance.query.filter(ReconciledBalance.drift != 0)
+        .order_by(func.abs(ReconciledBalance.drift).desc(), ReconciledBalance.user_id)
+        .limit(limit)
+        .all()
+    )
@@ -4,11 +4,57 @@ from flask import Blueprint, jsonify, request
 from decimal import Decimal
 from datetime import datetime, timedelta
 
-from app.models import db, User, Wallet, BlockLedger, Transaction, ExchangeListing
+from app.models import db, User, Wallet, BlockLedger, Transaction, ExchangeListing, LedgerEntryType
 from app.auth.views import token_required
+from app.pagination import parse_limit, keyset_page, iter_json_array, streamed_json
+from app.ledger.summaries import get_summary, rebuild_summaries
+from app.ledger import platform, supply
 
 ledger_bp = Blueprint("ledger", __name__, url_prefix="/ledger")
 
+
+def query_ledger_page(user_id, args):
+    """
+    One keyset page of a user's ledger, newest first, filtered in SQL.
+    Shared by /ledger/history, /ledger/filter and /wallet/ledger.
+    Query params:
+      - type=mining|transfer|referral|listing|allocation
+      - start / end: ISO dates bounding the entry timestamp
+      - limit, cursor
+    Raises ValueError (incl. CursorError) on bad params.
+    """
+    query = BlockLedger.query.filter(BlockLedger.user_id == user_id)
+
+    entry_type = (args.get("type") or "").lower()
+    if entry_type:
+        if entry_type not in LedgerEntryType.ALL:
+            raise ValueError(f"type must be one of: {', '.join(LedgerEntryType.ALL)}")
+        query = query.filter(BlockLedger.entry_type == entry_type)
+
+    start = args.get("start")
+    end = args.get("end")
+    if start:
+        query = query.filter(BlockLedger.timestamp >= datetime.fromisoformat(start))
+    if end:
+        query = query.filter(BlockLedger.timestamp <= datetime.fromisoformat(end))
+
+    return keyset_page(
+        query,
+        [BlockLedger.timestamp, BlockLedger.id],
+        cursor=args.get("cursor"),
+        limit=parse_limit(args.get("limit")),
+    )
+
+
+def _ledger_response(user_id, args):
+    try:
+        entries, next_cursor = query_ledger_page(user_id, args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return streamed_json(iter_json_array(entries, BlockLedger.to_dict), headers=headers)
+
 # -----------------------------------
 # Get current wallet info
 # -----------------------------------
@@ -22,12 +68,14 @@ def get_wallet_summary(user):
     if not wallet:
         return jsonify({"error": "Wallet not found"}), 404
 
+    summary = get_summary(user.id)
     return jsonify({
         "user_id": user.id,
         "block_balance": str(wallet.block_balance),
-        "total_mined": str(wallet.total_mined),
+        "total_mined": str(summary.total_mined),
         "fiat_balance": str(wallet.fiat_balance),
-        "last_updated": wallet.updated_at.isoformat()
+        "totals": summary.to_dict(),
+        "last_updated": (summary.updated_at or wallet.created_at).isoformat()
     })
 
 
@@ -38,28 +86,12 @@ def get_wallet_summary(user):
 @token_required
 def get_ledger_history(user):
     """
-    Returns all ledger entries (block transactions) for a user.
+    Returns ledger entries (block transactions) for a user, one page at a time.
     Query params:
-      - type=mining|spending|transfer|referral
+      - type=mining|transfer|referral|listing|allocation
+      - start, end, limit, cursor (see query_ledger_page)
     """
-    entry_type = request.args.get("type")
-    query = BlockLedger.query.filter_by(user_id=user.id).order_by(BlockLedger.timestamp.desc())
-
-    if entry_type:
-        query = [e for e in query if entry_type.lower() in e.reason.lower()]
-    else:
-        query = query.all()
-
-    return jsonify([
-        {
-            "id": e.id,
-            "change": str(e.change),
-            "balance_after": str(e.balance_after),
-            "reason": e.reason,
-            "timestamp": e.timestamp.isoformat(),
-        }
-        for e in query
-    ])
+    return _ledger_response(user.id, request.args)
 
 
 # -----------------------------------
@@ -117,21 +149,17 @@ def get_platform_summary(user):
     if not user.is_admin:
         return jsonify({"error": "Admin access only"}), 403
 
-    total_wallet_blocks = db.session.query(db.func.sum(Wallet.block_balance)).scalar() or Decimal("0")
-    total_minted = db.session.query(db.func.sum(Wallet.total_mined)).scalar() or Decimal("0")
-    total_transactions = Transaction.query.count()
-    total_fees = db.session.query(db.func.sum(Transaction.platform_fee)).scalar() or Decimal("0")
-
-    active_listings = ExchangeListing.query.filter_by(status="active").count()
-    sold_listings = ExchangeListing.query.filter_by(status="sold").count()
+    metrics = platform.get_platform_metrics()
+    value = lambda name: metrics.get(name, Decimal("0"))
 
     return jsonify({
-        "total_minted": str(total_minted),
-        "circulating_blocks": str(total_wallet_blocks),
-        "total_transactions": total_transactions,
-        "platform_fees_collected": str(total_fees),
-        "active_listings": active_listings,
-        "sold_listings": sold_listings
+        "total_minted": str(value(platform.MINTED_SUPPLY)),
+        "circulating_blocks": str(value(platform.CIRCULATING_SUPPLY)),
+        "total_transactions": int(value(platform.TOTAL_TRANSACTIONS)),
+        "platform_fees_collected": str(value(platform.PLATFORM_FEES)),
+        "active_listings": int(value(platform.listings_metric("ACTIVE"))),
+        "sold_listings": int(value(platform.listings_metric("COMPLETED"))),
+        "metrics": {name: str(v) for name, v in metrics.items()}
     })
 
 
@@ -144,33 +172,44 @@ def filter_ledger_by_date(user):
     """
     Filter block ledger by date range.
     Example query: ?start=2025-01-01&end=2025-02-01
+    Accepts the same type/limit/cursor params as /ledger/history.
     """
-    start = request.args.get("start")
-    end = request.args.get("end")
-
-    if not start or not end:
+    if not request.args.get("start") or not request.args.get("end"):
         return jsonify({"error": "Provide start and end dates"}), 400
 
-    start_date = datetime.fromisoformat(start)
-    end_date = datetime.fromisoformat(end)
-
-    entries = (
-        BlockLedger.query.filter(
-            BlockLedger.user_id == user.id,
-            BlockLedger.timestamp >= start_date,
-            BlockLedger.timestamp <= end_date,
-        )
-        .order_by(BlockLedger.timestamp.desc())
-        .all()
-    )
+    return _ledger_response(user.id, request.args)
+
 
-    return jsonify([
-        {
-            "id": e.id,
-            "change": str(e.change),
-            "balance_after": str(e.balance_after),
-            "reason": e.reason,
-            "timestamp": e.timestamp.isoformat()
-        }
-        for e in entries
-    ])
+# -----------------------------------
+# Maintenance commands
+# -----------------------------------
+@ledger_bp.cli.command("rebuild-summaries")
+def rebuild_summaries_command():
+    """Recompute ledger_summaries from block_ledger (flask ledger rebuild-summaries)."""
+    count = rebuild_summaries()
+    print(f"✅ Rebuilt ledger summaries for {count} users")
+
+
+@ledger_bp.cli.command("reconcile-metrics")
+def reconcile_metrics_command():
+    """Correct platform_metrics drift against the source tables (flask ledger reconcile-metrics)."""
+    drift = platform.reconcile_platform_metrics()
+    if not drift:
+        print("✅ Platform metrics already match")
+    for name, correction in sorted(drift.items()):
+        print(f"⚠️ {name} corrected by {correction}")
+
+
+@ledger_bp.cli.command("reconcile-supply")
+def reconcile_supply_command():
+    """Fold new ledger entries and check block supply (flask ledger reconcile-supply)."""
+    result = supply.reconcile_supply()
+    if result is None:
+        print("⚠️ Another supply reconciliation is running")
+        return
+    print(f"✅ Ledger folded up to entry {result['last_ledger_id']}")
+    if result["wallets_drifting"]:
+        print(f"⚠️ {result['wallets_drifting']} wallets drift by {result['wallet_drift_total']} blocks in total")
+    for kind in ("circulating_drift", "minted_drift"):
+        if Decimal(result[kind]):
+            print(f"⚠️ {kind} {result[kind]}")
@@ -124,6 +124,7 @@ from flask_moment import Moment
 
 
 from app.models import  Product,User
+from app.auth.views import invalidate_principal
 import requests
 
 from datetime import datetime, timedelta
@@ -155,6 +156,7 @@ def update_contact_info():
         user.phone_number = phone_number
         user.email = email
         db.session.commit()
+        invalidate_principal(user.id)
 
         return jsonify({
             'success': True,
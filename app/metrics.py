@@ -0,0 +1,206 @@
+# app/metrics.py
+
+import glob
+import json
+import os
+import threading
+
+# Every metric created below registers itself here so it can be exported later.
+REGISTRY = {}
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._series = {}
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.label_names)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._series)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._series)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, e.g. request latency in seconds."""
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {"buckets": list(s["buckets"]), "sum": s["sum"], "count": s["count"]}
+                for key, s in self._series.items()
+            }
+
+
+# -------------------------------------------------
+# Across worker processes
+# -------------------------------------------------
+#
+# REGISTRY only holds this process's series. With several gunicorn workers,
+# each one writes its snapshot to a shared directory and the worker serving
+# /metrics merges them all (see METRICS_MULTIPROC_DIR).
+
+SNAPSHOT_PATTERN = "metrics-*.json"
+
+
+def write_snapshot(directory, registry=None):
+    """Replace this process's file in `directory` with its current series."""
+    data = {}
+    for name, metric in (registry if registry is not None else REGISTRY).items():
+        data[name] = {
+            "kind": metric.kind,
+            "help": metric.help,
+            "labels": list(metric.label_names),
+            "buckets": list(getattr(metric, "buckets", ())),
+            "series": [[list(key), value] for key, value in metric.snapshot().items()],
+        }
+    path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _Merged:
+    """A metric rebuilt from the snapshots of several processes, for render_prometheus."""
+
+    def __init__(self, kind, help_text, label_names, buckets):
+        self.kind = kind
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def add(self, key, value):
+        current = self._series.get(key)
+        if current is None:
+            self._series[key] = value
+        elif self.kind == "histogram":
+            current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+            current["sum"] += value["sum"]
+            current["count"] += value["count"]
+        else:
+            self._series[key] = current + value
+
+    def snapshot(self):
+        return self._series
+
+
+def collect(directory):
+    """
+    Merge every process's snapshot in `directory` into a registry for
+    render_prometheus. Counters and histograms are summed, keeping the files
+    of exited workers so totals don't go backwards; gauges are per-process
+    values, so each gets a "pid" label and exited workers' gauges are left out.
+    """
+    merged = {}
+    for path in sorted(glob.glob(os.path.join(directory, SNAPSHOT_PATTERN))):
+        pid = os.path.basename(path)[len("metrics-"):-len(".json")]
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue   # being replaced right now; the next scrape reads it
+        for name, metric in data.items():
+            gauge = metric["kind"] == "gauge"
+            if gauge and not _alive(int(pid)):
+                continue
+            labels = metric["labels"] + ["pid"] if gauge else metric["labels"]
+            target = merged.setdefault(name, _Merged(metric["kind"], metric["help"], labels, metric["buckets"]))
+            for key, value in metric["series"]:
+                target.add(tuple(key + [pid]) if gauge else tuple(key), value)
+    return merged
+
+
+# -------------------------------------------------
+# Prometheus text exposition
+# -------------------------------------------------
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(registry=None):
+    """Every registered metric in the Prometheus text format (version 0.0.4)."""
+    lines = []
+    for name, metric in sorted((registry if registry is not None else REGISTRY).items()):
+        lines.append(f"# HELP {name} {_escape(metric.help)}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(metric.snapshot().items()):
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(metric.label_names, key)} {_number(value)}")
+                continue
+            for bound, count in zip(metric.buckets, value["buckets"]):
+                lines.append(f"{name}_bucket{_labels(metric.label_names, key, [('le', _number(float(bound)))])} {count}")
+            lines.append(f"{name}_bucket{_labels(metric.label_names, key, [('le', '+Inf')])} {value['count']}")
+            lines.append(f"{name}_sum{_labels(metric.label_names, key)} {_number(float(value['sum']))}")
+            lines.append(f"{name}_count{_labels(metric.label_names, key)} {value['count']}")
+    return "\n".join(lines) + "\n"
@@ -6,6 +6,7 @@ import enum
 from app import login
 
 from .extensions import db
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from werkzeug.security import generate_password_hash, check_password_hash
 
 @login.user_loader
@@ -23,6 +24,17 @@ class ListingStatus(enum.Enum):
     CANCELLED = "cancelled"
 
 
+class LedgerEntryType:
+    """Values stored in BlockLedger.entry_type."""
+    MINING = "mining"           # newly created blocks (delivery rewards)
+    TRANSFER = "transfer"       # blocks moved between users
+    REFERRAL = "referral"       # referral rewards
+    LISTING = "listing"         # blocks moved into / out of exchange listings
+    ALLOCATION = "allocation"   # initial signup allocation
+
+    ALL = (MINING, TRANSFER, REFERRAL, LISTING, ALLOCATION)
+
+
 # ----------------------------
 # Core models
 # ----------------------------
@@ -36,6 +48,7 @@ class User(db.Model):
     bvn = db.Column(db.String(32), unique=True, nullable=True)
     nin = db.Column(db.String(32), unique=True, nullable=True)
     user_type = db.Column(db.String(32), nullable=False, default="individual")  # individual | venture | company
+    referral_code = db.Column(db.String(12), unique=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     # relationships
@@ -47,10 +60,12 @@ class User(db.Model):
     password = db.Column(db.String(255), nullable=False)  
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from app.auth.passwords import hash_password
+        self.password = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        from app.auth.passwords import verify_password
+        return verify_password(self.password, password)
 
 class Wallet(db.Model):
     """
@@ -120,6 +135,10 @@ class Transaction(db.Model):
     narration = db.Column(db.String(255))
     reference = db.Column(db.String(100), unique=True,nullable=True)
 
+    __table_args__ = (
+        db.Index("ix_transactions_tx_type_created_at", "tx_type", "created_at"),
+    )
+
 class Product(db.Model):
     """
     Physical or digital goods/services listed by a seller.
@@ -139,6 +158,22 @@ class Product(db.Model):
     seller = db.relationship("User", back_populates="products")
     category = db.Column(db.String(1000))
 
+    # Generated by Postgres from title/category/subcategory/description (see migrations).
+    # Never written by the app; SQLite keeps it NULL and search uses app/product/search.py instead.
+    search_vector = db.deferred(db.Column(
+        TSVECTOR().with_variant(db.Text(), "sqlite"),
+        server_default=db.FetchedValue(),
+        server_onupdate=db.FetchedValue(),
+        nullable=True,
+    ))
+
+    __table_args__ = (
+        db.Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        db.Index("ix_products_created_at_id", created_at.desc(), id.desc()),
+        db.Index("ix_products_category_created_at_id", "category", created_at.desc(), id.desc()),
+        db.Index("ix_products_seller_id_created_at_id", "seller_id", created_at.desc(), id.desc()),
+    )
+
 
 class Order(db.Model):
     """
@@ -167,13 +202,53 @@ class Order(db.Model):
     seller = db.relationship("User", foreign_keys=[seller_id], back_populates="orders_sold")
     product = db.relationship("Product")
 
+    __table_args__ = (
+        db.Index("ix_orders_buyer_id_created_at_id", "buyer_id", created_at.desc(), id.desc()),
+        db.Index("ix_orders_seller_id_created_at_id", "seller_id", created_at.desc(), id.desc()),
+        db.Index("ix_orders_buyer_id_status_created_at", "buyer_id", "status", created_at.desc(), id.desc()),
+        db.Index("ix_orders_seller_id_status_created_at", "seller_id", "status", created_at.desc(), id.desc()),
+    )
+
+
 
 
+class SellerEscrow(db.Model):
+    """
+    Naira held in escrow per seller: the open (ESCROWED/DELIVERED) orders and
+    what has already been released to them. Updated in the same transaction as
+    every order status change (app/product/escrow.py); rebuild with
+    `flask product rebuild-escrow`.
+    """
+    __tablename__ = "seller_escrow"
+
+    seller_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    escrow_balance = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    escrowed_orders = db.Column(db.Integer, nullable=False, default=0)
+    released_total = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    released_orders = db.Column(db.Integer, nullable=False, default=0)
+    refunded_total = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_seller_escrow_balance", escrow_balance.desc(), seller_id.desc()),
+    )
+
+    def to_dict(self):
+        return {
+            "seller_id": self.seller_id,
+            "escrow_balance": str(self.escrow_balance),
+            "escrowed_orders": self.escrowed_orders,
+            "released_total": str(self.released_total),
+            "released_orders": self.released_orders,
+            "refunded_total": str(self.refunded_total),
+        }
+
 
 class BlockLedger(db.Model):
     """
     Immutable log of block movements (mined, transfers, initial allocations, marketplace trades).
-    Use this to reconcile total block supply.
+    Folded incrementally into reconciled_balances to check wallets and total supply
+    (app/ledger/supply.py).
     """
     __tablename__ = "block_ledger"
 
@@ -183,8 +258,57 @@ class BlockLedger(db.Model):
     balance_after = db.Column(db.Numeric(18, 2), nullable=False)
     reason = db.Column(db.String(255), nullable=True)
     reference = db.Column(db.String(255), nullable=True)       # optional external refs (order_id, tx_id)
+    entry_type = db.Column(db.String(20), nullable=True)       # LedgerEntryType value
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_block_ledger_user_id_timestamp", "user_id", timestamp.desc(), id.desc()),
+        db.Index("ix_block_ledger_user_id_entry_type_timestamp", "user_id", "entry_type", timestamp.desc(), id.desc()),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "change": str(self.change),
+            "balance_after": str(self.balance_after),
+            "reason": self.reason,
+            "entry_type": self.entry_type,
+            "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+        }
+
+
+class LedgerSummary(db.Model):
+    """
+    Running per-user totals of BlockLedger changes, one row per user.
+    Maintained in the same transaction as every ledger write (app/ledger/summaries.py)
+    so reward and summary endpoints read one row instead of scanning the ledger.
+    Rebuild from the ledger with `flask ledger rebuild-summaries`.
+    """
+    __tablename__ = "ledger_summaries"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    total_mined = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    total_referral = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    total_transferred_in = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    total_transferred_out = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    total_listed = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    total_allocated = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "total_mined": str(self.total_mined),
+            "total_referral": str(self.total_referral),
+            "total_transferred_in": str(self.total_transferred_in),
+            "total_transferred_out": str(self.total_transferred_out),
+            "total_listed": str(self.total_listed),
+            "total_allocated": str(self.total_allocated),
+            "entry_count": self.entry_count,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
 
 class BlockSellListing(db.Model):
     """
@@ -217,12 +341,21 @@ class ExchangeListing(db.Model):
     rate_per_block = db.Column(db.Numeric(18, 2), nullable=False)  # e.g., ₦5 per block
     min_purchase = db.Column(db.Numeric(18, 2), default=0)
     max_purchase = db.Column(db.Numeric(18, 2), default=0)
+    filled_amount = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))  # sold so far
     status = db.Column(db.String(20), default="ACTIVE")  # ACTIVE, COMPLETED, CANCELLED
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     seller = db.relationship("User", backref="exchange_listings")
 
+    __table_args__ = (
+        db.Index("ix_exchange_listings_status_rate_created", "status", "rate_per_block", "created_at"),
+    )
+
+    @property
+    def remaining_amount(self):
+        return Decimal(self.block_amount) - Decimal(self.filled_amount or 0)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -231,6 +364,7 @@ class ExchangeListing(db.Model):
             "rate_per_block": str(self.rate_per_block),
             "min_purchase": str(self.min_purchase),
             "max_purchase": str(self.max_purchase),
+            "remaining_amount": str(self.remaining_amount),
             "status": self.status,
             "created_at": self.created_at.isoformat()
         }
@@ -296,6 +430,40 @@ class ExchangeTx(db.Model):
             "completed_at": self.completed_at.isoformat() if self.completed_at else None
         }
 
+class ExchangeCandle(db.Model):
+    """
+    OHLCV rollup of completed exchange trades, one row per interval bucket
+    ("1m", "1h", "1d"). Updated in the same transaction as every ExchangeTx
+    completion (app/exchange/market.py); rebuild with `flask exchange rebuild-candles`.
+    """
+    __tablename__ = "exchange_candles"
+
+    interval = db.Column(db.String(4), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    open = db.Column(db.Numeric(18, 2), nullable=False)
+    high = db.Column(db.Numeric(18, 2), nullable=False)
+    low = db.Column(db.Numeric(18, 2), nullable=False)
+    close = db.Column(db.Numeric(18, 2), nullable=False)
+    close_at = db.Column(db.DateTime, nullable=True)  # completed_at of the trade that set close
+    volume = db.Column(db.Numeric(24, 2), nullable=False, default=Decimal("0.00"))        # blocks
+    quote_volume = db.Column(db.Numeric(24, 2), nullable=False, default=Decimal("0.00"))  # naira
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "interval": self.interval,
+            "time": self.bucket_start.isoformat(),
+            "open": str(self.open),
+            "high": str(self.high),
+            "low": str(self.low),
+            "close": str(self.close),
+            "volume": str(self.volume),
+            "quote_volume": str(self.quote_volume),
+            "trades": self.trade_count,
+        }
+
+
 class PlatformAccount(db.Model):
     """
     Holds fiat collected as platform/admin fee. Helps reconcile fiat fees.
@@ -306,6 +474,243 @@ class PlatformAccount(db.Model):
     fiat_balance = db.Column(db.Numeric(18, 2), default=Decimal("0.00"))
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
 
+class PaystackEvent(db.Model):
+    """
+    Inbox of verified Paystack webhook deliveries.
+    The webhook only stores the raw event; app/paystack/webhooks.py applies it later.
+    event_key is unique so Paystack retries of the same event are stored once.
+    """
+    __tablename__ = "paystack_events"
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_key = db.Column(db.String(255), nullable=False, unique=True)   # "<event>:<reference or id>"
+    event_type = db.Column(db.String(64), nullable=False)
+    reference = db.Column(db.String(255), nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="PENDING")  # PENDING, PROCESSED, IGNORED, FAILED
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(255), nullable=True)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_paystack_events_status_id", "status", "id"),
+    )
+
+
+class TransferRecipient(db.Model):
+    """
+    Paystack transfer recipients we have already created, one per (bank_code, account_number).
+    Repeat withdrawals to the same account reuse the recipient_code and skip the
+    resolve + create round-trips.
+    """
+    __tablename__ = "transfer_recipients"
+
+    id = db.Column(db.Integer, primary_key=True)
+    bank_code = db.Column(db.String(20), nullable=False)
+    account_number = db.Column(db.String(20), nullable=False)
+    account_name = db.Column(db.String(255), nullable=True)
+    recipient_code = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("bank_code", "account_number", name="uq_transfer_recipients_bank_account"),
+    )
+
+
+class Withdrawal(db.Model):
+    """
+    A fiat withdrawal to a bank account, driven as a state machine by
+    app/paystack/withdrawals.py:
+
+      REQUESTED -> RECIPIENT_READY -> TRANSFER_SENT -> SETTLED -> REVERSED (wallet refunded)
+                \________________\______________\-> FAILED (wallet refunded)
+
+    The wallet is debited when the withdrawal is requested; `reference` is sent to
+    Paystack as the transfer reference, so retries are de-duplicated and the
+    transfer.* webhooks find their way back here.
+    """
+    __tablename__ = "withdrawals"
+
+    REQUESTED = "REQUESTED"
+    RECIPIENT_READY = "RECIPIENT_READY"
+    TRANSFER_SENT = "TRANSFER_SENT"
+    SETTLED = "SETTLED"
+    FAILED = "FAILED"
+    REVERSED = "REVERSED"   # settled, then reversed by the bank (transfer.reversed)
+    IN_FLIGHT = (REQUESTED, RECIPIENT_READY)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    amount = db.Column(db.Numeric(18, 2), nullable=False)   # naira
+    bank_code = db.Column(db.String(20), nullable=False)
+    account_number = db.Column(db.String(20), nullable=False)
+    account_name = db.Column(db.String(255), nullable=True)
+    recipient_code = db.Column(db.String(64), nullable=True)
+    transfer_code = db.Column(db.String(64), nullable=True)
+    reference = db.Column(db.String(100), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default=REQUESTED)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_withdrawals_status_updated_at", "status", "updated_at"),
+        db.Index("ix_withdrawals_user_id_created_at", "user_id", created_at.desc()),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "amount": str(self.amount),
+            "bank_code": self.bank_code,
+            "account_number": self.account_number,
+            "account_name": self.account_name,
+            "reference": self.reference,
+            "status": self.status,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class AccountProvisioning(db.Model):
+    """
+    Paystack dedicated-account provisioning for a new user's wallet, driven as a
+    state machine by app/paystack/accounts.py off the request path:
+
+      PENDING -> CUSTOMER_READY -> READY
+              \________________\-> FAILED
+
+    Kept out of the wallets table so a worker waiting on Paystack holds a lock
+    on this row, not on the wallet balances.
+    """
+    __tablename__ = "account_provisioning"
+
+    PENDING = "PENDING"
+    CUSTOMER_READY = "CUSTOMER_READY"
+    READY = "READY"
+    FAILED = "FAILED"
+    IN_FLIGHT = (PENDING, CUSTOMER_READY)
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    customer_code = db.Column(db.String(50), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_account_provisioning_status_updated_at", "status", "updated_at"),
+    )
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "last_error": self.last_error,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class RevokedToken(db.Model):
+    """
+    JWTs revoked before they expire (logout, refresh-token rotation), keyed by
+    the token's jti. Rows are only needed until `expires_at`; the purge task
+    deletes them after that. Checked through a per-worker Bloom filter
+    (app/auth/revocation.py), not per request.
+    """
+    __tablename__ = "revoked_tokens"
+
+    jti = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    token_type = db.Column(db.String(10), nullable=False, default="access")   # access | refresh
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_revoked_tokens_revoked_at", "revoked_at"),
+        db.Index("ix_revoked_tokens_expires_at", "expires_at"),
+    )
+
+
+class PlatformMetric(db.Model):
+    """
+    Platform-wide rollup counters (circulating/minted supply, fees, listings, users by type).
+    One row per metric name, incremented in the same transaction as the writes that move
+    them (app/ledger/platform.py) and periodically reconciled against the source tables.
+    """
+    __tablename__ = "platform_metrics"
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Numeric(24, 2), nullable=False, default=Decimal("0.00"))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SupplyCheckpoint(db.Model):
+    """
+    Progress and last findings of the supply reconciler (app/ledger/supply.py).
+    Everything in block_ledger up to last_ledger_id has been folded into
+    ledger_total/minted_total and the per-user reconciled_balances.
+    """
+    __tablename__ = "supply_checkpoints"
+
+    name = db.Column(db.String(32), primary_key=True)
+    last_ledger_id = db.Column(db.Integer, nullable=False, default=0)
+    entries_folded = db.Column(db.BigInteger, nullable=False, default=0)
+    ledger_total = db.Column(db.Numeric(24, 2), nullable=False, default=Decimal("0.00"))
+    minted_total = db.Column(db.Numeric(24, 2), nullable=False, default=Decimal("0.00"))
+    circulating_drift = db.Column(db.Numeric(24, 2), nullable=False, default=Decimal("0.00"))
+    minted_drift = db.Column(db.Numeric(24, 2), nullable=False, default=Decimal("0.00"))
+    wallets_drifting = db.Column(db.Integer, nullable=False, default=0)
+    wallet_drift_total = db.Column(db.Numeric(24, 2), nullable=False, default=Decimal("0.00"))
+    last_run_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            "last_ledger_id": self.last_ledger_id,
+            "entries_folded": self.entries_folded,
+            "ledger_total": str(self.ledger_total),
+            "minted_total": str(self.minted_total),
+            "circulating_drift": str(self.circulating_drift),
+            "minted_drift": str(self.minted_drift),
+            "wallets_drifting": self.wallets_drifting,
+            "wallet_drift_total": str(self.wallet_drift_total),
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+class ReconciledBalance(db.Model):
+    """
+    A user's block balance as implied by the ledger (sum of their changes up to
+    last_ledger_id), and how far their wallet was from it when last checked.
+    """
+    __tablename__ = "reconciled_balances"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    ledger_balance = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    last_ledger_id = db.Column(db.Integer, nullable=False, default=0)
+    drift = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))   # wallet - ledger
+    checked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index(
+            "ix_reconciled_balances_drifting", "user_id",
+            postgresql_where=db.text("drift <> 0"), sqlite_where=db.text("drift <> 0"),
+        ),
+    )
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "ledger_balance": str(self.ledger_balance),
+            "drift": str(self.drift),
+            "last_ledger_id": self.last_ledger_id,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+        }
+
+
 class Referral(db.Model):
     __tablename__ = "referrals"
 
@@ -314,11 +719,51 @@ class Referral(db.Model):
     referred_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     referral_code = db.Column(db.String(12), nullable=False)
     bonus_amount = db.Column(db.Float, default=0)
+    rewarded = db.Column(db.Boolean, nullable=False, default=False)
+    rewarded_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
     referrer = db.relationship("User", foreign_keys=[referrer_id], backref="referrals_made")
     referred = db.relationship("User", foreign_keys=[referred_id], backref="referral_received")
 
+    __table_args__ = (
+        db.Index("ix_referrals_referrer_id_created_at_id", "referrer_id", created_at.desc(), id.desc()),
+        db.Index("ix_referrals_referred_id", "referred_id"),
+    )
+
     def __repr__(self):
         return f"<Referral {self.referrer_id} → {self.referred_id} ({self.bonus_amount})>"
+
+
+class ReferralStat(db.Model):
+    """
+    Per-referrer referral counts and reward total, one row per referrer.
+    Maintained in the same transaction as referral writes (app/wallet/referrals.py)
+    so the leaderboard is an index scan instead of a GROUP BY over referrals.
+    Rebuild with `flask wallet rebuild-referral-stats`.
+    """
+    __tablename__ = "referral_stats"
+
+    referrer_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    referral_count = db.Column(db.Integer, nullable=False, default=0)
+    rewarded_count = db.Column(db.Integer, nullable=False, default=0)
+    reward_total = db.Column(db.Numeric(18, 2), nullable=False, default=Decimal("0.00"))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_referral_stats_referral_count", referral_count.desc(), "referrer_id"),
+    )
+
+    @property
+    def pending_count(self):
+        return self.referral_count - self.rewarded_count
+
+    def to_dict(self):
+        return {
+            "referrer_id": self.referrer_id,
+            "referral_count": self.referral_count,
+            "rewarded_count": self.rewarded_count,
+            "pending_count": self.pending_count,
+            "reward_total": str(self.reward_total),
+        }
@@ -0,0 +1,152 @@
+# app/pagination.py
+
+import base64
+import binascii
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from flask import Response, stream_with_context
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class CursorError(ValueError):
+    """Raised when a client sends a malformed cursor or page size."""
+
+
+# -------------------------------------------------
+# Request parsing
+# -------------------------------------------------
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a ?limit= query param into 1..maximum."""
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise CursorError("limit must be an integer")
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(values):
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values],
+        separators=(",", ":"),
+        default=str,
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _coerce(column, value):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(str(value))
+    return python_type(value)
+
+
+def decode_cursor(cursor, columns):
+    """Decode an opaque cursor back into typed values for `columns`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor length mismatch")
+        return tuple(_coerce(col, v) for col, v in zip(columns, values))
+    except (binascii.Error, ValueError, TypeError, ArithmeticError):
+        raise CursorError("Invalid cursor")
+
+
+# -------------------------------------------------
+# Keyset pagination
+# -------------------------------------------------
+
+def keyset_page(query, columns, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=True, key=None):
+    """
+    Fetch one page of `query` ordered by `columns` (e.g. created_at, id).
+
+    Uses a row-value comparison on the sort key instead of OFFSET so every page
+    is a bounded index range scan. Returns (rows, next_cursor); next_cursor is
+    None on the last page.
+    """
+    if key is None:
+        key = lambda row: tuple(getattr(row, col.key) for col in columns)
+
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if descending:
+            query = query.filter(tuple_(*columns) < tuple_(*values))
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    order = [col.desc() if descending else col.asc() for col in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(key(rows[-1]))
+    return rows, next_cursor
+
+
+# -------------------------------------------------
+# Streaming JSON
+# -------------------------------------------------
+
+def iter_json_array(items, serialize):
+    """Encode `items` one element at a time instead of building the whole body."""
+    yield "["
+    for i, item in enumerate(items):
+        if i:
+            yield ","
+        yield json.dumps(serialize(item), default=str)
+    yield "]"
+
+
+def iter_json_object(key, items, serialize, **fields):
+    """Stream {"<key>": [...], **fields}; the extra fields are written after the array."""
+    yield "{" + json.dumps(key) + ":"
+    yield from iter_json_array(items, serialize)
+    for name, value in fields.items():
+        yield "," + json.dumps(name) + ":" + json.dumps(value, default=str)
+    yield "}"
+
+
+def iter_ndjson(items, serialize):
+    """One JSON document per line, for exports too large to hold as one array."""
+    for item in items:
+        yield json.dumps(serialize(item), default=str) + "\n"
+
+
+def iter_csv(items, fields, serialize):
+    """A CSV header row of `fields`, then one row per item from serialize(item) dicts."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writeheader()
+    yield flush()
+    for item in items:
+        writer.writerow(serialize(item))
+        yield flush()
+
+
+def streamed_json(chunks, status=200, headers=None, mimetype="application/json"):
+    return Response(
+        stream_with_context(chunks),
+        status=status,
+        mimetype=mimetype,
+        headers=headers,
+    )
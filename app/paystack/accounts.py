@@ -0,0 +1,164 @@
+# app/paystack/accounts.py
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.models import db, User, Wallet, AccountProvisioning
+from app.paystack.client import paystack, PaystackError
+from app.realtime import notify_user
+
+
+# -------------------------------------------------
+# Request path
+# -------------------------------------------------
+
+def queue_provisioning(user):
+    """
+    Record a PENDING provisioning row for `user` in the caller's transaction.
+    No Paystack call happens here; once committed, the caller enqueues
+    app.tasks.provision_dedicated_account.
+    """
+    provisioning = AccountProvisioning(user_id=user.id, status=AccountProvisioning.PENDING)
+    db.session.add(provisioning)
+    return provisioning
+
+
+def provisioning_status(wallet, provisioning):
+    """What /api/wallet reports, including wallets created before provisioning was tracked."""
+    if provisioning is not None:
+        return provisioning.to_dict()
+    status = AccountProvisioning.READY if wallet.paystack_dedicated_account else None
+    return {"status": status, "last_error": None, "updated_at": None}
+
+
+# -------------------------------------------------
+# Worker steps
+# -------------------------------------------------
+
+def _phone(user):
+    return "+234" + user.phone
+
+
+def _fail(provisioning, reason):
+    provisioning.status = AccountProvisioning.FAILED
+    provisioning.last_error = (reason or "Account provisioning failed")[:255]
+    notify_user(provisioning.user_id, "wallet.account", provisioning.to_dict())
+
+
+def _create_customer(provisioning, user, wallet):
+    name_parts = user.name.strip().split()
+    resp = paystack.create_customer({
+        "email": user.email,
+        "first_name": name_parts[0] if name_parts else "",
+        "last_name": name_parts[-1] if len(name_parts) > 1 else "",
+        "phone": _phone(user),
+    })
+    if not resp.get("status"):
+        _fail(provisioning, resp.get("message") or "Customer creation failed")
+        return
+    provisioning.customer_code = resp["data"]["customer_code"]
+    wallet.paystack_customer_code = provisioning.customer_code
+    provisioning.status = AccountProvisioning.CUSTOMER_READY
+
+
+def _create_dedicated_account(provisioning, user, wallet):
+    resp = paystack.create_dedicated_account({
+        "customer": provisioning.customer_code,
+        "phone": _phone(user),
+        "preferred_bank": "wema-bank",   # or "titan-paystack"
+        "country": "NG",
+    })
+    if not resp.get("status"):
+        _fail(provisioning, resp.get("message") or "Dedicated account creation failed")
+        return
+    account = resp["data"]
+    wallet.paystack_dedicated_account = account["account_number"]
+    wallet.paystack_bank_name = account["bank"]["name"]
+    provisioning.status = AccountProvisioning.READY
+    provisioning.last_error = None
+    notify_user(provisioning.user_id, "wallet.account", dict(
+        provisioning.to_dict(),
+        paystack_dedicated_account=wallet.paystack_dedicated_account,
+        paystack_bank_name=wallet.paystack_bank_name,
+    ))
+
+
+STEPS = {
+    AccountProvisioning.PENDING: _create_customer,
+    AccountProvisioning.CUSTOMER_READY: _create_dedicated_account,
+}
+
+
+def provision_account(user_id):
+    """
+    Drive a user's dedicated-account provisioning until it is READY or FAILED.
+    Each step commits separately and re-locks the provisioning row with SKIP
+    LOCKED, so only one worker drives it; the wallet row is only touched when a
+    step has its answer, never locked across the Paystack call.
+
+    Transient Paystack errors are recorded and re-raised so the task retries;
+    after ACCOUNT_PROVISION_MAX_ATTEMPTS in a row the provisioning is FAILED.
+    Returns the status, or None if another worker holds it.
+    """
+    max_attempts = current_app.config["ACCOUNT_PROVISION_MAX_ATTEMPTS"]
+
+    while True:
+        provisioning = (
+            AccountProvisioning.query.filter_by(user_id=user_id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if provisioning is None:
+            db.session.rollback()
+            return None
+
+        step = STEPS.get(provisioning.status)
+        if step is None:
+            db.session.commit()
+            return provisioning.status
+
+        user = db.session.get(User, user_id)
+        wallet = Wallet.query.filter_by(user_id=user_id).first()
+        try:
+            step(provisioning, user, wallet)
+        except PaystackError as e:
+            provisioning.attempts += 1
+            provisioning.last_error = str(e)[:255]
+            if provisioning.attempts >= max_attempts:
+                _fail(provisioning, str(e))
+                db.session.commit()
+                return provisioning.status
+            db.session.commit()
+            raise
+
+        provisioning.attempts = 0
+        db.session.commit()
+
+
+def retry_provisioning(user_id):
+    """Put a FAILED provisioning back to where it stopped. Returns it, or None if not FAILED."""
+    provisioning = AccountProvisioning.query.filter_by(user_id=user_id).with_for_update().first()
+    if provisioning is None or provisioning.status != AccountProvisioning.FAILED:
+        db.session.rollback()
+        return None
+    provisioning.status = (
+        AccountProvisioning.CUSTOMER_READY if provisioning.customer_code else AccountProvisioning.PENDING
+    )
+    provisioning.attempts = 0
+    provisioning.last_error = None
+    db.session.commit()
+    return provisioning
+
+
+def stalled_provisioning_ids():
+    """User ids of in-flight provisionings nobody has touched for ACCOUNT_PROVISION_STALE_SECONDS."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config["ACCOUNT_PROVISION_STALE_SECONDS"])
+    rows = (
+        db.session.query(AccountProvisioning.user_id)
+        .filter(AccountProvisioning.status.in_(AccountProvisioning.IN_FLIGHT),
+                AccountProvisioning.updated_at < cutoff)
+        .order_by(AccountProvisioning.user_id)
+        .limit(current_app.config["ACCOUNT_PROVISION_SWEEP_BATCH_SIZE"])
+    )
+    return [user_id for (user_id,) in rows]
@@ -0,0 +1,252 @@
+# app/paystack/client.py
+
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.metrics import Counter, Histogram
+
+PAYSTACK_BASE_URL = "https://api.paystack.co"
+
+# (connect, read) timeouts in seconds per endpoint; transfers get the longest read window
+ENDPOINT_TIMEOUTS = {
+    "bank": (3.05, 10),
+    "bank_resolve": (3.05, 10),
+    "customer": (3.05, 15),
+    "dedicated_account": (3.05, 20),
+    "transferrecipient": (3.05, 15),
+    "transfer": (3.05, 30),
+    "transfer_verify": (3.05, 10),
+    "balance_ledger": (3.05, 10),
+}
+DEFAULT_TIMEOUT = (3.05, 15)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+request_latency = Histogram(
+    "paystack_request_seconds",
+    "Paystack API request latency by endpoint and outcome.",
+    ("endpoint", "outcome"),
+)
+request_retries = Counter(
+    "paystack_request_retries_total",
+    "Paystack API requests retried after a transient failure.",
+    ("endpoint",),
+)
+breaker_rejections = Counter(
+    "paystack_circuit_open_total",
+    "Paystack API calls refused because the endpoint's circuit was open.",
+    ("endpoint",),
+)
+
+
+class PaystackError(Exception):
+    """Paystack could not be reached or answered with an unusable response."""
+
+
+class CircuitOpenError(PaystackError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class PaystackClient:
+    """
+    Shared Paystack API client.
+
+    One keep-alive requests.Session serves every call, so TLS connections are
+    pooled across requests. Every call is bounded by its endpoint's timeout;
+    idempotent calls (GETs) are retried with jittered exponential backoff, and
+    each endpoint has its own circuit breaker so a failing Paystack API is
+    refused fast instead of tying up workers.
+
+    Methods return Paystack's JSON body ({"status": ..., "message": ..., "data": ...}),
+    including for 4xx answers (lookups that pass missing_ok get None for a 404);
+    transport failures and exhausted 429/5xx answers raise PaystackError.
+    """
+
+    def __init__(self, secret=None, base_url=PAYSTACK_BASE_URL, pool_size=10,
+                 max_retries=2, backoff=0.3, breaker_threshold=5, breaker_reset=30):
+        self.secret = secret
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+        self.session = self._build_session(pool_size)
+
+    def init_app(self, app):
+        self.secret = app.config.get("PAYSTACK_SECRET") or self.secret
+        self.max_retries = app.config["PAYSTACK_MAX_RETRIES"]
+        self.backoff = app.config["PAYSTACK_RETRY_BACKOFF"]
+        self.breaker_threshold = app.config["PAYSTACK_BREAKER_THRESHOLD"]
+        self.breaker_reset = app.config["PAYSTACK_BREAKER_RESET_SECONDS"]
+        self.session = self._build_session(app.config["PAYSTACK_POOL_SIZE"])
+        with self._breakers_lock:
+            self._breakers.clear()
+
+    @staticmethod
+    def _build_session(pool_size):
+        session = requests.Session()
+        # Retries are handled in request() so only idempotent calls are repeated
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Content-Type"] = "application/json"
+        return session
+
+    def breaker(self, endpoint):
+        with self._breakers_lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return breaker
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter: spread retries from concurrent workers apart
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def request(self, method, path, endpoint, params=None, json=None, idempotent=None, missing_ok=False):
+        if idempotent is None:
+            idempotent = method.upper() == "GET"
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        timeout = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+        breaker = self.breaker(endpoint)
+        headers = {"Authorization": f"Bearer {self.secret}"}
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                breaker_rejections.inc(endpoint=endpoint)
+                raise CircuitOpenError(f"Paystack {endpoint} is unavailable; try again shortly")
+
+            started = time.perf_counter()
+            response = error = None
+            try:
+                response = self.session.request(
+                    method, f"{self.base_url}/{path}", params=params, json=json,
+                    headers=headers, timeout=timeout,
+                )
+            except requests.RequestException as e:
+                error = e
+            finally:
+                # Settle every attempt, even on an unexpected error, so a
+                # half-open trial is never left in flight
+                if response is None or response.status_code in RETRY_STATUSES:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+            if error is not None:
+                request_latency.observe(time.perf_counter() - started, endpoint=endpoint, outcome="error")
+                if attempt + 1 < attempts:
+                    request_retries.inc(endpoint=endpoint)
+                    self._sleep_before_retry(attempt)
+                    continue
+                raise PaystackError(f"Paystack {endpoint} request failed: {error}") from error
+
+            request_latency.observe(time.perf_counter() - started, endpoint=endpoint, outcome=str(response.status_code))
+
+            if response.status_code in RETRY_STATUSES:
+                if attempt + 1 < attempts:
+                    request_retries.inc(endpoint=endpoint)
+                    self._sleep_before_retry(attempt)
+                    continue
+                raise PaystackError(f"Paystack {endpoint} returned HTTP {response.status_code}")
+            if missing_ok and response.status_code == 404:
+                return None
+
+            try:
+                return response.json()
+            except ValueError:
+                raise PaystackError(f"Paystack {endpoint} returned HTTP {response.status_code} without JSON")
+
+    # -------------------------------------------------
+    # Endpoints
+    # -------------------------------------------------
+
+    def list_banks(self):
+        return self.request("GET", "bank", "bank")
+
+    def resolve_account(self, account_number, bank_code):
+        return self.request(
+            "GET", "bank/resolve", "bank_resolve",
+            params={"account_number": account_number, "bank_code": bank_code},
+        )
+
+    def create_customer(self, payload):
+        return self.request("POST", "customer", "customer", json=payload)
+
+    def create_dedicated_account(self, payload):
+        return self.request("POST", "dedicated_account", "dedicated_account", json=payload)
+
+    def create_transfer_recipient(self, payload):
+        # Paystack de-duplicates recipients by account details, so a retry is safe
+        return self.request("POST", "transferrecipient", "transferrecipient", json=payload, idempotent=True)
+
+    def initiate_transfer(self, payload):
+        # Only retried when the caller supplies a reference Paystack can de-duplicate on
+        return self.request("POST", "transfer", "transfer", json=payload, idempotent=bool(payload.get("reference")))
+
+    def verify_transfer(self, reference):
+        # None when Paystack has no transfer under this reference
+        return self.request("GET", f"transfer/verify/{reference}", "transfer_verify", missing_ok=True)
+
+    def balance_ledger(self):
+        return self.request("GET", "balance/ledger", "balance_ledger")
+
+
+paystack = PaystackClient(secret=os.getenv("PAYSTACK_SECRET"))
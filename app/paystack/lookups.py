@@ -0,0 +1,120 @@
+# app/paystack/lookups.py
+
+import logging
+import time
+
+from flask import current_app
+
+from app.cache import SharedCache
+from app.paystack.client import paystack, PaystackError
+
+BANKS_KEY = "banks"
+BANKS_REFRESH_LOCK = "banks:refreshing"
+
+logger = logging.getLogger("app.paystack")
+
+# Bank list: {"banks": [...], "fetched_at": epoch seconds}. Entries outlive their
+# freshness window so a stale copy can be served while a worker refreshes it.
+bank_cache = SharedCache("paystack:banks", maxsize=4, ttl=6 * 3600)
+
+# Account-name resolution keyed by "bank_code:account_number"
+account_cache = SharedCache("paystack:resolve", maxsize=10000, ttl=24 * 3600)
+
+
+def init_app(app):
+    redis_url = app.config.get("CACHE_REDIS_URL")
+    bank_cache.init_redis(redis_url)
+    account_cache.init_redis(redis_url)
+    bank_cache.configure(ttl=app.config["BANK_LIST_TTL"] + app.config["BANK_LIST_STALE_SECONDS"])
+    account_cache.configure(
+        maxsize=app.config["ACCOUNT_RESOLVE_CACHE_SIZE"],
+        ttl=app.config["ACCOUNT_RESOLVE_TTL"],
+    )
+
+
+# -------------------------------------------------
+# Bank list (TTL + stale-while-revalidate)
+# -------------------------------------------------
+
+def refresh_banks():
+    """Fetch the bank list from Paystack and store it; returns the list or None."""
+    try:
+        resp = paystack.list_banks()
+    except PaystackError:
+        return None
+    if not resp.get("status"):
+        return None
+
+    banks = resp.get("data") or []
+    bank_cache.set(BANKS_KEY, {"banks": banks, "fetched_at": time.time()})
+    return banks
+
+
+def _revalidate_in_background():
+    # Only one worker refreshes a stale list at a time
+    if not bank_cache.add(BANKS_REFRESH_LOCK, 1, ttl=60):
+        return
+    from app.tasks import refresh_paystack_banks
+    try:
+        refresh_paystack_banks.delay()
+    except Exception:
+        bank_cache.pop(BANKS_REFRESH_LOCK)
+        logger.warning("could not enqueue bank list refresh", exc_info=True)
+
+
+def get_banks():
+    """
+    Bank list for withdrawal forms. Fresh copies are served from the cache,
+    stale ones are served while a background refresh runs, and Paystack is
+    only called inline when nothing is cached. A stale local copy is checked
+    against Redis first, so a refresh stored by the Celery task is picked up
+    by every worker. Returns [] if Paystack is down and nothing is cached.
+    """
+    entry = bank_cache.get(BANKS_KEY)
+    if entry is None:
+        return refresh_banks() or []
+
+    if _is_stale(entry):
+        # This worker's copy may predate a refresh another process stored
+        entry = bank_cache.reload(BANKS_KEY, entry)
+        if _is_stale(entry):
+            _revalidate_in_background()
+    return entry["banks"]
+
+
+def _is_stale(entry):
+    return time.time() - entry["fetched_at"] > current_app.config["BANK_LIST_TTL"]
+
+
+# -------------------------------------------------
+# Account-name resolution (LRU + negative caching)
+# -------------------------------------------------
+
+def resolve_account(account_number, bank_code):
+    """
+    Resolve an account number to its name, shaped like Paystack's response
+    ({"status", "message", "data": {"account_name", ...}}).
+
+    Successful lookups are cached for ACCOUNT_RESOLVE_TTL. Paystack's "could not
+    resolve" answers are cached for ACCOUNT_RESOLVE_NEGATIVE_TTL so retyping a
+    wrong number doesn't keep hitting the API. Transport errors are never cached
+    and raise PaystackError.
+    """
+    key = f"{bank_code}:{account_number}"
+    cached = account_cache.get(key)
+    if cached is not None:
+        return cached
+
+    resp = paystack.resolve_account(account_number, bank_code)
+    if resp.get("status"):
+        data = resp.get("data") or {}
+        result = {
+            "status": True,
+            "message": resp.get("message"),
+            "data": {"account_name": data.get("account_name"), "account_number": data.get("account_number")},
+        }
+        account_cache.set(key, result)
+    else:
+        result = {"status": False, "message": resp.get("message") or "Unable to resolve account", "data": None}
+        account_cache.set(key, result, ttl=current_app.config["ACCOUNT_RESOLVE_NEGATIVE_TTL"])
+    return result
@@ -130,7 +130,7 @@ from email.mime.text import MIMEText
 from flask_dance.contrib.facebook import facebook
 from flask_dance.contrib.google import google
 
-from app.models  import User,Wallet,Transaction
+from app.models  import User,Wallet,Transaction,Withdrawal
 from app import db
 from app.paystack import bp as paystack_bp
 
@@ -138,7 +138,14 @@ from flask import Flask, request, jsonify, render_template, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
 from config import Config
 from app.auth.views import token_required
-import requests, hmac, hashlib, os
+from app.auth.passwords import verify_password
+from app.paystack.webhooks import store_event
+from app.paystack.client import paystack, PaystackError
+from app.paystack.lookups import get_banks, resolve_account
+from app.paystack.withdrawals import request_withdrawal, WithdrawalError
+from decimal import Decimal, InvalidOperation
+from app.tasks import process_paystack_events, advance_withdrawal
+import requests, hmac, hashlib, logging, os
 
 from dotenv import load_dotenv
 
@@ -146,6 +153,8 @@ load_dotenv()  # loads variables from .env file into environment
 
 PAYSTACK_SECRET = os.getenv("PAYSTACK_SECRET")
 
+logger = logging.getLogger("app.paystack")
+
 # ===========================
 # Home
 # ===========================
@@ -170,12 +179,6 @@ def create_main_account(user):
         flash('Submit your phone number to create a bank account')
         return redirect(url_for('main.settings'))
 
-
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET}",
-        "Content-Type": "application/json"
-    }
-
     # ---------------------------
     # STEP 1: Create Customer
     # ---------------------------
@@ -186,9 +189,13 @@ def create_main_account(user):
         "phone": '+234'+ user.phone  # must be valid, required
     }
 
-    r = requests.post("https://api.paystack.co/customer", headers=headers, json=customer_payload)
-    customer_data = r.json()
-    print("CUSTOMER RESPONSE:", customer_data)
+    try:
+        customer_data = paystack.create_customer(customer_payload)
+    except PaystackError as e:
+        return jsonify({"error": str(e)}), 503
+    logger.debug("paystack customer response", extra={
+        "user_id": user.id, "ok": bool(customer_data.get("status")), "paystack_message": customer_data.get("message"),
+    })
 
     if not customer_data.get("status"):
         return jsonify({"error": customer_data.get("message")}), 400
@@ -205,9 +212,13 @@ def create_main_account(user):
         "country": "NG"
     }
 
-    r = requests.post("https://api.paystack.co/dedicated_account", headers=headers, json=dedicated_payload)
-    resp = r.json()
-    print("DEDICATED RESPONSE:", resp)
+    try:
+        resp = paystack.create_dedicated_account(dedicated_payload)
+    except PaystackError as e:
+        return jsonify({"error": str(e)}), 503
+    logger.debug("paystack dedicated account response", extra={
+        "user_id": user.id, "ok": bool(resp.get("status")), "paystack_message": resp.get("message"),
+    })
 
     if not resp.get("status"):
         return jsonify(resp), 400
@@ -279,9 +290,6 @@ def paystack_webhook():
     payload = request.data
     signature = request.headers.get("x-paystack-signature")
 
-    print(payload)
-
-
 
     # Verify signature
     expected = hmac.new(PAYSTACK_SECRET.encode(), payload, hashlib.sha512).hexdigest()
@@ -323,13 +331,9 @@ def paystack_webhook():
 
     elif event["event"] == "transfer.success":
         # Mark withdrawal as successful (optional logging)
-        print('successful')
-
         pass
 
     elif event["event"] == "transfer.failed":
-        print('unsuccessful')
-
         # Refund wallet (optional)
         pass
 
@@ -338,83 +342,31 @@ def paystack_webhook():
 
 @paystack_bp.route("/webhook/paystack", methods=["POST"])
 def paystack_webhook():
+    """
+    Verify the signature, store the raw event in the paystack_events inbox and
+    acknowledge immediately. Wallet credits/refunds are applied by the
+    process_paystack_events Celery task (app/paystack/webhooks.py).
+    """
     payload = request.data
     signature = request.headers.get("x-paystack-signature")
 
     # Verify signature
     expected = hmac.new(PAYSTACK_SECRET.encode(), payload, hashlib.sha512).hexdigest()
-    if signature != expected:
+    if not signature or not hmac.compare_digest(signature, expected):
         return jsonify({"error": "Invalid signature"}), 400
 
-    event = request.json
-
-    # --------------------
-    # Handle deposit
-    # --------------------
-    if event["event"] == "charge.success":
-        data = event["data"]
-        reference = data.get("reference")
-        email = data["customer"]["email"]
-        amount = data["amount"] / 100  # convert from kobo to naira
-        sender_name = data["authorization"].get("sender_name")
-        sender_bank = data["authorization"].get("sender_bank")
-
-        user = Wallet.query.filter_by(email=email).first()
-        existing = Transaction.query.filter_by(reference=reference).first()
-        if existing:
-            return jsonify({"message": "Duplicate webhook - already credited"}), 200
-
-        if user:
-            user.fiat_balance += amount
-
-            txn = Transaction(
-                tx_type='deposit',
-                description=f"Deposit from {sender_name} - {sender_bank}",
-                receiver_id=user.id,
-                amount=amount,
-                reference=reference,
-                status="successful",
-                narration="deposit"
-            )
-
-            db.session.add(txn)
-            db.session.commit()
-
-    # --------------------
-    # Handle withdrawal success
-    # --------------------
-    elif event["event"] == "transfer.success":
-        data = event["data"]
-        reference = data.get("reference")
-
-        withdrawal = Transaction.query.filter_by(reference=reference, tx_type="withdrawal").first()
-        if withdrawal:
-            withdrawal.status = "successful"
-            withdrawal.description = f"Withdrawal successful to {data.get('recipient', {}).get('details', {}).get('bank_name', 'Bank')}"
-            db.session.commit()
-
-        print(f"Withdrawal {reference} marked successful.")
-
-    # --------------------
-    # Handle withdrawal failure
-    # --------------------
-    elif event["event"] == "transfer.failed":
-        data = event["data"]
-        reference = data.get("reference")
-        amount = data.get("amount", 0) / 100
-
-        withdrawal = Transaction.query.filter_by(reference=reference, tx_type="withdrawal").first()
-        if withdrawal:
-            withdrawal.status = "failed"
+    event = request.get_json(silent=True)
+    if not event or not event.get("event"):
+        return jsonify({"error": "Invalid payload"}), 400
 
-            # Refund wallet
-            user = Wallet.query.get(withdrawal.account_id)
-            if user:
-                user.fiat_balance += amount
-
-            db.session.commit()
+    if not store_event(event):
+        return jsonify({"status": "ok", "message": "Duplicate event"}), 200
 
-        print(f"Withdrawal {reference} failed. Refunded {amount} to user.")
+    try:
+        process_paystack_events.delay()
+    except Exception:
+        # Stored events are still picked up by the periodic sweep
+        logger.warning("could not enqueue Paystack event processing", exc_info=True)
 
     return jsonify({"status": "ok"}), 200
 
@@ -429,25 +381,13 @@ def wallet(email):
     return render_template("wallet.html", user=user)
 
 
-# app.py
-from flask import Flask, request, render_template, jsonify
-import requests
-import os
-
-
-PAYSTACK_BASE_URL = "https://api.paystack.co"
-
-headers = {
-    "Authorization": f"Bearer {PAYSTACK_SECRET}",
-    "Content-Type": "application/json"
-}
-
 # ---------- Fetch list of banks ----------
 
 def get_transfer_balance():
-    url = "https://api.paystack.co/balance/ledger"
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    try:
+        data = paystack.balance_ledger()
+    except PaystackError as e:
+        return {"status": False, "message": str(e)}
 
     balances = data.get("data", [])
     if not balances:
@@ -463,226 +403,102 @@ def get_transfer_balance():
     }
 
 from app.utils import has_exhausted_initial_blocks
-# ✅ Withdraw route (GET: show form with banks, POST: process transfer)
-@paystack_bp.route('/withdraw', methods=['GET', 'POST'])
-@token_required
-def withdraw(user):
+
+
+def _request_withdrawal(user):
+    """
+    Accept a withdrawal: debit the wallet, persist it as REQUESTED and hand it to
+    the advance_withdrawal worker. Paystack is never called inside the request.
+    """
     main_account = Wallet.query.filter_by(user_id=user.id).first()
+    if not main_account:
+        return jsonify({"error": "Wallet not found"}), 404
 
     if not has_exhausted_initial_blocks(user):
         return jsonify({
             "error": (
                 f"You must spend up to your initial allocation of "
-                f"{wallet.initial_block_allocation:,.0f} blocks before withdrawals are enabled."
+                f"{main_account.initial_block_allocation:,.0f} blocks before withdrawals are enabled."
             )
         }), 403
 
-    balance_data = get_transfer_balance()
-    ledger_balances = balance_data.get("data", [])
-
-    if not ledger_balances:
-        return {
-            "status": False,
-            "message": "No transfer ledger found. Fund your Transfer Balance from the Paystack Dashboard."
-        }
-
-    ledger_balance = int(ledger_balances[0]["balance"])
-
-    if request.method == 'GET':
-
-        # Fetch banks for dropdown
-
-        banks_url = "https://api.paystack.co/bank"
-        response = requests.get(banks_url, headers=headers)
-        banks = response.json().get("data", []) if response.ok else []
-        return render_template("withdraw.html", banks=banks)
-
-    if request.method == 'POST':
-        bank_code = request.form['bank_code']
-        account_number = request.form['account_number']
-        amount = int(request.form['amount']) # Convert to kobo
-        print(amount,'this is amount here!!!!!')
-        password = request.form['password']
-        if not user.verify_password(password):
-            flash('incorrect password')
-            return redirect(request.referrer)
-
-        if not main_account.deposit_withdraw('withdraw', amount):
-            flash('insufficient fund!!')
-            return redirect(request.referrer)
-
-        # 1. Resolve account number
-        resolve_url = f"https://api.paystack.co/bank/resolve?account_number={account_number}&bank_code={bank_code}"
-        resolve_resp = requests.get(resolve_url, headers=headers).json()
-        if not resolve_resp.get("status"):
-            flash("Account resolution failed. Try again.", "danger")
-            return redirect(url_for("paystack.withdraw_page"))
-
-        account_name = resolve_resp["data"]["account_name"]
-
-        # 2. Create recipient
-        recipient_url = "https://api.paystack.co/transferrecipient"
-        recipient_payload = {
-            "type": "nuban",
-            "name": account_name,
-            "account_number": account_number,
-            "bank_code": bank_code,
-            "currency": "NGN"
-        }
-        recipient_resp = requests.post(recipient_url, headers=headers, json=recipient_payload).json()
-        if not recipient_resp.get("status"):
-            flash("Recipient creation failed.", "danger")
-            return redirect(url_for("paystack.withdraw_page"))
-
-        recipient_code = recipient_resp["data"]["recipient_code"]
-
-        # 3. Initiate transfer
-        transfer_url = "https://api.paystack.co/transfer"
-        transfer_payload = {
-            "source": "balance",
-            "amount": amount,
-            "recipient": recipient_code,
-            "reason": "Withdrawal from app"
-        }
-        transfer_resp = requests.post(transfer_url, headers=headers, json=transfer_payload).json()
+    data = request.get_json(silent=True) or request.form
+    bank_code = (data.get("bank_code") or "").strip()
+    account_number = (data.get("account_number") or "").strip()
+    password = data.get("password") or ""
+    if not bank_code or not account_number:
+        return jsonify({"error": "bank_code and account_number are required"}), 400
 
-        print(transfer_resp)
+    if not verify_password(user.password, password):
+        return jsonify({"error": "Incorrect password"}), 403
 
-        if transfer_resp.get("status"):
-            flash(f"Transfer successful to {account_name}!", "success")
-            new_transaction = Transaction(
-            tx_type='withdrawal',
-            description= f"Transfer to {account_name}",
-            receiver_id=main_account.id,
-            amount=-1 * amount,
+    try:
+        amount = Decimal(str(data.get("amount"))).quantize(Decimal("0.01"))  # naira
+    except (InvalidOperation, TypeError):
+        return jsonify({"error": "amount must be a number"}), 400
 
-            )
+    try:
+        withdrawal = request_withdrawal(user, amount, bank_code, account_number)
+    except WithdrawalError as e:
+        return jsonify({"error": str(e)}), 400
 
-            db.session.add(new_transaction)
-            db.session.commit()
-        else:
-            flash("Transfer failed. Please try again.", "danger")
+    try:
+        advance_withdrawal.delay(withdrawal.id)
+    except Exception:
+        # Still REQUESTED; the resume-stalled-withdrawals sweep will pick it up
+        logger.warning("could not enqueue withdrawal", extra={"withdrawal_id": withdrawal.id}, exc_info=True)
 
-        return redirect(url_for("main.main_account"))
+    response = jsonify({
+        "message": "Withdrawal requested",
+        "withdrawal": withdrawal.to_dict(),
+        "status_url": url_for("paystack.withdrawal_status", withdrawal_id=withdrawal.id),
+    })
+    response.headers["Location"] = response.json["status_url"]
+    return response, 202
 
 
+# ✅ Withdraw route (GET: show form with banks, POST: request transfer)
+@paystack_bp.route('/withdraw', methods=['GET', 'POST'])
+@token_required
+def withdraw(user):
+    if request.method == 'GET':
+        banks = get_banks()
+        return render_template("withdraw.html", banks=banks)
 
+    return _request_withdrawal(user)
 
 
-# ✅ AJAX: Verify account number (for live account name display)
 @paystack_bp.route('/pay', methods=['GET', 'POST'])
 @token_required
 def pay(user):
-    main_account = Wallet.query.filter_by(user_id=user.id).first()
-
-    if not has_exhausted_initial_blocks(user):
-        return jsonify({
-            "error": (
-                f"You must spend up to your initial allocation of "
-                f"{wallet.initial_block_allocation:,.0f} blocks before withdrawals are enabled."
-            )
-        }), 403
-
-    balance_data = get_transfer_balance()
-    ledger_balances = balance_data.get("data", [])
-
-    if not ledger_balances:
-        return {
-            "status": False,
-            "message": "No transfer ledger found. Fund your Transfer Balance from the Paystack Dashboard."
-        }
-
-    ledger_balance = int(ledger_balances[0]["balance"])
-
     if request.method == 'GET':
-
-        # Fetch banks for dropdown
-
-        banks_url = "https://api.paystack.co/bank"
-        response = requests.get(banks_url, headers=headers)
-        banks = response.json().get("data", []) if response.ok else []
+        banks = get_banks()
         return render_template("withdraw.html", banks=banks)
 
-    if request.method == 'POST':
-        bank_code = request.form['bank_code']
-        account_number = request.form['account_number']
-        amount = int(request.form['amount']) # Convert to kobo
-        print(amount,'this is amount here!!!!!')
-        password = request.form['password']
-        if not user.verify_password(password):
-            flash('incorrect password')
-            return redirect(request.referrer)
-
-        if not main_account.deposit_withdraw('withdraw', amount):
-            flash('insufficient fund!!')
-            return redirect(request.referrer)
-
-        # 1. Resolve account number
-        resolve_url = f"https://api.paystack.co/bank/resolve?account_number={account_number}&bank_code={bank_code}"
-        resolve_resp = requests.get(resolve_url, headers=headers).json()
-        if not resolve_resp.get("status"):
-            flash("Account resolution failed. Try again.", "danger")
-            return redirect(url_for("paystack.withdraw_page"))
-
-        account_name = resolve_resp["data"]["account_name"]
-
-        # 2. Create recipient
-        recipient_url = "https://api.paystack.co/transferrecipient"
-        recipient_payload = {
-            "type": "nuban",
-            "name": account_name,
-            "account_number": account_number,
-            "bank_code": bank_code,
-            "currency": "NGN"
-        }
-        recipient_resp = requests.post(recipient_url, headers=headers, json=recipient_payload).json()
-        if not recipient_resp.get("status"):
-            flash("Recipient creation failed.", "danger")
-            return redirect(url_for("paystack.withdraw_page"))
-
-        recipient_code = recipient_resp["data"]["recipient_code"]
-
-        # 3. Initiate transfer
-        transfer_url = "https://api.paystack.co/transfer"
-        transfer_payload = {
-            "source": "balance",
-            "amount": amount,
-            "recipient": recipient_code,
-            "reason": "Withdrawal from app"
-        }
-        transfer_resp = requests.post(transfer_url, headers=headers, json=transfer_payload).json()
-
-        print(transfer_resp)
-
-        if transfer_resp.get("status"):
-            flash(f"Transfer successful to {account_name}!", "success")
-            new_transaction = Transaction(
-            tx_type='withdrawal',
-            description= f"Transfer to {account_name}",
-            receiver_id=main_account.id,
-            amount=-1 * amount,
-
-            )
-
-            db.session.add(new_transaction)
-            db.session.commit()
-        else:
-            flash("Transfer failed. Please try again.", "danger")
-
-        return redirect(url_for("main.main_account"))
-
+    return _request_withdrawal(user)
 
 
+@paystack_bp.route('/withdrawals/<int:withdrawal_id>', methods=['GET'])
+@token_required
+def withdrawal_status(user, withdrawal_id):
+    withdrawal = Withdrawal.query.filter_by(id=withdrawal_id, user_id=user.id).first()
+    if not withdrawal:
+        return jsonify({"error": "Withdrawal not found"}), 404
+    return jsonify({"withdrawal": withdrawal.to_dict()}), 200
 
 
 @paystack_bp.route('/verify_account', methods=['POST'])
 def verify_account():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     account_number = data.get("account_number")
     bank_code = data.get("bank_code")
+    if not account_number or not bank_code:
+        return jsonify({"success": False, "message": "account_number and bank_code are required"}), 400
 
-    url = f"https://api.paystack.co/bank/resolve?account_number={account_number}&bank_code={bank_code}"
-    resp = requests.get(url, headers=headers).json()
+    try:
+        resp = resolve_account(account_number, bank_code)
+    except PaystackError as e:
+        return jsonify({"success": False, "message": str(e)}), 503
 
     if resp.get("status"):
         return jsonify({"success": True, "account_name": resp["data"]["account_name"]})
@@ -691,10 +507,8 @@ def verify_account():
 
 @paystack_bp.route('/withdraw_page', methods=['GET'])
 @token_required
-def withdraw_page():
-    banks_url = "https://api.paystack.co/bank"
-    response = requests.get(banks_url, headers=headers)
-    banks = response.json().get("data", []) if response.ok else []
+def withdraw_page(user):
+    banks = get_banks()
     return render_template("withdraw.html", banks=banks)
 
 
@@ -702,11 +516,9 @@ def withdraw_page():
 @token_required
 def banks(user):
     try:
-        banks_url = "https://api.paystack.co/bank"
-        response = requests.get(banks_url, headers=headers)
+        banks = get_banks()
 
-        if response.ok:
-            banks = response.json().get("data", [])
+        if banks:
             return jsonify({
                 "success": True,
                 "banks": banks
@@ -715,10 +527,10 @@ def banks(user):
             return jsonify({
                 "success": False,
                 "message": "Failed to fetch banks from Paystack."
-            }), response.status_code
+            }), 503
 
-    except Exception as e:
-        print(f"Error fetching Paystack banks: {e}")
+    except Exception:
+        logger.warning("could not fetch Paystack banks", exc_info=True)
         return jsonify({
             "success": False,
             "message": "An error occurred while fetching banks."
@@ -0,0 +1,233 @@
+# app/paystack/webhooks.py
+
+import logging
+from datetime import datetime
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, User, Wallet, Transaction, PaystackEvent, Withdrawal
+from app.wallet.service import credit_fiat
+
+DEPOSIT_EVENTS = ("charge.success",)
+TRANSFER_EVENTS = ("transfer.success", "transfer.failed", "transfer.reversed")
+
+logger = logging.getLogger("app.paystack")
+
+
+# -------------------------------------------------
+# Inbox (request path)
+# -------------------------------------------------
+
+def event_key(event):
+    data = event.get("data") or {}
+    ident = data.get("reference") or data.get("id")
+    return f"{event.get('event')}:{ident}"[:255]
+
+
+def store_event(event):
+    """
+    Persist a verified webhook event for the worker.
+    Returns False when the same event was already received (a Paystack retry).
+    """
+    data = event.get("data") or {}
+    db.session.add(PaystackEvent(
+        event_key=event_key(event),
+        event_type=event.get("event") or "unknown",
+        reference=data.get("reference"),
+        payload=event,
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+# -------------------------------------------------
+# Worker
+# -------------------------------------------------
+
+def _kobo_to_naira(amount):
+    return Decimal(amount or 0) / 100
+
+
+def _prefetch(events):
+    """Load every wallet/withdrawal/reference the batch touches in four queries."""
+    emails, deposit_refs, transfer_refs = set(), set(), set()
+    for evt in events:
+        data = evt.payload.get("data") or {}
+        if evt.event_type in DEPOSIT_EVENTS:
+            emails.add((data.get("customer") or {}).get("email"))
+            deposit_refs.add(data.get("reference"))
+        elif evt.event_type in TRANSFER_EVENTS:
+            transfer_refs.add(data.get("reference"))
+    emails.discard(None)
+    deposit_refs.discard(None)
+    transfer_refs.discard(None)
+
+    wallets = {}
+    if emails:
+        rows = (
+            db.session.query(User.email, Wallet)
+            .join(Wallet, Wallet.user_id == User.id)
+            .filter(User.email.in_(emails))
+            .order_by(Wallet.id)
+            .with_for_update(of=Wallet)
+        )
+        wallets = {email: wallet for email, wallet in rows}
+
+    credited = set()
+    if deposit_refs:
+        credited = {
+            ref for (ref,) in
+            db.session.query(Transaction.reference).filter(Transaction.reference.in_(deposit_refs))
+        }
+
+    withdrawals, sagas = {}, {}
+    if transfer_refs:
+        # Lock saga rows before their transactions, the same order the withdrawal worker uses
+        sagas = {
+            w.reference: w for w in
+            Withdrawal.query.filter(Withdrawal.reference.in_(transfer_refs))
+            .order_by(Withdrawal.id)
+            .with_for_update()
+        }
+        withdrawals = {
+            t.reference: t for t in
+            Transaction.query.filter(
+                Transaction.reference.in_(transfer_refs),
+                Transaction.tx_type == "withdrawal",
+            ).with_for_update()
+        }
+
+    return wallets, credited, withdrawals, sagas
+
+
+def _apply_deposit(data, wallets, credited):
+    reference = data.get("reference")
+    if reference in credited:
+        return "Duplicate reference - already credited"
+
+    email = (data.get("customer") or {}).get("email")
+    wallet = wallets.get(email)
+    if wallet is None:
+        return f"No wallet for customer {email}"
+
+    amount = _kobo_to_naira(data.get("amount"))
+    authorization = data.get("authorization") or {}
+    wallet.fiat_balance = Decimal(wallet.fiat_balance) + amount
+    db.session.add(Transaction(
+        tx_type="deposit",
+        currency="NGN",
+        description=f"Deposit from {authorization.get('sender_name')} - {authorization.get('sender_bank')}",
+        receiver_id=wallet.user_id,
+        amount=amount,
+        reference=reference,
+        status="successful",
+        narration="deposit",
+    ))
+    credited.add(reference)
+    return None
+
+
+def _refund_transfer(event_type, data, withdrawal, saga):
+    """
+    Refund a transfer Paystack failed or reversed, for the amount we debited.
+    The payload amount must agree with it; otherwise nothing is credited and
+    the event is left for a person to look at. Returns a note, or None.
+    """
+    stored = Decimal(saga.amount) if saga is not None else abs(Decimal(withdrawal.amount))
+    reported = data.get("amount")
+    if reported is None or _kobo_to_naira(reported) != stored:
+        logger.warning("transfer refund skipped: amount mismatch", extra={
+            "reference": withdrawal.reference, "event": event_type,
+            "stored_amount": str(stored), "reported_kobo": reported,
+        })
+        return f"Amount mismatch: withdrawal {stored}, event {reported} kobo; refund skipped"
+
+    reversed_payout = event_type == "transfer.reversed" and withdrawal.status == "successful"
+    withdrawal.status = "reversed" if reversed_payout else "failed"
+    if saga is not None:
+        saga.status = Withdrawal.REVERSED if reversed_payout else Withdrawal.FAILED
+        saga.last_error = (data.get("reason") or event_type)[:255]
+    user_id = saga.user_id if saga is not None else withdrawal.sender_id
+    if user_id:
+        credit_fiat(user_id, stored)
+    return None
+
+
+def _apply_transfer(event_type, data, withdrawals, sagas):
+    withdrawal = withdrawals.get(data.get("reference"))
+    if withdrawal is None:
+        return "No matching withdrawal"
+    saga = sagas.get(data.get("reference"))
+
+    if withdrawal.status == "successful" and event_type == "transfer.reversed":
+        # Paid out, then pulled back by the bank: refund it now
+        return _refund_transfer(event_type, data, withdrawal, saga)
+    if withdrawal.status in ("successful", "failed", "reversed"):
+        return f"Withdrawal already {withdrawal.status}"
+
+    if event_type == "transfer.success":
+        bank = (data.get("recipient") or {}).get("details", {}).get("bank_name", "Bank")
+        withdrawal.status = "successful"
+        withdrawal.description = f"Withdrawal successful to {bank}"
+        if saga is not None:
+            saga.status = Withdrawal.SETTLED
+        return None
+
+    # transfer.failed / transfer.reversed before success: refund the wallet once
+    return _refund_transfer(event_type, data, withdrawal, saga)
+
+
+def process_pending_events(batch_size=None):
+    """
+    Apply one batch of PENDING inbox events; returns how many were handled.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED so parallel workers never share
+    an event, and each event's effects commit together with its status change,
+    so every event is applied exactly once. A failing event is rolled back to its
+    savepoint and retried on a later batch until PAYSTACK_EVENT_MAX_ATTEMPTS.
+    """
+    batch_size = batch_size or current_app.config["PAYSTACK_EVENT_BATCH_SIZE"]
+    max_attempts = current_app.config["PAYSTACK_EVENT_MAX_ATTEMPTS"]
+
+    events = (
+        PaystackEvent.query.filter_by(status="PENDING")
+        .order_by(PaystackEvent.id)
+        .with_for_update(skip_locked=True)
+        .limit(batch_size)
+        .all()
+    )
+    if not events:
+        db.session.commit()
+        return 0
+
+    wallets, credited, withdrawals, sagas = _prefetch(events)
+
+    for evt in events:
+        data = evt.payload.get("data") or {}
+        evt.attempts += 1
+        try:
+            with db.session.begin_nested():
+                if evt.event_type in DEPOSIT_EVENTS:
+                    note = _apply_deposit(data, wallets, credited)
+                elif evt.event_type in TRANSFER_EVENTS:
+                    note = _apply_transfer(evt.event_type, data, withdrawals, sagas)
+                else:
+                    note = f"Unhandled event {evt.event_type}"
+            evt.status = "IGNORED" if note else "PROCESSED"
+            evt.last_error = note
+        except Exception as e:
+            evt.last_error = str(e)[:255]
+            if evt.attempts >= max_attempts:
+                evt.status = "FAILED"
+
+        if evt.status != "PENDING":
+            evt.processed_at = datetime.utcnow()
+
+    db.session.commit()
+    return len(events)
@@ -0,0 +1,225 @@
+# app/paystack/withdrawals.py
+
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Transaction, TransferRecipient, Withdrawal
+from app.paystack.client import paystack, PaystackError
+from app.paystack.lookups import resolve_account
+from app.wallet.service import credit_fiat, debit_fiat, WalletError
+
+
+class WithdrawalError(ValueError):
+    """A withdrawal request that cannot be accepted (bad input, insufficient funds)."""
+
+
+# -------------------------------------------------
+# Request path
+# -------------------------------------------------
+
+def request_withdrawal(user, amount, bank_code, account_number):
+    """
+    Debit the wallet and record a REQUESTED withdrawal plus its pending
+    Transaction in one commit. No Paystack call happens here; the caller
+    enqueues app.tasks.advance_withdrawal.
+    """
+    amount = Decimal(amount)
+    if amount <= 0:
+        raise WithdrawalError("Amount must be greater than zero")
+
+    try:
+        debit_fiat(user.id, amount)
+    except WalletError as e:
+        db.session.rollback()
+        raise WithdrawalError(str(e))
+
+    reference = f"wd_{uuid.uuid4().hex}"
+    withdrawal = Withdrawal(
+        user_id=user.id,
+        amount=amount,
+        bank_code=bank_code,
+        account_number=account_number,
+        reference=reference,
+        status=Withdrawal.REQUESTED,
+    )
+    db.session.add(withdrawal)
+    db.session.add(Transaction(
+        tx_type="withdrawal",
+        currency="NGN",
+        description=f"Withdrawal to {account_number} ({bank_code})",
+        sender_id=user.id,
+        amount=-amount,
+        reference=reference,
+        status="pending",
+        narration="withdrawal",
+    ))
+    db.session.commit()
+    return withdrawal
+
+
+# -------------------------------------------------
+# Worker steps
+# -------------------------------------------------
+
+def _fail(withdrawal, reason):
+    """Terminal failure before any money left Paystack: refund the wallet once."""
+    withdrawal.status = Withdrawal.FAILED
+    withdrawal.last_error = (reason or "Withdrawal failed")[:255]
+
+    credit_fiat(withdrawal.user_id, withdrawal.amount)
+    tx = Transaction.query.filter_by(reference=withdrawal.reference).first()
+    if tx:
+        tx.status = "failed"
+        tx.description = f"Withdrawal failed: {withdrawal.last_error}"[:255]
+
+
+def _get_or_create_recipient(withdrawal):
+    """Returns (TransferRecipient, None) or (None, reason) when Paystack refuses the account."""
+    recipient = TransferRecipient.query.filter_by(
+        bank_code=withdrawal.bank_code, account_number=withdrawal.account_number
+    ).first()
+    if recipient:
+        return recipient, None
+
+    resolved = resolve_account(withdrawal.account_number, withdrawal.bank_code)
+    if not resolved.get("status"):
+        return None, resolved.get("message") or "Account could not be resolved"
+    account_name = resolved["data"]["account_name"]
+
+    resp = paystack.create_transfer_recipient({
+        "type": "nuban",
+        "name": account_name,
+        "account_number": withdrawal.account_number,
+        "bank_code": withdrawal.bank_code,
+        "currency": "NGN",
+    })
+    if not resp.get("status"):
+        return None, resp.get("message") or "Recipient creation failed"
+
+    recipient = TransferRecipient(
+        bank_code=withdrawal.bank_code,
+        account_number=withdrawal.account_number,
+        account_name=account_name,
+        recipient_code=resp["data"]["recipient_code"],
+    )
+    try:
+        with db.session.begin_nested():
+            db.session.add(recipient)
+    except IntegrityError:
+        # Another worker stored the same account first
+        recipient = TransferRecipient.query.filter_by(
+            bank_code=withdrawal.bank_code, account_number=withdrawal.account_number
+        ).first()
+    return recipient, None
+
+
+def _prepare_recipient(withdrawal):
+    recipient, reason = _get_or_create_recipient(withdrawal)
+    if recipient is None:
+        _fail(withdrawal, reason)
+        return
+    withdrawal.recipient_code = recipient.recipient_code
+    withdrawal.account_name = recipient.account_name
+    withdrawal.status = Withdrawal.RECIPIENT_READY
+
+
+def _send_transfer(withdrawal):
+    # The reference makes this call safe to repeat: Paystack rejects a second
+    # transfer with the same reference instead of paying twice. That rejection
+    # is also what a retry after an accepted-but-timed-out attempt gets, so a
+    # refusal only fails the withdrawal once Paystack confirms it holds no
+    # transfer under this reference.
+    resp = paystack.initiate_transfer({
+        "source": "balance",
+        "amount": int(Decimal(withdrawal.amount) * 100),  # kobo
+        "recipient": withdrawal.recipient_code,
+        "reason": "Withdrawal from app",
+        "reference": withdrawal.reference,
+    })
+    if not resp.get("status"):
+        reason = resp.get("message") or "Transfer rejected"
+        existing = paystack.verify_transfer(withdrawal.reference)
+        if existing is None:
+            _fail(withdrawal, reason)
+            return
+        if not existing.get("status"):
+            raise PaystackError(f"Transfer rejected ({reason}) and could not be verified: {existing.get('message')}")
+        # An earlier attempt went through; its transfer.* webhook settles it
+        resp = existing
+        withdrawal.last_error = reason[:255]
+    withdrawal.transfer_code = (resp.get("data") or {}).get("transfer_code")
+    withdrawal.status = Withdrawal.TRANSFER_SENT
+    tx = Transaction.query.filter_by(reference=withdrawal.reference).first()
+    if tx:
+        tx.description = f"Transfer to {withdrawal.account_name}"[:255]
+
+
+STEPS = {
+    Withdrawal.REQUESTED: _prepare_recipient,
+    Withdrawal.RECIPIENT_READY: _send_transfer,
+}
+
+
+def advance_withdrawal(withdrawal_id):
+    """
+    Drive a withdrawal forward until it waits on Paystack's transfer webhook
+    (TRANSFER_SENT) or finishes. Each step commits separately and re-locks the
+    row with SKIP LOCKED, so only one worker drives a given withdrawal.
+
+    Transient Paystack errors are recorded and re-raised so the task retries.
+    A recipient step that keeps failing is failed and refunded after
+    WITHDRAWAL_MAX_ATTEMPTS. The transfer step is never auto-failed, because
+    Paystack may already have accepted it; it keeps retrying under the same
+    reference until the sweep or the webhook settles it, and a refused
+    transfer is only refunded once Paystack confirms it has none under that
+    reference.
+
+    Returns the withdrawal's status, or None if another worker holds it.
+    """
+    max_attempts = current_app.config["WITHDRAWAL_MAX_ATTEMPTS"]
+
+    while True:
+        withdrawal = (
+            Withdrawal.query.filter_by(id=withdrawal_id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if withdrawal is None:
+            db.session.rollback()
+            return None
+
+        step = STEPS.get(withdrawal.status)
+        if step is None:
+            db.session.commit()
+            return withdrawal.status
+
+        try:
+            step(withdrawal)
+        except PaystackError as e:
+            withdrawal.attempts += 1
+            withdrawal.last_error = str(e)[:255]
+            if withdrawal.status == Withdrawal.REQUESTED and withdrawal.attempts >= max_attempts:
+                _fail(withdrawal, str(e))
+                db.session.commit()
+                return withdrawal.status
+            db.session.commit()
+            raise
+
+        withdrawal.attempts = 0
+        db.session.commit()
+
+
+def stalled_withdrawal_ids():
+    """Ids of in-flight withdrawals nobody has touched for WITHDRAWAL_STALE_SECONDS."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config["WITHDRAWAL_STALE_SECONDS"])
+    rows = (
+        db.session.query(Withdrawal.id)
+        .filter(Withdrawal.status.in_(Withdrawal.IN_FLIGHT), Withdrawal.updated_at < cutoff)
+        .order_by(Withdrawal.id)
+        .limit(current_app.config["WITHDRAWAL_SWEEP_BATCH_SIZE"])
+    )
+    return [withdrawal_id for (withdrawal_id,) in rows]
@@ -0,0 +1,171 @@
+# app/product/escrow.py
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import case, event, func, inspect
+
+from app.models import db, User, Order, SellerEscrow
+from app.pagination import keyset_page, parse_limit
+from app.rollups import upsert_increment
+
+ZERO = Decimal("0.00")
+
+# Order statuses whose payment is held for the seller
+HELD_STATUSES = frozenset(("ESCROWED", "DELIVERED"))
+RELEASED_STATUS = "COMPLETED"
+REFUNDED_STATUSES = frozenset(("CANCELLED", "CANCELED"))
+
+EXPORT_FIELDS = (
+    "seller_id", "seller_name", "escrow_balance", "escrowed_orders",
+    "released_total", "released_orders", "refunded_total",
+)
+
+
+def escrow_deltas(old_status, new_status, price):
+    """Map one order status change onto the SellerEscrow columns it moves."""
+    price = Decimal(price)
+    was_held, held = old_status in HELD_STATUSES, new_status in HELD_STATUSES
+    deltas = {}
+    if held and not was_held:
+        deltas.update(escrow_balance=price, escrowed_orders=1)
+    elif was_held and not held:
+        deltas.update(escrow_balance=-price, escrowed_orders=-1)
+        if new_status == RELEASED_STATUS:
+            deltas.update(released_total=price, released_orders=1)
+        elif new_status in REFUNDED_STATUSES:
+            deltas.update(refunded_total=price)
+    return deltas
+
+
+# -------------------------------------------------
+# Incremental maintenance
+# -------------------------------------------------
+
+def apply_escrow_changes(connection, changes):
+    """
+    Fold (seller_id, old_status, new_status, price) order changes into
+    seller_escrow. Must run on the connection/transaction that writes the orders.
+    """
+    now = datetime.utcnow()
+    totals = {}
+    for seller_id, old_status, new_status, price in changes:
+        deltas = escrow_deltas(old_status, new_status, price)
+        if not deltas:
+            continue
+        row = totals.get(seller_id)
+        if row is None:
+            row = totals[seller_id] = {
+                "seller_id": seller_id, "escrow_balance": ZERO, "escrowed_orders": 0,
+                "released_total": ZERO, "released_orders": 0, "refunded_total": ZERO,
+                "updated_at": now,
+            }
+        for column, delta in deltas.items():
+            row[column] += delta
+
+    # Sorted so concurrent transactions lock escrow rows in the same order
+    rows = [totals[seller_id] for seller_id in sorted(totals)]
+    upsert_increment(connection, SellerEscrow.__table__, ("seller_id",), rows, replace=("updated_at",))
+
+
+@event.listens_for(Order.status, "set", active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    # active_history loads the current status before an order's status is
+    # overwritten, so a change on an expired order still has its old value below
+    pass
+
+
+@event.listens_for(db.session, "after_flush")
+def _track_order_escrow(session, flush_context):
+    changes = [
+        (obj.seller_id, None, obj.status, obj.price)
+        for obj in session.new
+        if isinstance(obj, Order)
+    ]
+    for obj in session.dirty:
+        if not isinstance(obj, Order):
+            continue
+        history = inspect(obj).attrs.status.history
+        if history.added and history.deleted:
+            changes.append((obj.seller_id, history.deleted[0], obj.status, obj.price))
+    if changes:
+        apply_escrow_changes(session.connection(), changes)
+
+
+def rebuild_escrow():
+    """Recompute seller_escrow from orders. Returns the number of sellers."""
+    o = Order
+
+    def total(statuses, value=o.price):
+        return func.coalesce(func.sum(case((o.status.in_(statuses), value), else_=0)), 0)
+
+    select = db.select(
+        o.seller_id,
+        total(HELD_STATUSES),
+        total(HELD_STATUSES, 1),
+        total([RELEASED_STATUS]),
+        total([RELEASED_STATUS], 1),
+        # Only escrowed orders can be refunded, but a cancelled order does not
+        # record whether it was paid; today's cancel flow only accepts PENDING ones.
+        db.literal(ZERO, db.Numeric(18, 2)),
+        db.literal(datetime.utcnow(), db.DateTime),
+    ).group_by(o.seller_id)
+
+    db.session.execute(db.delete(SellerEscrow))
+    db.session.execute(
+        db.insert(SellerEscrow).from_select(
+            ["seller_id", "escrow_balance", "escrowed_orders", "released_total",
+             "released_orders", "refunded_total", "updated_at"],
+            select,
+        )
+    )
+    db.session.commit()
+    return SellerEscrow.query.count()
+
+
+# -------------------------------------------------
+# Reads
+# -------------------------------------------------
+
+def _escrow_query(args):
+    query = (
+        db.session.query(SellerEscrow, User.name)
+        .outerjoin(User, User.id == SellerEscrow.seller_id)
+    )
+    if args.get("include_empty") not in ("1", "true"):
+        query = query.filter(SellerEscrow.escrow_balance != 0)
+    return query
+
+
+def query_escrow_page(args):
+    """
+    One keyset page of sellers, largest escrow balance first, with each
+    seller's name from the same query. Returns ([(SellerEscrow, name)], next_cursor);
+    raises ValueError (incl. CursorError).
+    """
+    limit = parse_limit(args.get("limit"))
+    return keyset_page(
+        _escrow_query(args), [SellerEscrow.escrow_balance, SellerEscrow.seller_id],
+        cursor=args.get("cursor"), limit=limit,
+        key=lambda row: (row[0].escrow_balance, row[0].seller_id),
+    )
+
+
+def iter_escrow(args, batch_size=1000):
+    """Every seller row for exports, streamed from the database in batches."""
+    query = _escrow_query(args).order_by(SellerEscrow.escrow_balance.desc(), SellerEscrow.seller_id.desc())
+    return query.yield_per(batch_size)
+
+
+def escrow_totals():
+    """Platform-wide escrow balance and open escrowed order count."""
+    balance, orders = db.session.query(
+        func.coalesce(func.sum(SellerEscrow.escrow_balance), 0),
+        func.coalesce(func.sum(SellerEscrow.escrowed_orders), 0),
+    ).one()
+    return {"total_escrow": str(Decimal(balance).quantize(Decimal("0.01"))), "escrowed_orders": int(orders)}
+
+
+def serialize_escrow(row):
+    escrow, name = row
+    return dict(escrow.to_dict(), seller_name=name or "Unknown")
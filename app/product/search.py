@@ -0,0 +1,225 @@
+# app/product/search.py
+
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+
+from sqlalchemy import cast, column, event, func, tuple_
+from sqlalchemy.orm import joinedload
+
+from app.models import db, User, Product
+from app.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+
+# Text search configuration used by the products.search_vector generated column.
+SEARCH_CONFIG = "english"
+
+# Field weights; mirror setweight() A/B/C in the search_vector migration.
+FIELD_WEIGHTS = {
+    "title": 1.0,
+    "category": 0.4,
+    "subcategory": 0.4,
+    "description": 0.2,
+}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Typed stand-ins so cursors decode as (float score, int id).
+_CURSOR_COLUMNS = [column("rank", db.Double), Product.id]
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def search_products(q, category=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Ranked, prefix-matching product search.
+    Returns ([(product, score), ...], next_cursor). Every query term must match
+    (as a word prefix) somewhere in the product's title, category, subcategory
+    or description.
+    """
+    terms = tokenize(q)
+    if not terms:
+        return [], None
+
+    after = decode_cursor(cursor, _CURSOR_COLUMNS) if cursor else None
+
+    if db.engine.dialect.name == "postgresql":
+        return _search_postgres(terms, category, after, limit)
+    return _search_fallback(terms, category, after, limit)
+
+
+# -------------------------------------------------
+# Postgres: GIN-indexed tsvector
+# -------------------------------------------------
+
+def _search_postgres(terms, category, after, limit):
+    ts_query = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{t}:*" for t in terms))
+    # ts_rank_cd is float4; the cursor carries a Python float (float8), so rank
+    # and cursor are both compared as double precision or ties skip/repeat rows.
+    rank = cast(func.ts_rank_cd(Product.search_vector, ts_query), db.Double)
+
+    query = (
+        db.session.query(Product, rank.label("rank"))
+        .options(joinedload(Product.seller).load_only(User.id, User.name))
+        .filter(Product.search_vector.op("@@")(ts_query))
+    )
+    if category:
+        query = query.filter(Product.category == category)
+    if after:
+        query = query.filter(tuple_(rank, Product.id) < tuple_(cast(after[0], db.Double), after[1]))
+
+    rows = query.order_by(rank.desc(), Product.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor((rows[-1].rank, rows[-1].Product.id))
+    return [(row.Product, row.rank) for row in rows], next_cursor
+
+
+# -------------------------------------------------
+# Fallback: in-process inverted index (SQLite / tests)
+# -------------------------------------------------
+
+class InvertedIndex:
+    """
+    Per-worker inverted index over the product catalog.
+    Postings map term -> {product_id: weighted term frequency}; a sorted
+    vocabulary gives prefix lookups by bisection.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)
+        self._vocabulary = []
+        self._doc_terms = {}
+        self._categories = {}
+        self.built = False
+
+    def add(self, product_id, fields, category=None):
+        weights = defaultdict(float)
+        for name, text in fields.items():
+            for term in tokenize(text):
+                weights[term] += FIELD_WEIGHTS.get(name, 0.1)
+
+        with self._lock:
+            self._remove(product_id)
+            for term, weight in weights.items():
+                if term not in self._postings:
+                    bisect.insort(self._vocabulary, term)
+                self._postings[term][product_id] = weight
+            self._doc_terms[product_id] = list(weights)
+            self._categories[product_id] = category
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        for term in self._doc_terms.pop(product_id, []):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                i = bisect.bisect_left(self._vocabulary, term)
+                if i < len(self._vocabulary) and self._vocabulary[i] == term:
+                    del self._vocabulary[i]
+        self._categories.pop(product_id, None)
+
+    def _expand(self, prefix):
+        i = bisect.bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            yield self._vocabulary[i]
+            i += 1
+
+    def search(self, terms, category=None):
+        """Return [(score, product_id), ...] best first; all terms must match."""
+        with self._lock:
+            total_docs = max(len(self._doc_terms), 1)
+            scores = None
+            for prefix in terms:
+                term_scores = defaultdict(float)
+                for term in self._expand(prefix):
+                    postings = self._postings[term]
+                    idf = math.log(1 + total_docs / len(postings))
+                    for product_id, weight in postings.items():
+                        term_scores[product_id] += weight * idf
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {pid: s + term_scores[pid] for pid, s in scores.items() if pid in term_scores}
+                if not scores:
+                    return []
+
+            results = [
+                (round(score, 6), pid) for pid, score in scores.items()
+                if category is None or self._categories.get(pid) == category
+            ]
+        results.sort(reverse=True)
+        return results
+
+    def build(self):
+        with self._lock:
+            self._postings.clear()
+            self._vocabulary.clear()
+            self._doc_terms.clear()
+            self._categories.clear()
+            rows = db.session.query(
+                Product.id, Product.title, Product.description, Product.category, Product.subcategory
+            ).yield_per(1000)
+            for row in rows:
+                self.add(row.id, _fields(row), row.category)
+            self.built = True
+
+
+def _fields(product):
+    return {
+        "title": product.title,
+        "description": product.description,
+        "category": product.category,
+        "subcategory": product.subcategory,
+    }
+
+
+product_index = InvertedIndex()
+
+
+def _search_fallback(terms, category, after, limit):
+    if not product_index.built:
+        product_index.build()
+
+    hits = product_index.search(terms, category)
+    if after:
+        hits = [hit for hit in hits if hit < after]
+
+    page = hits[:limit + 1]
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1])
+
+    ids = [pid for _, pid in page]
+    products = {
+        p.id: p for p in Product.query
+        .options(joinedload(Product.seller).load_only(User.id, User.name))
+        .filter(Product.id.in_(ids))
+    } if ids else {}
+    return [(products[pid], score) for score, pid in page if pid in products], next_cursor
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+def _index_product(mapper, connection, target):
+    if product_index.built:
+        product_index.add(target.id, _fields(target), target.category)
+
+
+@event.listens_for(Product, "after_delete")
+def _unindex_product(mapper, connection, target):
+    if product_index.built:
+        product_index.remove(target.id)
@@ -1,10 +1,16 @@
 # app/routes/product_routes.py
 
 from flask import Blueprint, request, jsonify,send_from_directory,current_app
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from datetime import datetime
-from app.models import db, User, Wallet, Product, Transaction, BlockLedger, Order
+from sqlalchemy.orm import joinedload
+from app.models import db, User, Wallet, Product, Transaction, BlockLedger, Order, LedgerEntryType
 from app.auth.views import token_required
+from app.pagination import CursorError, parse_limit, keyset_page, encode_cursor, iter_json_array, streamed_json
+from app.profiler import query_budget
+from app.product.search import search_products
+from app.product import escrow
+from app.ledger.posting import post, Entry, MINT, WalletError
 import os
 import uuid
 from werkzeug.utils import secure_filename
@@ -86,33 +92,101 @@ def add_product(user):
 # Get all products or by category
 # -----------------------------
 @product_bp.route("/product/list", methods=["GET"])
+@query_budget(3)
 def list_products():
     """
-    Optional query param: ?category=technology
+    Paginated catalog, newest first.
+    Optional query params:
+      ?category=technology&subcategory=Mobiles
+      ?min_price=1000&max_price=50000&seller_id=3
+      ?limit=20&cursor=<X-Next-Cursor from the previous page>
     """
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        min_price = request.args.get("min_price")
+        max_price = request.args.get("max_price")
+        min_price = Decimal(min_price) if min_price else None
+        max_price = Decimal(max_price) if max_price else None
+        seller_id = request.args.get("seller_id", type=int)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+    except InvalidOperation:
+        return jsonify({"error": "min_price and max_price must be numbers"}), 400
+
+    query = Product.query.options(joinedload(Product.seller).load_only(User.id, User.name))
+
     category = request.args.get("category")
-    query = Product.query
+    subcategory = request.args.get("subcategory")
     if category:
-        query = query.filter_by(category=category)
-    products = query.order_by(Product.created_at.desc()).all()
+        query = query.filter(Product.category == category)
+    if subcategory:
+        query = query.filter(Product.subcategory == subcategory)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    if seller_id:
+        query = query.filter(Product.seller_id == seller_id)
+
+    try:
+        products, next_cursor = keyset_page(
+            query,
+            [Product.created_at, Product.id],
+            cursor=request.args.get("cursor"),
+            limit=limit,
+        )
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return streamed_json(iter_json_array(products, serialize_product), headers=headers)
+
+
+def serialize_product(p):
+    return {
+        "id": p.id,
+        "title": p.title,
+        "description": p.description,
+        "price": str(p.price),
+        "category": p.category,
+        "subcategory": p.subcategory,
+        "seller_id": p.seller_id,
+        "seller_name": p.seller.name if p.seller else "Unknown",
+        "image_url": p.image_url
+    }
 
-    results = []
-    for p in products:
- 
-        results.append({
-            "id": p.id,
-            "title": p.title,
-            "description": p.description,
-            "price": str(p.price),
-            "category": p.category,
-            "subcategory": p.subcategory,
-            "seller_id": p.seller_id,
-            "seller_name": p.seller.name if p.seller else "Unknown",
-            "image_url": p.image_url
-        })
 
-    return jsonify(results)
+# -----------------------------
+# Full-text product search
+# -----------------------------
+@product_bp.route("/product/search", methods=["GET"])
+def search():
+    """
+    Ranked search over title, description, category and subcategory.
+    Query params: ?q=sams gal&category=technology&limit=20&cursor=...
+    Each word also matches as a prefix ("sams" finds "Samsung").
+    """
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "Search query q is required"}), 400
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        hits, next_cursor = search_products(
+            q,
+            category=request.args.get("category"),
+            cursor=request.args.get("cursor"),
+            limit=limit,
+        )
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def serialize_hit(hit):
+        product, score = hit
+        return dict(serialize_product(product), score=round(float(score), 6))
 
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return streamed_json(iter_json_array(hits, serialize_hit), headers=headers)
 
 
 # -----------------------------
@@ -143,29 +217,117 @@ def get_product(product_id):
 
 
 # ------------------ Get User Orders ------------------
+ORDER_ROLES = {"buyer": Order.buyer_id, "seller": Order.seller_id}
+
+
+def _order_roles(args):
+    role = (args.get("role") or "all").lower()
+    if role == "all":
+        return list(ORDER_ROLES)
+    if role not in ORDER_ROLES:
+        raise ValueError("role must be one of: buyer, seller, all")
+    return [role]
+
+
+def _filtered_orders(role, user_id, args, by_status=True):
+    """One role's orders, filtered in SQL; each role is its own (user, status, created_at) index scan."""
+    query = Order.query.filter(ORDER_ROLES[role] == user_id)
+
+    status = args.get("status")
+    if status and by_status:
+        query = query.filter(Order.status == status.upper())
+    start = args.get("start")
+    end = args.get("end")
+    if start:
+        query = query.filter(Order.created_at >= datetime.fromisoformat(start))
+    if end:
+        query = query.filter(Order.created_at <= datetime.fromisoformat(end))
+    return query
+
+
+def query_orders_page(user_id, args):
+    """
+    One keyset page of the user's orders, newest first. With role=all the
+    buyer and seller scans run separately (an OR across two columns can't use
+    one index) and are merged; both use the same cursor. Product titles come
+    from the same query via a join. Raises ValueError (incl. CursorError).
+    """
+    limit = parse_limit(args.get("limit"))
+    orders = {}
+    more = False
+    for role in _order_roles(args):
+        query = _filtered_orders(role, user_id, args).options(
+            joinedload(Order.product).load_only(Product.id, Product.title)
+        )
+        rows, role_cursor = keyset_page(query, [Order.created_at, Order.id], cursor=args.get("cursor"), limit=limit)
+        orders.update((order.id, order) for order in rows)
+        more = more or role_cursor is not None
+
+    merged = sorted(orders.values(), key=lambda o: (o.created_at, o.id), reverse=True)
+    page = merged[:limit]
+
+    next_cursor = None
+    if page and (more or len(merged) > limit):
+        next_cursor = encode_cursor((page[-1].created_at, page[-1].id))
+    return page, next_cursor
+
+
+def serialize_order(order):
+    return {
+        "id": order.id,
+        "product_id": order.product_id,
+        "product_name": order.product.title if order.product else None,
+        "buyer_id": order.buyer_id,
+        "seller_id": order.seller_id,
+        "total_price": float(order.price),
+        "status":  str(order.status),
+        "created_at": order.created_at.isoformat()
+    }
+
+
 @product_bp.route("product/orders/mine", methods=["GET"])
+@query_budget(4)
 @token_required
 def my_orders(user):
-    """List all orders for the current user."""
-    current_user_id = user.id
-    orders = Order.query.filter(
-        (Order.buyer_id == current_user_id) | (Order.seller_id == current_user_id)
-    ).order_by(Order.created_at.desc()).all()
-
-    result = []
-    for order in orders:
-        result.append({
-            "id": order.id,
-            "product_id": order.product_id,
-            "product_name": order.product.title if order.product else None,
-            "buyer_id": order.buyer_id,
-            "seller_id": order.seller_id,
-            "total_price": float(order.price),
-            "status":  str(order.status),
-            "created_at": order.created_at.isoformat()
-        })
-
-    return jsonify(result), 200
+    """
+    The current user's orders, newest first.
+    Query params:
+      - role=buyer|seller|all (default all)
+      - status=PENDING|ESCROWED|DELIVERED|COMPLETED|CANCELLED
+      - start / end: ISO dates bounding created_at
+      - limit, cursor (next page cursor is in the X-Next-Cursor header)
+    """
+    try:
+        orders, next_cursor = query_orders_page(user.id, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return streamed_json(iter_json_array(orders, serialize_order), headers=headers)
+
+
+@product_bp.route("product/orders/totals", methods=["GET"])
+@token_required
+def my_order_totals(user):
+    """
+    Order count and value per status for each role, grouped in SQL.
+    Accepts the same role/start/end params as /product/orders/mine.
+    """
+    try:
+        roles = _order_roles(request.args)
+        totals = {}
+        for role in roles:
+            query = _filtered_orders(role, user.id, request.args, by_status=False).with_entities(
+                Order.status, db.func.count(Order.id), db.func.coalesce(db.func.sum(Order.price), 0)
+            ).group_by(Order.status)
+            totals[role] = {
+                status: {"count": count, "total_price": str(amount)}
+                for status, count, amount in query
+            }
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(totals), 200
 
 import enum
 # ------------------ Get Specific Order ------------------
@@ -303,63 +465,62 @@ def confirm_delivery(user, order_id):
     """
     buyer = user  # ✅ Use injected user from token_required
 
-    order = Order.query.get(order_id)
+    # Lock the order first so a double-submitted confirmation pays out once
+    order = Order.query.filter_by(id=order_id).with_for_update().populate_existing().first()
     if not order or order.buyer_id != buyer.id:
+        db.session.rollback()
         return jsonify({"error": "Invalid order"}), 404
     if order.status != "ESCROWED":
+        db.session.rollback()
         return jsonify({"error": "Order not ready for delivery confirmation"}), 400
 
-    amount = Decimal(order.total_price)
+    amount = Decimal(order.price)  # order.price is the total paid for the order
     reward = amount * Decimal("0.10")  # 10% transfer
     mined = amount * Decimal("0.10")   # 10% mined
 
-    buyer_wallet = Wallet.query.filter_by(user_id=buyer.id).first()
-    seller_wallet = Wallet.query.filter_by(user_id=order.seller_id).first()
-
-    if seller_wallet.block_balance < reward:
+    order.status = "COMPLETED"
+    order.completed_at = datetime.utcnow()
+
+    # One journal: the seller->buyer transfer and the newly mined blocks are separate legs
+    now = datetime.utcnow()
+    try:
+        post(
+            [
+                Entry(order.seller_id, -reward, f"Deduction for sale to buyer {buyer.id}", LedgerEntryType.TRANSFER),
+                Entry(buyer.id, reward, f"Transfer from seller for delivery of product {order.product_id}", LedgerEntryType.TRANSFER),
+                Entry(buyer.id, mined, f"Reward for confirming delivery of product {order.product_id}", LedgerEntryType.MINING),
+                Entry(MINT, -mined),
+            ],
+            reference=f"order:{order.id}",
+            transactions=[
+                dict(
+                    sender_id=order.seller_id,
+                    receiver_id=buyer.id,
+                    order_id=order.id,
+                    amount=reward,
+                    currency="BLOCK",
+                    tx_type="DELIVERY_REWARD",
+                    status="SUCCESS",
+                    created_at=now,
+                    description=f"10% transferred from seller to buyer on order {order.id}",
+                ),
+                dict(
+                    sender_id=None,  # system-generated mining
+                    receiver_id=buyer.id,
+                    order_id=order.id,
+                    amount=mined,
+                    currency="BLOCK",
+                    tx_type="MINED_BLOCK",
+                    status="SUCCESS",
+                    created_at=now,
+                    description=f"10% newly mined block reward for order {order.id}",
+                ),
+            ],
+        )
+    except WalletError:
+        db.session.rollback()
         return jsonify({"error": "Seller lacks sufficient block balance"}), 400
-
-    with db.session.begin():
-        # Wallet updates
-        seller_wallet.block_balance -= reward
-        buyer_wallet.block_balance += (reward + mined)
-        order.status = "COMPLETED"
-        order.completed_at = datetime.utcnow()
-
-        # Ledger entries
-        db.session.add(BlockLedger(
-            user_id=seller_wallet.user_id,
-            change=-reward,
-            balance_after=seller_wallet.block_balance,
-            reason=f"Deduction for sale to buyer {buyer.id}"
-        ))
-        db.session.add(BlockLedger(
-            user_id=buyer_wallet.user_id,
-            change=reward + mined,
-            balance_after=buyer_wallet.block_balance,
-            reason=f"Reward for confirming delivery of product {order.product_id}"
-        ))
-
-        # Transaction entries
-        db.session.add(Transaction(
-            sender_id=seller_wallet.user_id,
-            receiver_id=buyer_wallet.user_id,
-            order_id=order.id,
-            amount=reward,
-            currency="BLOCK",
-            tx_type="DELIVERY_REWARD",
-            description=f"10% transferred from seller to buyer on order {order.id}"
-        ))
-
-        db.session.add(Transaction(
-            sender_id=None,  # system-generated mining
-            receiver_id=buyer_wallet.user_id,
-            order_id=order.id,
-            amount=mined,
-            currency="BLOCK",
-            tx_type="MINED_BLOCK",
-            description=f"10% newly mined block reward for order {order.id}"
-        ))
+    db.session.commit()
 
     return jsonify({
         "message": "Delivery confirmed and rewards distributed.",
@@ -403,3 +564,11 @@ def delete_all_posts(user):
 
     db.session.commit()
     return jsonify({"message": "Posts deleted successfully!"}), 200
+
+
+# ------------------ Maintenance commands ------------------
+@product_bp.cli.command("rebuild-escrow")
+def rebuild_escrow_command():
+    """Recompute seller_escrow from orders (flask product rebuild-escrow)."""
+    count = escrow.rebuild_escrow()
+    print(f"✅ Rebuilt escrow balances for {count} sellers")
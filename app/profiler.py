@@ -0,0 +1,241 @@
+# app/profiler.py
+
+import logging
+import re
+import time
+from collections import deque
+from threading import Lock
+
+from flask import Response, current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import Counter
+
+n_plus_one_detected = Counter(
+    "sql_n_plus_one_total",
+    "Requests where one statement shape ran often enough to look like an N+1.",
+    ("endpoint",),
+)
+budget_exceeded = Counter(
+    "sql_query_budget_exceeded_total",
+    "Requests that ran more statements than their endpoint's query budget.",
+    ("endpoint",),
+)
+
+PROFILE_HEADER = "X-SQL-Profile"
+
+profile_logger = logging.getLogger("app.sql")
+
+# Literals and placeholder lists vary per call; strip them so repeats of the
+# same statement share one shape.
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """An endpoint ran more statements than its budget while budgets are enforced (tests)."""
+
+
+def statement_shape(statement):
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def query_budget(max_queries):
+    """
+    Declare the most statements a view should need; goes directly under the
+    route decorator. SQL_QUERY_BUDGETS entries (by endpoint name) override it.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+class RequestProfile:
+    """Statements run during one request, grouped by shape."""
+
+    def __init__(self, endpoint, method, path):
+        self.endpoint = endpoint
+        self.method = method
+        self.path = path
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = {}   # shape -> [count, seconds]
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        entry = self.shapes.setdefault(statement_shape(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def repeated(self, threshold):
+        """Shapes run at least `threshold` times, most frequent first: likely N+1s."""
+        return sorted(
+            ((shape, count, seconds) for shape, (count, seconds) in self.shapes.items() if count >= threshold),
+            key=lambda item: -item[1],
+        )
+
+    def to_dict(self, threshold, budget=None):
+        return {
+            "endpoint": self.endpoint,
+            "method": self.method,
+            "path": self.path,
+            "queries": self.count,
+            "db_time_ms": round(self.seconds * 1000, 2),
+            "budget": budget,
+            "n_plus_one": [
+                {"statement": shape, "count": count, "db_time_ms": round(seconds * 1000, 2)}
+                for shape, count, seconds in self.repeated(threshold)
+            ],
+            "statements": [
+                {"statement": shape, "count": count, "db_time_ms": round(seconds * 1000, 2)}
+                for shape, (count, seconds) in sorted(self.shapes.items(), key=lambda item: -item[1][1])
+            ],
+        }
+
+    def header(self, threshold):
+        return (f"queries={self.count}; db_time_ms={self.seconds * 1000:.2f}; "
+                f"n_plus_one={len(self.repeated(threshold))}")
+
+
+# -------------------------------------------------
+# SQLAlchemy hooks
+# -------------------------------------------------
+
+def _current_profile():
+    if has_request_context():
+        return g.get("sql_profile")
+    return None
+
+
+# The start time lives on the execution context, not the connection, so a
+# statement that raises (and never reaches after_cursor_execute) leaves
+# nothing behind to skew later timings on the pooled connection.
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current_profile() is not None:
+        context.sql_profile_started = time.perf_counter()
+
+
+def _record(statement, context):
+    profile = _current_profile()
+    started = getattr(context, "sql_profile_started", None)
+    if profile is None or started is None:
+        return
+    del context.sql_profile_started
+    profile.record(statement, time.perf_counter() - started)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    _record(statement, context)
+
+
+@event.listens_for(Engine, "handle_error")
+def _execute_failed(exception_context):
+    # A failed statement still went to the database; count it too
+    if exception_context.statement is not None:
+        _record(exception_context.statement, exception_context.execution_context)
+
+
+# -------------------------------------------------
+# Request hooks
+# -------------------------------------------------
+
+_recent = deque(maxlen=100)   # resized from SQL_PROFILER_HISTORY in init_app
+_recent_lock = Lock()
+
+
+def _enabled():
+    mode = current_app.config["SQL_PROFILER"]
+    if mode == "all":
+        return True
+    return mode == "header" and request.headers.get(PROFILE_HEADER) == "1"
+
+
+def _start_profile():
+    if _enabled():
+        g.sql_profile = RequestProfile(request.endpoint, request.method, request.path)
+
+
+def _budget_for(endpoint):
+    budgets = current_app.config["SQL_QUERY_BUDGETS"]
+    if endpoint in budgets:
+        return budgets[endpoint]
+    view = current_app.view_functions.get(endpoint)
+    return getattr(view, "query_budget", None)
+
+
+def _close_profile(profile, threshold, budget, enforce):
+    summary = profile.to_dict(threshold, budget)
+    with _recent_lock:
+        _recent.append(summary)
+
+    if summary["n_plus_one"]:
+        n_plus_one_detected.inc(endpoint=profile.endpoint)
+        worst = summary["n_plus_one"][0]
+        profile_logger.warning("possible N+1", extra={
+            "endpoint": profile.endpoint, "statement": worst["statement"], "count": worst["count"],
+        })
+
+    if budget is not None and profile.count > budget:
+        budget_exceeded.inc(endpoint=profile.endpoint)
+        if enforce:
+            raise QueryBudgetExceeded(f"{profile.endpoint} ran {profile.count} queries (budget {budget})")
+        profile_logger.warning("query budget exceeded", extra={
+            "endpoint": profile.endpoint, "queries": profile.count, "budget": budget,
+        })
+
+
+def _finish_profile(response):
+    profile = g.get("sql_profile")
+    if profile is None:
+        return response
+
+    config = current_app.config
+    args = (profile, config["SQL_N_PLUS_ONE_THRESHOLD"], _budget_for(profile.endpoint),
+            config["SQL_QUERY_BUDGET_ENFORCE"])
+    if response.is_streamed:
+        # The body (and its queries) comes later; close the profile once it is
+        # sent. No header, since headers go out first.
+        response.call_on_close(lambda: _close_profile(*args))
+        return response
+    response.headers[PROFILE_HEADER] = profile.header(args[1])
+    _close_profile(*args)
+    return response
+
+
+def recent_profiles_view():
+    """The last profiled requests, newest first; needs `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = current_app.config.get("METRICS_TOKEN")
+    if not token or request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    endpoint = request.args.get("endpoint")
+    with _recent_lock:
+        profiles = [p for p in reversed(_recent) if not endpoint or p["endpoint"] == endpoint]
+    return jsonify(profiles)
+
+
+def init_app(app):
+    """
+    Opt-in: SQL_PROFILER="all" profiles every request, "header" only requests
+    sent with `X-SQL-Profile: 1`, and "off" (the default) installs nothing.
+    /debug/sql-profiles exposes SQL shapes, so it is only served when
+    METRICS_TOKEN is set.
+    """
+    global _recent
+    if app.config["SQL_PROFILER"] == "off":
+        return
+    _recent = deque(_recent, maxlen=app.config["SQL_PROFILER_HISTORY"])
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    if app.config.get("METRICS_TOKEN"):
+        app.add_url_rule("/debug/sql-profiles", "sql_profiles", recent_profiles_view)
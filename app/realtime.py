@@ -0,0 +1,176 @@
+# app/realtime.py
+
+import logging
+from decimal import Decimal
+
+from flask import request
+from flask_socketio import join_room
+from sqlalchemy import event, inspect
+
+from app import socketio
+from app.auth.views import principal_from_token
+from app.models import db, Wallet, Order, ExchangeTx, ExchangeListing
+
+PENDING_KEY = "realtime_events"
+CENT = Decimal("0.01")
+MARKET_ROOM = "market"
+
+logger = logging.getLogger("app.realtime")
+
+# Events pushed to clients (room -> event name -> payload):
+#   user:<id>  wallet.balance   {"block_balance"?, "fiat_balance"?}
+#   user:<id>  order.status     {"order_id", "status", "role"}
+#   user:<id>  exchange.fill    ExchangeTx.to_dict() plus "role"
+#   user:<id>  wallet.account   AccountProvisioning.to_dict(), plus the account details when READY
+#   market     exchange.trade   {"price", "quantity", "time"}
+#   market     exchange.listing {"listing_id", "price", "remaining", "status"}
+
+
+def user_room(user_id):
+    return f"user:{user_id}"
+
+
+# -------------------------------------------------
+# Connections
+# -------------------------------------------------
+
+@socketio.on("connect")
+def on_connect(auth=None):
+    """
+    Accept only clients presenting a valid JWT, as {"token": ...} in the
+    Socket.IO auth payload, ?token= or an Authorization header. Each user
+    joins their own room plus the public market room.
+    """
+    token = (auth or {}).get("token") or request.args.get("token") or request.headers.get("Authorization")
+    if not token:
+        raise ConnectionRefusedError("Token is missing")
+    try:
+        user = principal_from_token(token)
+    except Exception:
+        user = None
+    if user is None:
+        raise ConnectionRefusedError("Invalid token")
+
+    join_room(user_room(user.id))
+    join_room(MARKET_ROOM)
+
+
+# -------------------------------------------------
+# Queueing inside a transaction, emitting after commit
+# -------------------------------------------------
+
+def queue_event(event_name, payload, room, session=None, coalesce=False):
+    """
+    Hold an event on the session until its transaction commits. Each event is
+    tagged with the innermost transaction (savepoint or not) that queued it,
+    and dropped if that transaction or any enclosing one rolls back. With
+    coalesce=True a pending event for the same room and name, queued in the
+    same transaction, is updated in place, so a transaction that moves a
+    balance several times pushes only the final values.
+    """
+    session = session if session is not None else db.session()
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    pending = session.info.setdefault(PENDING_KEY, [])
+    if coalesce:
+        for name, queued, queued_room, queued_in in pending:
+            if name == event_name and queued_room == room and queued_in is transaction:
+                queued.update(payload)
+                return
+    pending.append((event_name, dict(payload), room, transaction))
+
+
+def notify_user(user_id, event_name, payload, session=None, coalesce=False):
+    queue_event(event_name, payload, user_room(user_id), session=session, coalesce=coalesce)
+
+
+def notify_balance(user_id, **balances):
+    """Queue a wallet.balance push, e.g. notify_balance(7, block_balance=Decimal("12"))."""
+    notify_user(user_id, "wallet.balance", {name: str(value) for name, value in balances.items()}, coalesce=True)
+
+
+def _status_added(obj):
+    history = inspect(obj).attrs.status.history
+    return [status for status in (history.added or ()) if status not in (history.deleted or ())]
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_model_events(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, ExchangeTx) and obj.status == "COMPLETED":
+            _queue_fill(session, obj)
+        elif isinstance(obj, ExchangeListing):
+            _queue_listing(session, obj)
+
+    for obj in session.dirty:
+        if isinstance(obj, Wallet):
+            # ORM balance edits; the wallet service's UPDATEs notify directly
+            state = inspect(obj)
+            changed = {
+                name: getattr(obj, name) for name in ("block_balance", "fiat_balance")
+                if state.attrs[name].history.has_changes()
+            }
+            if changed:
+                notify_user(obj.user_id, "wallet.balance", {k: str(v) for k, v in changed.items()},
+                            session=session, coalesce=True)
+        elif isinstance(obj, Order) and _status_added(obj):
+            for user_id, role in ((obj.buyer_id, "buyer"), (obj.seller_id, "seller")):
+                notify_user(user_id, "order.status", {"order_id": obj.id, "status": obj.status, "role": role},
+                            session=session)
+        elif isinstance(obj, ExchangeTx) and "COMPLETED" in _status_added(obj):
+            _queue_fill(session, obj)
+        elif isinstance(obj, ExchangeListing) and session.is_modified(obj, include_collections=False):
+            _queue_listing(session, obj)
+
+
+def _queue_fill(session, tx):
+    fill = tx.to_dict()
+    notify_user(tx.buyer_id, "exchange.fill", dict(fill, role="buyer"), session=session)
+    notify_user(tx.seller_id, "exchange.fill", dict(fill, role="seller"), session=session)
+    queue_event("exchange.trade", {
+        "price": str((Decimal(tx.fiat_value) / Decimal(tx.block_value)).quantize(CENT)),
+        "quantity": str(tx.block_value),
+        "time": fill["completed_at"],
+    }, MARKET_ROOM, session=session)
+
+
+def _queue_listing(session, listing):
+    queue_event("exchange.listing", {
+        "listing_id": listing.id,
+        "price": str(listing.rate_per_block),
+        "remaining": str(listing.remaining_amount),
+        "status": listing.status,
+    }, MARKET_ROOM, session=session)
+
+
+@event.listens_for(db.session, "after_commit")
+def _emit_pending(session):
+    if session.in_nested_transaction():
+        return   # a savepoint was released; its events wait for the outer commit
+    for event_name, payload, room, _ in session.info.pop(PENDING_KEY, ()):
+        try:
+            socketio.emit(event_name, payload, to=room)
+        except Exception:
+            # A push is best-effort; the data is already committed
+            logger.warning("could not emit event", extra={"event": event_name, "room": room}, exc_info=True)
+
+
+def _within(transaction, ancestor):
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _drop_rolled_back(session, previous_transaction):
+    """Drop the events queued in a transaction that rolled back (a savepoint included) or inside it."""
+    pending = session.info.get(PENDING_KEY)
+    if pending:
+        pending[:] = [entry for entry in pending if not _within(entry[3], previous_transaction)]
+
+
+@event.listens_for(db.session, "after_transaction_end")
+def _clear_pending(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,63 @@
+# app/rollups.py
+
+from sqlalchemy import case, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def _insert_for(connection):
+    name = connection.dialect.name
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Rollup upserts are not implemented for {name}")
+
+
+def _extremes(connection):
+    # SQLite's two-argument max()/min() are its scalar GREATEST/LEAST
+    if connection.dialect.name == "postgresql":
+        return func.greatest, func.least
+    return func.max, func.min
+
+
+def upsert_increment(connection, table, key_columns, rows, replace=(), keep=(), greatest=(), least=(), latest=None):
+    """
+    Add each row's numeric deltas onto the matching rollup row, creating it if missing.
+
+    Runs as a single INSERT ... ON CONFLICT DO UPDATE SET col = col + excluded.col
+    executemany, so concurrent writers never lose increments. Every row must have
+    the same keys; columns listed in `replace` are overwritten instead of summed
+    (e.g. updated_at), `keep` columns keep the first value written (a candle's
+    open), and `greatest`/`least` columns keep the larger/smaller value (high/low).
+    `latest` maps columns to the timestamp column they go with: both are taken
+    from the incoming row only if its timestamp is at least the stored one (a
+    candle's close and close_at), so a late-committing older write can't win.
+    """
+    if not rows:
+        return
+
+    insert = _insert_for(connection)
+    stmt = insert(table)
+    larger, smaller = _extremes(connection)
+    stamped = dict(latest or {})
+    stamped.update({stamp: stamp for stamp in stamped.values()})
+
+    def merged(c):
+        if c in stamped:
+            stamp = stamped[c]
+            newer = or_(table.c[stamp].is_(None), stmt.excluded[stamp] >= table.c[stamp])
+            return case((newer, stmt.excluded[c]), else_=table.c[c])
+        if c in replace:
+            return stmt.excluded[c]
+        if c in greatest:
+            return larger(table.c[c], stmt.excluded[c])
+        if c in least:
+            return smaller(table.c[c], stmt.excluded[c])
+        return table.c[c] + stmt.excluded[c]
+
+    columns = [c for c in rows[0] if c not in key_columns and c not in keep]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={c: merged(c) for c in columns},
+    )
+    connection.execute(stmt, rows)
@@ -0,0 +1,87 @@
+# app/tasks.py
+
+from flask import current_app
+
+from app import celery
+from app.auth import revocation
+from app.ledger import platform, supply
+from app.paystack import accounts, lookups, webhooks, withdrawals
+from app.paystack.client import PaystackError
+
+
+@celery.task(name="app.tasks.reconcile_platform_metrics")
+def reconcile_platform_metrics():
+    """Periodic: fix any drift in the platform_metrics rollup."""
+    drift = platform.reconcile_platform_metrics()
+    return {name: str(correction) for name, correction in drift.items()}
+
+
+@celery.task(name="app.tasks.reconcile_block_supply")
+def reconcile_block_supply():
+    """Periodic: fold new ledger entries into the supply checkpoint and report drift."""
+    return supply.reconcile_supply()
+
+
+@celery.task(name="app.tasks.process_paystack_events")
+def process_paystack_events():
+    """Drain the Paystack webhook inbox in batches (also runs as a periodic sweep)."""
+    total = 0
+    while True:
+        handled = webhooks.process_pending_events()
+        total += handled
+        if handled == 0:
+            return total
+
+
+@celery.task(name="app.tasks.refresh_paystack_banks")
+def refresh_paystack_banks():
+    """Revalidate the cached Paystack bank list after it goes stale."""
+    try:
+        banks = lookups.refresh_banks()
+    finally:
+        lookups.bank_cache.pop(lookups.BANKS_REFRESH_LOCK)
+    return len(banks) if banks is not None else None
+
+
+@celery.task(name="app.tasks.advance_withdrawal", bind=True)
+def advance_withdrawal(self, withdrawal_id):
+    """Run the withdrawal state machine; back off and retry on Paystack errors."""
+    try:
+        return withdrawals.advance_withdrawal(withdrawal_id)
+    except PaystackError as e:
+        countdown = current_app.config["WITHDRAWAL_RETRY_SECONDS"] * (2 ** self.request.retries)
+        raise self.retry(exc=e, countdown=countdown, max_retries=current_app.config["WITHDRAWAL_MAX_ATTEMPTS"])
+
+
+@celery.task(name="app.tasks.resume_stalled_withdrawals")
+def resume_stalled_withdrawals():
+    """Periodic: re-enqueue withdrawals whose worker died or ran out of retries."""
+    ids = withdrawals.stalled_withdrawal_ids()
+    for withdrawal_id in ids:
+        advance_withdrawal.delay(withdrawal_id)
+    return len(ids)
+
+
+@celery.task(name="app.tasks.provision_dedicated_account", bind=True)
+def provision_dedicated_account(self, user_id):
+    """Create a new user's Paystack customer and dedicated account; back off and retry on Paystack errors."""
+    try:
+        return accounts.provision_account(user_id)
+    except PaystackError as e:
+        countdown = current_app.config["ACCOUNT_PROVISION_RETRY_SECONDS"] * (2 ** self.request.retries)
+        raise self.retry(exc=e, countdown=countdown, max_retries=current_app.config["ACCOUNT_PROVISION_MAX_ATTEMPTS"])
+
+
+@celery.task(name="app.tasks.resume_stalled_account_provisioning")
+def resume_stalled_account_provisioning():
+    """Periodic: re-enqueue account provisioning whose worker died or whose retry was lost."""
+    ids = accounts.stalled_provisioning_ids()
+    for user_id in ids:
+        provision_dedicated_account.delay(user_id)
+    return len(ids)
+
+
+@celery.task(name="app.tasks.purge_revoked_tokens")
+def purge_revoked_tokens():
+    """Periodic: drop revocations for tokens that have expired anyway."""
+    return revocation.purge_expired()
@@ -0,0 +1,203 @@
+# app/telemetry.py
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import Counter, Histogram, collect, render_prometheus, write_snapshot
+
+request_latency = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests, by route.",
+    ("method", "route", "status"),
+)
+request_queries = Histogram(
+    "http_request_db_queries",
+    "Database statements executed per HTTP request, by route.",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+logs_dropped = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the logging queue was full.",
+)
+
+request_logger = logging.getLogger("app.requests")
+metrics_logger = logging.getLogger("app.metrics")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and any `extra` fields."""
+
+    RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in self.RESERVED)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the request thread: records that don't fit in the queue are counted and dropped."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            logs_dropped.inc()
+
+
+_listener = None
+
+
+def init_logging(app):
+    """
+    Route the app's loggers through a bounded in-memory queue; a background
+    thread formats records as JSON lines and writes them to stdout, so request
+    threads never wait on I/O.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue(maxsize=app.config["LOG_QUEUE_SIZE"])
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    handler = DroppingQueueHandler(log_queue)
+    for logger in (logging.getLogger("app"), app.logger):
+        logger.handlers[:] = [handler]
+        logger.setLevel(app.config["LOG_LEVEL"])
+        logger.propagate = False
+
+
+# -------------------------------------------------
+# Sharing metrics between worker processes
+# -------------------------------------------------
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def _flush(directory):
+    try:
+        write_snapshot(directory)
+    except OSError:
+        metrics_logger.warning("could not write metrics snapshot", exc_info=True)
+
+
+def _start_flusher(directory, seconds):
+    """
+    Write this process's metrics to `directory` every `seconds` and at exit.
+    Started from the first request in each process, so it runs in every
+    gunicorn worker whether or not the app was loaded before the fork.
+    """
+    global _flusher_pid
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(seconds)
+            _flush(directory)
+
+    threading.Thread(target=run, name="metrics-flusher", daemon=True).start()
+    atexit.register(_flush, directory)
+
+
+# -------------------------------------------------
+# Per-request telemetry
+# -------------------------------------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "telemetry_started" in g:
+        g.telemetry_queries += 1
+
+
+def _start_request():
+    directory = current_app.config["METRICS_MULTIPROC_DIR"]
+    if directory and _flusher_pid != os.getpid():
+        _start_flusher(directory, current_app.config["METRICS_FLUSH_SECONDS"])
+    g.telemetry_started = time.perf_counter()
+    g.telemetry_queries = 0
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+
+
+def _finish_request(response):
+    started = g.pop("telemetry_started", None)
+    if started is None:
+        return response
+    # Streamed bodies are still being generated; this times the view itself
+    duration = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    method = request.method
+    request_latency.observe(duration, method=method, route=route, status=response.status_code)
+    request_queries.observe(g.telemetry_queries, method=method, route=route)
+    response.headers.setdefault("X-Request-ID", g.request_id)
+
+    config = current_app.config
+    slow = duration >= config["TELEMETRY_SLOW_REQUEST_SECONDS"]
+    if response.status_code >= 500 or slow or random.random() < config["TELEMETRY_SAMPLE_RATE"]:
+        request_logger.log(
+            logging.WARNING if response.status_code >= 500 or slow else logging.INFO,
+            "request",
+            extra={
+                "request_id": g.request_id,
+                "method": method,
+                "path": request.path,
+                "route": route,
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 2),
+                "db_queries": g.telemetry_queries,
+            },
+        )
+    return response
+
+
+def metrics_view():
+    """
+    Prometheus scrape endpoint; needs `Authorization: Bearer <METRICS_TOKEN>` when one is set.
+    With METRICS_MULTIPROC_DIR it reports every worker's metrics, not just this one's.
+    """
+    token = current_app.config.get("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    directory = current_app.config["METRICS_MULTIPROC_DIR"]
+    if not directory:
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+    _flush(directory)
+    return Response(render_prometheus(collect(directory)), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    init_logging(app)
+    # First, so the timing covers the other before_request hooks too
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -188,14 +188,14 @@ def has_exhausted_initial_blocks(user):
     Checks if the user has spent up to their initial allocated block balance
     (based on completed orders).
     """
-    from models import Order, Wallet
+    from app.models import Order
 
     wallet = Wallet.query.filter_by(user_id=user.id).first()
     if not wallet:
         return False
 
     total_spent = (
-        db.session.query(db.func.sum(Order.amount))
+        db.session.query(db.func.sum(Order.price * Order.quantity))
         .filter(Order.buyer_id == user.id, Order.status == "COMPLETED")
         .scalar()
     ) or 0.0
@@ -0,0 +1,187 @@
+# app/wallet/referrals.py
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import case, event, func, inspect
+
+from app.models import db, User, Referral, ReferralStat
+from app.pagination import keyset_page, parse_limit
+from app.rollups import upsert_increment
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+REFERRAL_STATUSES = ("rewarded", "pending")
+
+
+# -------------------------------------------------
+# Incremental maintenance
+# -------------------------------------------------
+
+def apply_referral_deltas(connection, deltas):
+    """
+    Fold (referrer_id, referrals, rewarded, reward) deltas into referral_stats.
+    Must run on the connection/transaction that writes the referral rows.
+    """
+    now = datetime.utcnow()
+    totals = {}
+    for referrer_id, referrals, rewarded, reward in deltas:
+        row = totals.get(referrer_id)
+        if row is None:
+            row = totals[referrer_id] = {
+                "referrer_id": referrer_id, "referral_count": 0, "rewarded_count": 0,
+                "reward_total": ZERO, "updated_at": now,
+            }
+        row["referral_count"] += referrals
+        row["rewarded_count"] += rewarded
+        row["reward_total"] += reward
+
+    # Sorted so concurrent transactions lock stat rows in the same order
+    rows = [totals[referrer_id] for referrer_id in sorted(totals)]
+    upsert_increment(connection, ReferralStat.__table__, ("referrer_id",), rows, replace=("updated_at",))
+
+
+def _bonus(referral):
+    return Decimal(str(referral.bonus_amount or 0)).quantize(CENT)
+
+
+def _rewarded_now(referral):
+    history = inspect(referral).attrs.rewarded.history
+    return True in (history.added or ()) and True not in (history.deleted or ())
+
+
+@event.listens_for(db.session, "after_flush")
+def _count_referrals(session, flush_context):
+    deltas = []
+    for obj in session.new:
+        if isinstance(obj, Referral):
+            rewarded = bool(obj.rewarded)
+            deltas.append((obj.referrer_id, 1, int(rewarded), _bonus(obj) if rewarded else ZERO))
+    for obj in session.dirty:
+        if isinstance(obj, Referral) and _rewarded_now(obj):
+            deltas.append((obj.referrer_id, 0, 1, _bonus(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Referral):
+            rewarded = bool(obj.rewarded)
+            deltas.append((obj.referrer_id, -1, -int(rewarded), -_bonus(obj) if rewarded else ZERO))
+    if deltas:
+        apply_referral_deltas(session.connection(), deltas)
+
+
+def mark_rewarded(referral, bonus):
+    """
+    Flag a referral as rewarded with `bonus` blocks, unless a concurrent request
+    already did. A single conditional UPDATE, so only one caller wins; the stats
+    row is bumped on the same connection. Returns True if this call won; the
+    caller commits.
+    """
+    bonus = Decimal(bonus).quantize(CENT)
+    now = datetime.utcnow()
+    result = db.session.execute(
+        db.update(Referral)
+        .where(Referral.id == referral.id, Referral.rewarded.is_(False))
+        .values(rewarded=True, rewarded_at=now, bonus_amount=float(bonus))
+        .execution_options(synchronize_session="fetch")
+    )
+    if result.rowcount != 1:
+        return False
+    apply_referral_deltas(db.session.connection(), [(referral.referrer_id, 0, 1, bonus)])
+    return True
+
+
+def rebuild_referral_stats():
+    """Recompute referral_stats from referrals. Returns the number of referrers."""
+    r = Referral
+    select = db.select(
+        r.referrer_id,
+        func.count(r.id),
+        func.coalesce(func.sum(case((r.rewarded.is_(True), 1), else_=0)), 0),
+        func.coalesce(func.sum(case((r.rewarded.is_(True), r.bonus_amount), else_=0)), 0),
+        db.literal(datetime.utcnow(), db.DateTime),
+    ).group_by(r.referrer_id)
+
+    db.session.execute(db.delete(ReferralStat))
+    db.session.execute(
+        db.insert(ReferralStat).from_select(
+            ["referrer_id", "referral_count", "rewarded_count", "reward_total", "updated_at"], select
+        )
+    )
+    db.session.commit()
+    return ReferralStat.query.count()
+
+
+# -------------------------------------------------
+# Reads
+# -------------------------------------------------
+
+def query_referrals_page(referrer_id, args):
+    """
+    One keyset page of the user's referrals, newest first, each row carrying the
+    referred user's name from the same query. Optional status=rewarded|pending.
+    Returns ([(Referral, name)], next_cursor); raises ValueError (incl. CursorError).
+    """
+    limit = parse_limit(args.get("limit"))
+    query = (
+        db.session.query(Referral, User.name)
+        .outerjoin(User, User.id == Referral.referred_id)
+        .filter(Referral.referrer_id == referrer_id)
+    )
+    status = args.get("status")
+    if status:
+        if status not in REFERRAL_STATUSES:
+            raise ValueError(f"status must be one of {', '.join(REFERRAL_STATUSES)}")
+        query = query.filter(Referral.rewarded.is_(status == "rewarded"))
+
+    return keyset_page(
+        query, [Referral.created_at, Referral.id], cursor=args.get("cursor"), limit=limit,
+        key=lambda row: (row[0].created_at, row[0].id),
+    )
+
+
+def serialize_referral(row):
+    referral, name = row
+    return {
+        "referred_user_id": referral.referred_id,
+        "referred_user_name": name or "Unknown",
+        "rewarded": referral.rewarded,
+        "bonus_amount": str(_bonus(referral)),
+        "created_at": referral.created_at.isoformat(),
+        "rewarded_at": referral.rewarded_at.isoformat() if referral.rewarded_at else None,
+    }
+
+
+def get_referral_stat(referrer_id):
+    """Return the user's ReferralStat, or an all-zero one if they have referred nobody yet."""
+    stat = ReferralStat.query.get(referrer_id)
+    if stat is None:
+        stat = ReferralStat(referrer_id=referrer_id, referral_count=0, rewarded_count=0, reward_total=ZERO)
+    return stat
+
+
+def referral_rank(stat):
+    """1-based leaderboard position (ties share a rank), or None with no referrals."""
+    if not stat.referral_count:
+        return None
+    ahead = ReferralStat.query.filter(ReferralStat.referral_count > stat.referral_count).count()
+    return ahead + 1
+
+
+def get_leaderboard(limit):
+    """Top `limit` referrers by referral count, read off the referral_stats index."""
+    rows = (
+        db.session.query(ReferralStat, User.name)
+        .outerjoin(User, User.id == ReferralStat.referrer_id)
+        .filter(ReferralStat.referral_count > 0)
+        .order_by(ReferralStat.referral_count.desc(), ReferralStat.referrer_id)
+        .limit(limit)
+        .all()
+    )
+    leaderboard = []
+    rank = 0
+    previous = None
+    for position, (stat, name) in enumerate(rows, start=1):
+        if stat.referral_count != previous:
+            rank, previous = position, stat.referral_count
+        leaderboard.append(dict(stat.to_dict(), rank=rank, name=name or "Unknown"))
+    return leaderboard
@@ -0,0 +1,83 @@
+# app/wallet/service.py
+
+from decimal import Decimal
+
+from sqlalchemy import update
+
+from app.models import db, Wallet, LedgerEntryType
+from app.realtime import notify_balance
+from app.ledger.posting import (
+    post, Entry, MINT, BURN,
+    WalletError, WalletNotFound, InsufficientFunds,
+)
+
+
+# -------------------------------------------------
+# Fiat: one conditional UPDATE ... RETURNING
+# -------------------------------------------------
+
+def _apply_fiat(user_id, delta, require_funds):
+    column = Wallet.fiat_balance
+    stmt = update(Wallet).where(Wallet.user_id == user_id)
+    if require_funds:
+        stmt = stmt.where(column >= -delta)
+    stmt = stmt.values({column: column + delta}).returning(column)
+    new_balance = db.session.execute(stmt).scalar_one_or_none()
+
+    if new_balance is None:
+        if require_funds and db.session.query(Wallet.id).filter_by(user_id=user_id).first():
+            raise InsufficientFunds("Insufficient fiat balance")
+        raise WalletNotFound(f"Wallet not found for user {user_id}")
+    notify_balance(user_id, fiat_balance=new_balance)
+    return Decimal(new_balance)
+
+
+def credit_fiat(user_id, amount):
+    """Add naira to a wallet; returns the new fiat balance (caller commits)."""
+    return _apply_fiat(user_id, Decimal(amount), require_funds=False)
+
+
+def debit_fiat(user_id, amount):
+    """Remove naira only if the balance covers it; raises InsufficientFunds otherwise."""
+    return _apply_fiat(user_id, -Decimal(amount), require_funds=True)
+
+
+# -------------------------------------------------
+# Blocks: journals through app.ledger.posting
+# -------------------------------------------------
+
+def credit_blocks(user_id, amount, reason, entry_type, source=MINT):
+    """Credit blocks from a system account (MINT by default); returns the new block balance."""
+    amount = Decimal(amount)
+    return post([
+        Entry(user_id, amount, reason, entry_type),
+        Entry(source, -amount),
+    ])[user_id]
+
+
+def debit_blocks(user_id, amount, reason, entry_type, sink=BURN):
+    """Move blocks into a system account (BURN by default) if the balance covers them."""
+    amount = Decimal(amount)
+    return post([
+        Entry(user_id, -amount, reason, entry_type),
+        Entry(sink, amount),
+    ])[user_id]
+
+
+def transfer_blocks(sender_id, receiver_id, amount, sender_reason, receiver_reason,
+                    entry_type=LedgerEntryType.TRANSFER):
+    """
+    Move blocks between two wallets as one journal (both rows locked in
+    wallet-id order). Returns (sender_balance, receiver_balance); the caller commits.
+    """
+    amount = Decimal(amount)
+    if amount <= 0:
+        raise WalletError("Amount must be greater than zero")
+    if sender_id == receiver_id:
+        raise WalletError("Cannot transfer to the same wallet")
+
+    balances = post([
+        Entry(sender_id, -amount, sender_reason, entry_type),
+        Entry(receiver_id, amount, receiver_reason, entry_type),
+    ])
+    return balances[sender_id], balances[receiver_id]
@@ -1,11 +1,21 @@
 # app/routes/wallet_routes.py
 
+import logging
+
 from flask import Blueprint, jsonify, request
 from decimal import Decimal
-from app.models import db, User, Wallet, BlockLedger
+from app.models import db, User, Wallet, BlockLedger, LedgerEntryType, AccountProvisioning
 from app.auth.views import token_required
+from app.ledger.views import query_ledger_page
+from app.ledger.summaries import get_summary
+from app.pagination import iter_json_array, iter_json_object, parse_limit, streamed_json, CursorError
+from app.profiler import query_budget
+from app.wallet.service import credit_fiat, debit_fiat, credit_blocks, WalletError, WalletNotFound
+from app.wallet import referrals
+from app.paystack import accounts
 
 wallet_bp = Blueprint("wallet", __name__)
+logger = logging.getLogger("app.wallet")
 
 
 # -----------------------------------
@@ -15,12 +25,15 @@ wallet_bp = Blueprint("wallet", __name__)
 @token_required
 def get_wallet(user):
     """Return wallet balances for the logged-in user"""
-    print(user)
-    print("✅ Wallet route hit")
-    print("Headers received:", dict(request.headers))
-    wallet = Wallet.query.filter_by(user_id=user.id).first()
-    if not wallet:
+    row = (
+        db.session.query(Wallet, AccountProvisioning)
+        .outerjoin(AccountProvisioning, AccountProvisioning.user_id == Wallet.user_id)
+        .filter(Wallet.user_id == user.id)
+        .first()
+    )
+    if not row:
         return jsonify({"error": "Wallet not found"}), 404
+    wallet, provisioning = row
 
     return jsonify({
         "user_id": user.id,
@@ -29,10 +42,33 @@ def get_wallet(user):
         "fiat_balance": str(wallet.fiat_balance),
         "created_at": str(wallet.created_at),
         "paystack_bank_name": str(wallet.paystack_bank_name),
-        "paystack_dedicated_account": str(wallet.paystack_dedicated_account)
+        "paystack_dedicated_account": str(wallet.paystack_dedicated_account),
+        "account_provisioning": accounts.provisioning_status(wallet, provisioning),
     })
 
 
+# -----------------------------------
+# Retry dedicated account provisioning
+# -----------------------------------
+@wallet_bp.route("/wallet/account/retry", methods=["POST"])
+@token_required
+def retry_account_provisioning(user):
+    """Re-queue a FAILED Paystack dedicated-account provisioning (e.g. after adding an email)."""
+    provisioning = accounts.retry_provisioning(user.id)
+    if provisioning is None:
+        return jsonify({"error": "No failed account provisioning to retry"}), 400
+
+    # Imported here: app.tasks imports the paystack package, which imports this blueprint's package
+    from app.tasks import provision_dedicated_account
+    try:
+        provision_dedicated_account.delay(user.id)
+    except Exception:
+        # Still PENDING; the resume-stalled-account-provisioning sweep will pick it up
+        logger.warning("could not enqueue account provisioning", extra={"user_id": user.id}, exc_info=True)
+
+    return jsonify({"account_provisioning": provisioning.to_dict()}), 202
+
+
 # -----------------------------------
 # Add fiat to wallet (for testing)
 # -----------------------------------
@@ -49,13 +85,16 @@ def deposit_fiat(user):
     if amount <= 0:
         return jsonify({"error": "Invalid deposit amount"}), 400
 
-    with db.session.begin():
-        wallet = Wallet.query.filter_by(user_id=user.id).first()
-        wallet.fiat_balance += amount
+    try:
+        fiat_balance = credit_fiat(user.id, amount)
+    except WalletNotFound as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 404
+    db.session.commit()
 
     return jsonify({
         "message": f"₦{amount} deposited successfully",
-        "fiat_balance": str(wallet.fiat_balance)
+        "fiat_balance": str(fiat_balance)
     })
 
 
@@ -75,16 +114,20 @@ def withdraw_fiat(user):
     if amount <= 0:
         return jsonify({"error": "Invalid withdrawal amount"}), 400
 
-    wallet = Wallet.query.filter_by(user_id=user.id).first()
-    if wallet.fiat_balance < amount:
+    # Single conditional UPDATE: concurrent withdrawals cannot overdraw
+    try:
+        fiat_balance = debit_fiat(user.id, amount)
+    except WalletNotFound as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 404
+    except WalletError:
+        db.session.rollback()
         return jsonify({"error": "Insufficient balance"}), 400
-
-    with db.session.begin():
-        wallet.fiat_balance -= amount
+    db.session.commit()
 
     return jsonify({
         "message": f"₦{amount} withdrawn successfully",
-        "fiat_balance": str(wallet.fiat_balance)
+        "fiat_balance": str(fiat_balance)
     })
 
 
@@ -95,24 +138,16 @@ def withdraw_fiat(user):
 @token_required
 def get_ledger(user):
     """
-    Get all block balance changes (history)
+    Get block balance changes (history), newest first.
+    Supports type, start, end, limit and cursor like /ledger/history;
+    pass the returned next_cursor to fetch older entries.
     """
-    entries = (
-        BlockLedger.query.filter_by(user_id=user.id)
-        .order_by(BlockLedger.timestamp.desc())
-        .all()
-    )
-    
-    history = []
-    for e in entries:
-        history.append({
-            "change": str(e.change),
-            "balance_after": str(e.balance_after),
-            "reason": e.reason,
-            "timestamp": str(e.timestamp)
-        })
+    try:
+        entries, next_cursor = query_ledger_page(user.id, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify({"ledger": history})
+    return streamed_json(iter_json_object("ledger", entries, BlockLedger.to_dict, next_cursor=next_cursor))
 
 
 
@@ -170,7 +205,10 @@ def apply_referral(user):
     if existing:
         return jsonify({"error": "Referral already applied"}), 400
 
-    referral = Referral(referrer_id=referrer.id, referred_id=user.id)
+    if referrer.id == user.id:
+        return jsonify({"error": "You cannot refer yourself"}), 400
+
+    referral = Referral(referrer_id=referrer.id, referred_id=user.id, referral_code=code)
     db.session.add(referral)
     db.session.commit()
 
@@ -189,18 +227,18 @@ def reward_referrer(buyer_id, transaction_value):
     if not referral or referral.rewarded:
         return  # No reward or already rewarded
 
-    referrer_wallet = Wallet.query.filter_by(user_id=referral.referrer_id).first()
-    reward_amount = Decimal(transaction_value) * Decimal("0.05")
+    reward_amount = (Decimal(transaction_value) * Decimal("0.05")).quantize(Decimal("0.01"))
 
-    with db.session.begin():
-        referrer_wallet.block_balance += reward_amount
-        referral.rewarded = True
-        db.session.add(BlockLedger(
-            user_id=referral.referrer_id,
-            change=reward_amount,
-            balance_after=referrer_wallet.block_balance,
-            reason=f"Referral reward from referred user {buyer_id}"
-        ))
+    # Claim the reward first so two concurrent first transactions can't both pay it
+    if not referrals.mark_rewarded(referral, reward_amount):
+        return
+    credit_blocks(
+        referral.referrer_id,
+        reward_amount,
+        reason=f"Referral reward from referred user {buyer_id}",
+        entry_type=LedgerEntryType.REFERRAL,
+    )
+    db.session.commit()
 
     return True
 
@@ -209,24 +247,46 @@ def reward_referrer(buyer_id, transaction_value):
 # View my referrals
 # -----------------------------------
 @wallet_bp.route("wallet/my_referrals", methods=["GET"])
+@query_budget(4)
 @token_required
 def get_my_referrals(user):
     """
-    Returns all users referred by the current user.
+    Users referred by the current user, newest first.
+    Query params:
+      - status=rewarded|pending
+      - limit, cursor (next page cursor is in the X-Next-Cursor header)
     """
-    referrals = Referral.query.filter_by(referrer_id=user.id).all()
-    results = []
+    try:
+        rows, next_cursor = referrals.query_referrals_page(user.id, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    for r in referrals:
-        referred_user = User.query.get(r.referred_id)
-        results.append({
-            "referred_user_id": r.referred_id,
-            "referred_user_name": referred_user.name if referred_user else "Unknown",
-            "rewarded": r.rewarded,
-            "created_at": r.created_at.isoformat()
-        })
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return streamed_json(iter_json_array(rows, referrals.serialize_referral), headers=headers)
 
-    return jsonify(results)
+
+@wallet_bp.route("wallet/referrals/summary", methods=["GET"])
+@token_required
+def get_referral_summary(user):
+    """Referral counts (total, rewarded, pending), blocks earned and leaderboard rank."""
+    stat = referrals.get_referral_stat(user.id)
+    return jsonify(dict(stat.to_dict(), rank=referrals.referral_rank(stat))), 200
+
+
+@wallet_bp.route("wallet/referrals/leaderboard", methods=["GET"])
+@token_required
+def get_referral_leaderboard(user):
+    """Top referrers by referral count (?limit=, default 20), plus the caller's own standing."""
+    try:
+        limit = parse_limit(request.args.get("limit"))
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    stat = referrals.get_referral_stat(user.id)
+    return jsonify({
+        "leaderboard": referrals.get_leaderboard(limit),
+        "me": dict(stat.to_dict(), rank=referrals.referral_rank(stat)),
+    }), 200
 
 
 # -----------------------------------
@@ -236,18 +296,30 @@ def get_my_referrals(user):
 @token_required
 def view_referral_rewards(user):
     """
-    Shows total earned from referrals.
+    Shows total earned from referrals plus the latest reward entries.
+    Older entries: pass next_cursor back as ?cursor=.
     """
-    ledger_entries = BlockLedger.query.filter_by(user_id=user.id).all()
-    rewards = [
-        e for e in ledger_entries if "Referral reward" in e.reason
-    ]
-    total_earned = sum(Decimal(e.change) for e in rewards)
+    args = dict(request.args, type=LedgerEntryType.REFERRAL)
+    try:
+        rewards, next_cursor = query_ledger_page(user.id, args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     return jsonify({
-        "total_earned": str(total_earned),
+        "total_earned": str(get_summary(user.id).total_referral),
         "entries": [
             {"amount": str(e.change), "reason": e.reason, "date": e.timestamp.isoformat()}
             for e in rewards
-        ]
+        ],
+        "next_cursor": next_cursor
     })
+
+
+# -----------------------------------
+# Maintenance commands
+# -----------------------------------
+@wallet_bp.cli.command("rebuild-referral-stats")
+def rebuild_referral_stats_command():
+    """Recompute referral_stats from referrals (flask wallet rebuild-referral-stats)."""
+    count = referrals.rebuild_referral_stats()
+    print(f"✅ Rebuilt referral stats for {count} referrers")
@@ -12,6 +12,10 @@ flask db upgrade
 echo "🔄 Resetting failed PostgreSQL transactions..."
 psql $DATABASE_URL -c "ROLLBACK;" || echo "⚠️ No transaction to rollback"
 
+# Each gunicorn worker writes its metrics here; /metrics merges them (app/metrics.py)
+export METRICS_MULTIPROC_DIR="${METRICS_MULTIPROC_DIR:-/tmp/coop-metrics}"
+rm -rf "$METRICS_MULTIPROC_DIR" && mkdir -p "$METRICS_MULTIPROC_DIR"
+
 echo "✅ Starting Flask application..."
 exec gunicorn -w 4 -b 0.0.0.0:$PORT run:app
 #!/bin/sh
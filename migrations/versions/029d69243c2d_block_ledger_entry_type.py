@@ -0,0 +1,69 @@
+"""block_ledger.entry_type
+
+Revision ID: 029d69243c2d
+Revises: 44316b44f68a
+Create Date: 2026-10-18 11:20:05.302118
+
+Existing rows are classified from the free-text reasons the old writers used.
+Before this series a confirmed delivery wrote the buyer a single "Reward for
+confirming delivery" row holding both the 10% seller transfer and the 10%
+newly mined blocks. Those rows are classified as transfers: counting the
+whole row as mined would overstate minted supply, and halving it cannot be
+done exactly once the two amounts were rounded into one. Mining totals
+therefore start with the split entries the new writer posts.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '029d69243c2d'
+down_revision = '44316b44f68a'
+branch_labels = None
+depends_on = None
+
+
+INDEX = ('ix_block_ledger_user_id_entry_type_timestamp', 'block_ledger',
+         ['user_id', 'entry_type', sa.text('timestamp DESC'), sa.text('id DESC')])
+BATCH_SIZE = 10000
+
+BACKFILL = sa.text("""
+    UPDATE block_ledger SET entry_type = CASE
+        WHEN reason LIKE 'Initial allocation%' THEN 'allocation'
+        WHEN reason LIKE 'Referral reward%' THEN 'referral'
+        WHEN reason LIKE 'Listed %' THEN 'listing'
+        WHEN reason LIKE 'Platform mining reward%' THEN 'mining'
+        ELSE 'transfer'
+    END
+    WHERE entry_type IS NULL AND id > :after AND id <= :until
+""")
+
+
+def _backfill(bind):
+    # One id range per statement, so no single UPDATE locks the whole table
+    last_id = bind.execute(sa.text('SELECT max(id) FROM block_ledger')).scalar() or 0
+    for after in range(0, last_id, BATCH_SIZE):
+        bind.execute(BACKFILL, {'after': after, 'until': after + BATCH_SIZE})
+
+
+def upgrade():
+    with op.batch_alter_table('block_ledger', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('entry_type', sa.String(length=20), nullable=True))
+
+    name, table, columns = INDEX
+    if op.get_bind().dialect.name == 'postgresql':
+        # Each batch commits on its own and the index builds without blocking writes
+        with op.get_context().autocommit_block():
+            _backfill(op.get_bind())
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+    else:
+        _backfill(op.get_bind())
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    op.drop_index(INDEX[0], table_name=INDEX[1])
+    with op.batch_alter_table('block_ledger', schema=None) as batch_op:
+        batch_op.drop_column('entry_type')
@@ -0,0 +1,56 @@
+"""ledger_summaries
+
+Revision ID: 0a24c0602ba8
+Revises: 029d69243c2d
+Create Date: 2026-10-18 12:41:27.660105
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a24c0602ba8'
+down_revision = '029d69243c2d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ledger_summaries',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_mined', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('total_referral', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('total_transferred_in', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('total_transferred_out', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('total_listed', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('total_allocated', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Same aggregation as app.ledger.summaries.rebuild_summaries()
+    op.execute("""
+        INSERT INTO ledger_summaries (
+            user_id, total_mined, total_referral, total_transferred_in,
+            total_transferred_out, total_listed, total_allocated, entry_count, updated_at
+        )
+        SELECT
+            user_id,
+            COALESCE(SUM(CASE WHEN entry_type = 'mining' THEN change ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN entry_type = 'referral' THEN change ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN entry_type = 'transfer' AND change >= 0 THEN change ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN entry_type = 'transfer' AND change < 0 THEN -change ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN entry_type = 'listing' THEN -change ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN entry_type = 'allocation' THEN change ELSE 0 END), 0),
+            COUNT(id),
+            CURRENT_TIMESTAMP
+        FROM block_ledger
+        GROUP BY user_id
+    """)
+
+
+def downgrade():
+    op.drop_table('ledger_summaries')
@@ -0,0 +1,60 @@
+"""withdrawals saga and transfer_recipients cache
+
+Revision ID: 3ba79c024dee
+Revises: d624e38987e1
+Create Date: 2026-10-18 16:02:11.480215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3ba79c024dee'
+down_revision = 'd624e38987e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('transfer_recipients',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('bank_code', sa.String(length=20), nullable=False),
+    sa.Column('account_number', sa.String(length=20), nullable=False),
+    sa.Column('account_name', sa.String(length=255), nullable=True),
+    sa.Column('recipient_code', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('bank_code', 'account_number', name='uq_transfer_recipients_bank_account')
+    )
+    op.create_table('withdrawals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('bank_code', sa.String(length=20), nullable=False),
+    sa.Column('account_number', sa.String(length=20), nullable=False),
+    sa.Column('account_name', sa.String(length=255), nullable=True),
+    sa.Column('recipient_code', sa.String(length=64), nullable=True),
+    sa.Column('transfer_code', sa.String(length=64), nullable=True),
+    sa.Column('reference', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('reference')
+    )
+    with op.batch_alter_table('withdrawals', schema=None) as batch_op:
+        batch_op.create_index('ix_withdrawals_status_updated_at', ['status', 'updated_at'], unique=False)
+        batch_op.create_index('ix_withdrawals_user_id_created_at', ['user_id', sa.text('created_at DESC')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('withdrawals', schema=None) as batch_op:
+        batch_op.drop_index('ix_withdrawals_user_id_created_at')
+        batch_op.drop_index('ix_withdrawals_status_updated_at')
+
+    op.drop_table('withdrawals')
+    op.drop_table('transfer_recipients')
@@ -0,0 +1,28 @@
+"""exchange listings: filled_amount and order book index
+
+Revision ID: 3bd15b774bc0
+Revises: ba8e02c98563
+Create Date: 2026-10-18 18:02:37.550921
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3bd15b774bc0'
+down_revision = 'ba8e02c98563'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('exchange_listings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('filled_amount', sa.Numeric(precision=18, scale=2), nullable=False, server_default='0'))
+        batch_op.create_index('ix_exchange_listings_status_rate_created', ['status', 'rate_per_block', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('exchange_listings', schema=None) as batch_op:
+        batch_op.drop_index('ix_exchange_listings_status_rate_created')
+        batch_op.drop_column('filled_amount')
@@ -0,0 +1,41 @@
+"""per-role order indexes with status for order history and totals
+
+Revision ID: 3e5f28509fe3
+Revises: 41072b4ad789
+Create Date: 2026-10-18 19:12:48.301662
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e5f28509fe3'
+down_revision = '41072b4ad789'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_orders_buyer_id_status_created_at', 'orders',
+     ['buyer_id', 'status', sa.text('created_at DESC'), sa.text('id DESC')]),
+    ('ix_orders_seller_id_status_created_at', 'orders',
+     ['seller_id', 'status', sa.text('created_at DESC'), sa.text('id DESC')]),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build without blocking writes on the live table
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
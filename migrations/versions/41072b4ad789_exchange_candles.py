@@ -0,0 +1,38 @@
+"""exchange_candles OHLCV rollup
+
+Run `flask exchange rebuild-candles` after upgrading to fill it from existing trades.
+
+Revision ID: 41072b4ad789
+Revises: 3bd15b774bc0
+Create Date: 2026-10-18 18:40:12.207316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '41072b4ad789'
+down_revision = '3bd15b774bc0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('exchange_candles',
+    sa.Column('interval', sa.String(length=4), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('open', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('high', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('low', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('close', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('volume', sa.Numeric(precision=24, scale=2), nullable=False),
+    sa.Column('quote_volume', sa.Numeric(precision=24, scale=2), nullable=False),
+    sa.Column('trade_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('interval', 'bucket_start')
+    )
+
+
+def downgrade():
+    op.drop_table('exchange_candles')
@@ -0,0 +1,51 @@
+"""indexes for hot ledger/order/transaction/referral/product lookups
+
+Revision ID: 44316b44f68a
+Revises: 7aa3c7bb0733
+Create Date: 2026-10-18 10:02:11.584920
+
+wallets.user_id and transactions.reference are already covered by their
+unique constraints, so they get no extra index here.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '44316b44f68a'
+down_revision = '7aa3c7bb0733'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_block_ledger_user_id_timestamp', 'block_ledger',
+     ['user_id', sa.text('timestamp DESC'), sa.text('id DESC')]),
+    ('ix_orders_buyer_id_created_at', 'orders', ['buyer_id', sa.text('created_at DESC')]),
+    ('ix_orders_seller_id_created_at', 'orders', ['seller_id', sa.text('created_at DESC')]),
+    ('ix_transactions_tx_type_created_at', 'transactions', ['tx_type', 'created_at']),
+    ('ix_referrals_referrer_id_created_at', 'referrals', ['referrer_id', sa.text('created_at DESC')]),
+    ('ix_referrals_referred_id', 'referrals', ['referred_id']),
+    ('ix_products_created_at_id', 'products', [sa.text('created_at DESC'), sa.text('id DESC')]),
+    ('ix_products_category_created_at_id', 'products',
+     ['category', sa.text('created_at DESC'), sa.text('id DESC')]),
+    ('ix_products_seller_id_created_at', 'products', ['seller_id', sa.text('created_at DESC')]),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build without blocking writes on the live tables
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,60 @@
+"""referral rewarded flag, user referral codes and referral_stats leaderboard rollup
+
+Revision ID: 5c8e2a7d19f4
+Revises: 3e5f28509fe3
+Create Date: 2026-10-18 20:05:31.518204
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8e2a7d19f4'
+down_revision = '3e5f28509fe3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('referral_code', sa.String(length=12), nullable=True))
+        batch_op.create_unique_constraint('uq_users_referral_code', ['referral_code'])
+
+    with op.batch_alter_table('referrals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rewarded', sa.Boolean(), nullable=False, server_default=sa.false()))
+        batch_op.add_column(sa.Column('rewarded_at', sa.DateTime(), nullable=True))
+
+    op.create_table('referral_stats',
+    sa.Column('referrer_id', sa.Integer(), nullable=False),
+    sa.Column('referral_count', sa.Integer(), nullable=False),
+    sa.Column('rewarded_count', sa.Integer(), nullable=False),
+    sa.Column('reward_total', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['referrer_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('referrer_id')
+    )
+    with op.batch_alter_table('referral_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_referral_stats_referral_count', [sa.text('referral_count DESC'), 'referrer_id'], unique=False)
+
+    # Existing referrals predate the rewarded flag, so they all start out pending
+    op.execute(sa.text(
+        "INSERT INTO referral_stats (referrer_id, referral_count, rewarded_count, reward_total, updated_at) "
+        "SELECT referrer_id, COUNT(id), 0, 0, :now FROM referrals GROUP BY referrer_id"
+    ).bindparams(now=datetime.utcnow()))
+
+
+def downgrade():
+    with op.batch_alter_table('referral_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_referral_stats_referral_count')
+    op.drop_table('referral_stats')
+
+    with op.batch_alter_table('referrals', schema=None) as batch_op:
+        batch_op.drop_column('rewarded_at')
+        batch_op.drop_column('rewarded')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_users_referral_code', type_='unique')
+        batch_op.drop_column('referral_code')
@@ -0,0 +1,56 @@
+"""platform_metrics rollup
+
+Revision ID: 629899431c8b
+Revises: 0a24c0602ba8
+Create Date: 2026-10-18 14:05:52.913370
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '629899431c8b'
+down_revision = '0a24c0602ba8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('platform_metrics',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.Numeric(precision=24, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    # Seed from the source tables; same definitions as app.ledger.platform.compute_platform_metrics()
+    op.execute("""
+        INSERT INTO platform_metrics (name, value, updated_at)
+        SELECT name, value, CURRENT_TIMESTAMP FROM (
+            SELECT 'circulating_supply' AS name, COALESCE(SUM(block_balance), 0) AS value FROM wallets
+            UNION ALL
+            SELECT 'active_wallets', COUNT(id) FROM wallets WHERE block_balance > 0
+            UNION ALL
+            SELECT 'minted_supply', COALESCE(SUM(change), 0) FROM block_ledger
+                WHERE entry_type IN ('mining', 'allocation', 'referral')
+            UNION ALL
+            SELECT 'total_transactions', COUNT(id) FROM transactions
+            UNION ALL
+            SELECT 'platform_fees',
+                (SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE tx_type = 'ADMIN_FEE') +
+                (SELECT COALESCE(SUM(admin_fee), 0) FROM exchange_transactions WHERE status = 'COMPLETED')
+            UNION ALL
+            SELECT 'users_total', COUNT(id) FROM users
+            UNION ALL
+            SELECT 'users_' || LOWER(COALESCE(user_type, 'individual')), COUNT(id) FROM users
+                GROUP BY LOWER(COALESCE(user_type, 'individual'))
+            UNION ALL
+            SELECT 'listings_' || LOWER(COALESCE(status, 'ACTIVE')), COUNT(id) FROM exchange_listings
+                GROUP BY LOWER(COALESCE(status, 'ACTIVE'))
+        ) AS seed
+    """)
+
+
+def downgrade():
+    op.drop_table('platform_metrics')
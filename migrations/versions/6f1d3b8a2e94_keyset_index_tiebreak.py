@@ -0,0 +1,59 @@
+"""add the id tiebreak to the per-user keyset indexes
+
+Revision ID: 6f1d3b8a2e94
+Revises: e2a6d0f8c513
+Create Date: 2026-10-18 21:40:17.302518
+
+Order history, a seller's catalog and the referral list page on
+(created_at, id); without id in the index the tiebreak was sorted in memory.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1d3b8a2e94'
+down_revision = 'e2a6d0f8c513'
+branch_labels = None
+depends_on = None
+
+
+# (new index, table, columns, index it replaces, its columns)
+INDEXES = [
+    ('ix_orders_buyer_id_created_at_id', 'orders',
+     ['buyer_id', sa.text('created_at DESC'), sa.text('id DESC')],
+     'ix_orders_buyer_id_created_at', ['buyer_id', sa.text('created_at DESC')]),
+    ('ix_orders_seller_id_created_at_id', 'orders',
+     ['seller_id', sa.text('created_at DESC'), sa.text('id DESC')],
+     'ix_orders_seller_id_created_at', ['seller_id', sa.text('created_at DESC')]),
+    ('ix_products_seller_id_created_at_id', 'products',
+     ['seller_id', sa.text('created_at DESC'), sa.text('id DESC')],
+     'ix_products_seller_id_created_at', ['seller_id', sa.text('created_at DESC')]),
+    ('ix_referrals_referrer_id_created_at_id', 'referrals',
+     ['referrer_id', sa.text('created_at DESC'), sa.text('id DESC')],
+     'ix_referrals_referrer_id_created_at', ['referrer_id', sa.text('created_at DESC')]),
+]
+
+
+def _swap(pairs):
+    """Build each new index before dropping the one it replaces."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # Without blocking writes on the live tables
+        with op.get_context().autocommit_block():
+            for new, table, columns, old in pairs:
+                op.create_index(new, table, columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+                op.drop_index(old, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for new, table, columns, old in pairs:
+            op.create_index(new, table, columns, unique=False)
+            op.drop_index(old, table_name=table)
+
+
+def upgrade():
+    _swap([(new, table, columns, old) for new, table, columns, old, _ in INDEXES])
+
+
+def downgrade():
+    _swap([(old, table, old_columns, new) for new, table, _, old, old_columns in reversed(INDEXES)])
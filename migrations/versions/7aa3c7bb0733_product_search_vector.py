@@ -0,0 +1,42 @@
+"""product full-text search vector
+
+Revision ID: 7aa3c7bb0733
+Revises:
+Create Date: 2026-10-18 09:12:40.118273
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7aa3c7bb0733'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Postgres only: SQLite falls back to the in-process index in app/product/search.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("""
+        ALTER TABLE products ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(category, '') || ' ' || coalesce(subcategory, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        ) STORED
+    """)
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'],
+                    unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_products_search_vector', table_name='products')
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('search_vector')
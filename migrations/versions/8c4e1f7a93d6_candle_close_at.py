@@ -0,0 +1,31 @@
+"""exchange_candles.close_at: when the closing trade happened
+
+Revision ID: 8c4e1f7a93d6
+Revises: 6f1d3b8a2e94
+Create Date: 2026-10-18 23:12:48.519034
+
+A candle's close now only moves to a trade at least as recent as close_at.
+Existing rows are backfilled from updated_at; `flask exchange rebuild-candles`
+recomputes them exactly from the trades.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e1f7a93d6'
+down_revision = '6f1d3b8a2e94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('exchange_candles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('close_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE exchange_candles SET close_at = updated_at')
+
+
+def downgrade():
+    with op.batch_alter_table('exchange_candles', schema=None) as batch_op:
+        batch_op.drop_column('close_at')
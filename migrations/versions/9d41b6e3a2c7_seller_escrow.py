@@ -0,0 +1,53 @@
+"""seller_escrow rollup of order escrow per seller
+
+Seeded from orders here; `flask product rebuild-escrow` recomputes it later.
+
+Revision ID: 9d41b6e3a2c7
+Revises: 5c8e2a7d19f4
+Create Date: 2026-10-18 20:41:07.663915
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d41b6e3a2c7'
+down_revision = '5c8e2a7d19f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('seller_escrow',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('escrow_balance', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('escrowed_orders', sa.Integer(), nullable=False),
+    sa.Column('released_total', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('released_orders', sa.Integer(), nullable=False),
+    sa.Column('refunded_total', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('seller_id')
+    )
+    with op.batch_alter_table('seller_escrow', schema=None) as batch_op:
+        batch_op.create_index('ix_seller_escrow_balance', [sa.text('escrow_balance DESC'), sa.text('seller_id DESC')], unique=False)
+
+    op.execute(sa.text(
+        "INSERT INTO seller_escrow (seller_id, escrow_balance, escrowed_orders, released_total, "
+        "released_orders, refunded_total, updated_at) "
+        "SELECT seller_id, "
+        "COALESCE(SUM(CASE WHEN status IN ('ESCROWED', 'DELIVERED') THEN price ELSE 0 END), 0), "
+        "COALESCE(SUM(CASE WHEN status IN ('ESCROWED', 'DELIVERED') THEN 1 ELSE 0 END), 0), "
+        "COALESCE(SUM(CASE WHEN status = 'COMPLETED' THEN price ELSE 0 END), 0), "
+        "COALESCE(SUM(CASE WHEN status = 'COMPLETED' THEN 1 ELSE 0 END), 0), "
+        "0, :now FROM orders GROUP BY seller_id"
+    ).bindparams(now=datetime.utcnow()))
+
+
+def downgrade():
+    with op.batch_alter_table('seller_escrow', schema=None) as batch_op:
+        batch_op.drop_index('ix_seller_escrow_balance')
+    op.drop_table('seller_escrow')
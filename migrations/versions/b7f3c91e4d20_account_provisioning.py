@@ -0,0 +1,38 @@
+"""account_provisioning for async Paystack dedicated accounts
+
+Revision ID: b7f3c91e4d20
+Revises: 9d41b6e3a2c7
+Create Date: 2026-10-18 21:16:52.094318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7f3c91e4d20'
+down_revision = '9d41b6e3a2c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('account_provisioning',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('customer_code', sa.String(length=50), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('account_provisioning', schema=None) as batch_op:
+        batch_op.create_index('ix_account_provisioning_status_updated_at', ['status', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('account_provisioning', schema=None) as batch_op:
+        batch_op.drop_index('ix_account_provisioning_status_updated_at')
+    op.drop_table('account_provisioning')
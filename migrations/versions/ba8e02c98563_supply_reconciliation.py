@@ -0,0 +1,53 @@
+"""supply reconciliation checkpoint and reconciled_balances
+
+Revision ID: ba8e02c98563
+Revises: 3ba79c024dee
+Create Date: 2026-10-18 17:21:40.118304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ba8e02c98563'
+down_revision = '3ba79c024dee'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('supply_checkpoints',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('last_ledger_id', sa.Integer(), nullable=False),
+    sa.Column('entries_folded', sa.BigInteger(), nullable=False),
+    sa.Column('ledger_total', sa.Numeric(precision=24, scale=2), nullable=False),
+    sa.Column('minted_total', sa.Numeric(precision=24, scale=2), nullable=False),
+    sa.Column('circulating_drift', sa.Numeric(precision=24, scale=2), nullable=False),
+    sa.Column('minted_drift', sa.Numeric(precision=24, scale=2), nullable=False),
+    sa.Column('wallets_drifting', sa.Integer(), nullable=False),
+    sa.Column('wallet_drift_total', sa.Numeric(precision=24, scale=2), nullable=False),
+    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('reconciled_balances',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('ledger_balance', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('last_ledger_id', sa.Integer(), nullable=False),
+    sa.Column('drift', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('checked_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('reconciled_balances', schema=None) as batch_op:
+        batch_op.create_index('ix_reconciled_balances_drifting', ['user_id'], unique=False,
+                              postgresql_where=sa.text('drift <> 0'), sqlite_where=sa.text('drift <> 0'))
+
+
+def downgrade():
+    with op.batch_alter_table('reconciled_balances', schema=None) as batch_op:
+        batch_op.drop_index('ix_reconciled_balances_drifting',
+                            postgresql_where=sa.text('drift <> 0'), sqlite_where=sa.text('drift <> 0'))
+
+    op.drop_table('reconciled_balances')
+    op.drop_table('supply_checkpoints')
@@ -0,0 +1,42 @@
+"""paystack_events webhook inbox
+
+Revision ID: d624e38987e1
+Revises: 629899431c8b
+Create Date: 2026-10-18 15:16:34.207781
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd624e38987e1'
+down_revision = '629899431c8b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('paystack_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_key', sa.String(length=255), nullable=False),
+    sa.Column('event_type', sa.String(length=64), nullable=False),
+    sa.Column('reference', sa.String(length=255), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(length=255), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_key')
+    )
+    with op.batch_alter_table('paystack_events', schema=None) as batch_op:
+        batch_op.create_index('ix_paystack_events_status_id', ['status', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('paystack_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_paystack_events_status_id')
+
+    op.drop_table('paystack_events')
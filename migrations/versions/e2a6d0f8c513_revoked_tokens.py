@@ -0,0 +1,38 @@
+"""revoked_tokens for access/refresh token revocation
+
+Revision ID: e2a6d0f8c513
+Revises: b7f3c91e4d20
+Create Date: 2026-10-18 21:58:40.771209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a6d0f8c513'
+down_revision = 'b7f3c91e4d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revoked_tokens',
+    sa.Column('jti', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('token_type', sa.String(length=10), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('jti')
+    )
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.create_index('ix_revoked_tokens_revoked_at', ['revoked_at'], unique=False)
+        batch_op.create_index('ix_revoked_tokens_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.drop_index('ix_revoked_tokens_expires_at')
+        batch_op.drop_index('ix_revoked_tokens_revoked_at')
+    op.drop_table('revoked_tokens')
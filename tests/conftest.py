@@ -0,0 +1,122 @@
+# tests/conftest.py
+#
+# Runs against SQLite by default. Set TEST_DATABASE_URL to a scratch Postgres
+# database (it is dropped and recreated per test) for the Postgres-only tests,
+# e.g. TEST_DATABASE_URL=postgresql://postgres@localhost/coopbusiness_test
+
+import logging
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-for-the-pytest-suite")
+
+from config import Config  # noqa: E402
+
+
+def make_config(database_url):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SOCKETIO_MESSAGE_QUEUE = ""
+        CELERY_TASK_ALWAYS_EAGER = False
+        LOG_LEVEL = "ERROR"
+        TELEMETRY_SAMPLE_RATE = 0.0
+        METRICS_TOKEN = "test-metrics-token"
+        PASSWORD_HASH_WORKERS = 0
+        PASSWORD_PBKDF2_ITERATIONS = 1000
+        # Every test request is profiled and must stay inside its @query_budget
+        SQL_PROFILER = "all"
+        SQL_QUERY_BUDGET_ENFORCE = True
+        SQL_QUERY_BUDGETS = {}
+    return TestConfig
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    from app import create_app
+
+    url = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
+    return create_app(make_config(url))
+
+
+@pytest.fixture
+def db(app):
+    from app.auth.revocation import revocations
+    from app.auth.views import principal_cache
+    from app.models import db as _db
+
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        principal_cache.clear()
+        revocations.configure()
+        yield _db
+        _db.session.remove()
+
+
+@pytest.fixture
+def client(app, db):
+    client = app.test_client()
+    # Behind ProxyFix, so this marks requests as HTTPS and skips the redirect
+    client.environ_base["HTTP_X_FORWARDED_PROTO"] = "https"
+    return client
+
+
+@pytest.fixture
+def make_user(db):
+    from app.models import User, Wallet
+
+    def make_user(name="user", blocks="0", fiat="0"):
+        n = User.query.count()
+        user = User(name=name, phone=f"0800000{n:04d}", email=f"{name}{n}@example.com", password="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Wallet(user_id=user.id, block_balance=Decimal(blocks), fiat_balance=Decimal(fiat)))
+        db.session.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def auth_header(db):
+    from app.auth.views import issue_tokens
+
+    def auth_header(user):
+        return {"Authorization": "Bearer " + issue_tokens(user)["token"]}
+
+    return auth_header
+
+
+@pytest.fixture
+def products(db, make_user):
+    """25 products from one seller; several share a created_at so pages split inside a tie."""
+    from app.models import Product
+
+    seller = make_user("seller")
+    base = datetime(2026, 1, 1)
+    for i in range(25):
+        db.session.add(Product(
+            seller_id=seller.id,
+            title=f"Product {i}",
+            description="test product",
+            price=Decimal("100.00") + i,
+            category="technology" if i % 2 else "fashion",
+            created_at=base + timedelta(minutes=i // 3),
+        ))
+    db.session.commit()
+    return Product.query.order_by(Product.id).all()
+
+
+@pytest.fixture
+def app_logs(caplog):
+    """caplog for the app's loggers, which log at LOG_LEVEL and don't propagate to the root logger."""
+    logger = logging.getLogger("app")
+    caplog.set_level(logging.WARNING, logger="app")
+    logger.addHandler(caplog.handler)
+    yield caplog
+    logger.removeHandler(caplog.handler)
@@ -0,0 +1,75 @@
+# tests/test_auth_refresh.py
+
+import threading
+
+import jwt
+import pytest
+
+from app.auth import revocation
+from app.auth.views import REFRESH, SECRET_KEY, issue_tokens
+
+
+@pytest.fixture
+def refresh_token(db, make_user):
+    return issue_tokens(make_user("member"))["refresh_token"]
+
+
+def refresh(client, token):
+    return client.post("/api/refresh", json={"refresh_token": token})
+
+
+def test_refresh_token_is_single_use(client, refresh_token):
+    first = refresh(client, refresh_token)
+    assert first.status_code == 200
+    assert refresh(client, first.get_json()["refresh_token"]).status_code == 200
+
+    assert refresh(client, refresh_token).status_code == 401
+
+
+def test_refresh_loses_the_race_if_another_request_revoked_first(client, db, refresh_token, monkeypatch):
+    # Both requests passed the revocation check; the other one inserted first.
+    claims = jwt.decode(refresh_token, SECRET_KEY, algorithms=["HS256"])
+    assert claims["type"] == REFRESH
+    assert revocation.revoke(claims) is True
+    db.session.commit()
+    monkeypatch.setattr(revocation, "is_revoked", lambda claims: False)
+
+    resp = refresh(client, refresh_token)
+    assert resp.status_code == 401
+    assert "token" not in resp.get_json()
+
+
+def test_revoke_reports_whether_it_inserted(db, refresh_token):
+    claims = jwt.decode(refresh_token, SECRET_KEY, algorithms=["HS256"])
+    assert revocation.revoke(claims) is True
+    db.session.commit()
+    assert revocation.revoke(claims) is False
+    assert revocation.revoke({"exp": claims["exp"]}) is False
+
+
+def test_concurrent_refreshes_issue_one_pair(app, client, db, refresh_token):
+    if db.engine.dialect.name != "postgresql":
+        pytest.skip("needs TEST_DATABASE_URL on PostgreSQL (concurrent writers)")
+
+    start = threading.Barrier(8)
+    statuses = []
+
+    def attempt():
+        own = app.test_client()
+        own.environ_base.update(client.environ_base)
+        start.wait()
+        statuses.append(refresh(own, refresh_token).status_code)
+
+    threads = [threading.Thread(target=attempt) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    assert sorted(statuses) == [200] + [401] * 7
+
+
+def test_access_token_outlives_a_browser_session_without_refresh(app, db, make_user):
+    # The bundled frontend never calls /refresh
+    claims = jwt.decode(issue_tokens(make_user("member"))["token"], SECRET_KEY, algorithms=["HS256"])
+    assert claims["exp"] - claims["iat"] == app.config["ACCESS_TOKEN_MINUTES"] * 60 == 12 * 3600
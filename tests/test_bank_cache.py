@@ -0,0 +1,82 @@
+# tests/test_bank_cache.py
+
+import time
+
+import pytest
+
+from app.cache import SharedCache
+from app.paystack import lookups
+
+
+class MemoryRedis:
+    """The few Redis commands SharedCache uses, shared between 'processes' in one test."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def ttl(self, key):
+        return 3600 if key in self.data else -2
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def redis(app, monkeypatch):
+    server = MemoryRedis()
+    monkeypatch.setattr(lookups.bank_cache, "_redis", server)
+    monkeypatch.setattr(lookups.bank_cache, "_redis_down_until", 0)
+    lookups.bank_cache.local.clear()
+    yield server
+    lookups.bank_cache.local.clear()
+
+
+@pytest.fixture
+def enqueued(app, monkeypatch):
+    from app import tasks
+
+    calls = []
+    monkeypatch.setattr(tasks.refresh_paystack_banks, "delay", lambda: calls.append(1))
+    return calls
+
+
+def other_process(server):
+    """The Celery worker's own bank_cache, talking to the same Redis."""
+    cache = SharedCache("paystack:banks", maxsize=4, ttl=lookups.bank_cache.ttl)
+    cache._redis = server
+    return cache
+
+
+def test_refresh_stored_by_another_process_is_picked_up(app, redis, enqueued):
+    stale = time.time() - app.config["BANK_LIST_TTL"] - 1
+    with app.app_context():
+        lookups.bank_cache.set(lookups.BANKS_KEY, {"banks": [{"code": "old"}], "fetched_at": stale})
+        assert lookups.get_banks() == [{"code": "old"}]
+        assert len(enqueued) == 1
+
+        other_process(redis).set(lookups.BANKS_KEY, {"banks": [{"code": "new"}], "fetched_at": time.time()})
+
+        assert lookups.get_banks() == [{"code": "new"}]
+        assert lookups.bank_cache.local.get(lookups.BANKS_KEY)["banks"] == [{"code": "new"}]
+        assert len(enqueued) == 1
+
+
+def test_stale_list_is_refreshed_once_across_workers(app, redis, enqueued, monkeypatch):
+    stale = time.time() - app.config["BANK_LIST_TTL"] - 1
+    workers = [lookups.bank_cache, other_process(redis), other_process(redis)]
+    with app.app_context():
+        workers[0].set(lookups.BANKS_KEY, {"banks": [{"code": "old"}], "fetched_at": stale})
+        for worker in workers:
+            monkeypatch.setattr(lookups, "bank_cache", worker)
+            assert lookups.get_banks() == [{"code": "old"}]
+
+    assert len(enqueued) == 1
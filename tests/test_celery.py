@@ -0,0 +1,61 @@
+# tests/test_celery.py
+
+import socket
+import time
+
+import pytest
+
+from app import celery
+from app.models import AccountProvisioning
+
+
+def reset_producers():
+    # Publishing connections are pooled per broker URL the first time they are used
+    celery._pool = None
+    celery.amqp._producer_pool = None
+
+
+@pytest.fixture
+def silent_broker(app):
+    """Point Celery at a Redis 'server' that accepts connections and never answers."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(16)
+    broker_url = celery.conf.broker_url
+    celery.conf.broker_url = f"redis://127.0.0.1:{server.getsockname()[1]}/0"
+    reset_producers()
+    try:
+        yield
+    finally:
+        celery.conf.broker_url = broker_url
+        reset_producers()
+        server.close()
+
+
+def test_register_does_not_wait_on_a_down_broker(client, silent_broker, app_logs):
+    started = time.monotonic()
+    resp = client.post("/api/register", json={"name": "Ada", "phone": "08011112222", "password": "secret-pass"})
+    elapsed = time.monotonic() - started
+
+    assert resp.status_code == 201
+    # one try plus one retry, each bounded by CELERY_BROKER_TIMEOUT
+    assert elapsed < 2 * client.application.config["CELERY_BROKER_TIMEOUT"] + 2
+    provisioning = AccountProvisioning.query.filter_by(user_id=resp.get_json()["user_id"]).one()
+    assert provisioning.status == AccountProvisioning.PENDING   # left for the stall sweep
+    [record] = [r for r in app_logs.records if r.name == "app.auth"]
+    assert record.getMessage() == "could not enqueue account provisioning"
+    assert record.user_id == provisioning.user_id and record.exc_info
+
+
+def test_provisioning_retry_does_not_wait_on_a_down_broker(client, db, make_user, auth_header, silent_broker):
+    user = make_user("member")
+    db.session.add(AccountProvisioning(user_id=user.id, status=AccountProvisioning.FAILED, last_error="no email"))
+    db.session.commit()
+
+    started = time.monotonic()
+    resp = client.post("/api/wallet/account/retry", headers=auth_header(user))
+    elapsed = time.monotonic() - started
+
+    assert resp.status_code == 202
+    assert elapsed < 2 * client.application.config["CELERY_BROKER_TIMEOUT"] + 2
+    assert db.session.get(AccountProvisioning, user.id).status == AccountProvisioning.PENDING
@@ -0,0 +1,53 @@
+# tests/test_exchange_market.py
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.exchange import market
+from app.models import ExchangeCandle
+
+
+def apply(db, *trades):
+    market.apply_trades(db.session.connection(), [
+        (at, Decimal(price), Decimal("1.00"), Decimal(price)) for at, price in trades
+    ])
+    db.session.commit()
+
+
+def candle(interval, at):
+    return ExchangeCandle.query.filter_by(
+        interval=interval, bucket_start=market.bucket_start(at, market.INTERVALS[interval]),
+    ).one()
+
+
+def test_older_trade_committing_late_does_not_move_the_close(db):
+    at = datetime.utcnow().replace(second=30, microsecond=0)
+    apply(db, (at, "12.00"))
+    apply(db, (at - timedelta(seconds=20), "9.00"))   # earlier trade, committed after
+
+    for interval in market.INTERVALS:
+        row = candle(interval, at)
+        assert row.close == Decimal("12.00")
+        assert row.close_at == at
+        assert row.low == Decimal("9.00")
+        assert row.trade_count == 2
+
+    apply(db, (at + timedelta(seconds=5), "11.00"))
+    assert candle("1m", at).close == Decimal("11.00")
+    assert candle("1m", at).close_at == at + timedelta(seconds=5)
+
+
+def test_close_within_one_batch_follows_trade_time(db):
+    at = datetime.utcnow().replace(second=30, microsecond=0)
+    apply(db, (at, "12.00"), (at - timedelta(seconds=10), "9.00"))
+    assert candle("1m", at).close == Decimal("12.00")
+
+
+def test_ticker_reports_the_last_trade_time(db):
+    at = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=3)
+    apply(db, (at, "10.00"))
+    market.ticker_cache.clear()
+
+    ticker = market.get_ticker()
+    assert ticker["last_price"] == "10.00"
+    assert ticker["last_trade_at"] == at.isoformat()
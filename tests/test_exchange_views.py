@@ -0,0 +1,99 @@
+# tests/test_exchange_views.py
+
+from decimal import Decimal
+
+import pytest
+
+from app.exchange import matching
+from app.exchange.views import parse_amount
+from app.ledger.posting import ESCROW
+from app.models import ExchangeListing, LedgerEntryType, Wallet
+from app.wallet.service import credit_blocks, debit_blocks
+
+BAD_AMOUNTS = ["Infinity", "-Infinity", "NaN", "sNaN", "1e400", "1e20", "abc", "", None, [], {}, True,
+               -5, 0, "0.004", "0.005"]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (5, Decimal("5.00")),
+    ("12.5", Decimal("12.50")),
+    (0.1, Decimal("0.10")),
+    ("0.015", Decimal("0.02")),
+    ("3.14159", Decimal("3.14")),
+])
+def test_parse_amount_quantizes_to_cents(value, expected):
+    assert parse_amount(value) == expected
+
+
+@pytest.mark.parametrize("value", BAD_AMOUNTS)
+def test_parse_amount_rejects(value):
+    with pytest.raises(ValueError):
+        parse_amount(value)
+
+
+def test_parse_amount_allows_zero_limits():
+    assert parse_amount(0, allow_zero=True) == 0
+    with pytest.raises(ValueError):
+        parse_amount("NaN", allow_zero=True)
+
+
+@pytest.fixture
+def listing(db, make_user):
+    seller = make_user("seller")
+    credit_blocks(seller.id, 50, "Seed", LedgerEntryType.ALLOCATION)
+    debit_blocks(seller.id, 50, "Listed 50 blocks for sale", LedgerEntryType.LISTING, sink=ESCROW)
+    listing = ExchangeListing(seller_id=seller.id, block_amount=Decimal(50), rate_per_block=Decimal(2))
+    db.session.add(listing)
+    db.session.commit()
+    matching.rebuild_book()
+    return listing
+
+
+@pytest.mark.parametrize("body", [{"quantity": v} for v in BAD_AMOUNTS] + [
+    {"quantity": 5, "max_rate": "Infinity"},
+    {"quantity": 5, "max_rate": "NaN"},
+    {"quantity": 5, "max_rate": 0},
+])
+def test_buy_rejects_bad_amounts_without_touching_the_book(db, client, make_user, auth_header, listing, body):
+    buyer = make_user("buyer", fiat="1000")
+    resp = client.post("/api/exchange/buy", json=body, headers=auth_header(buyer))
+
+    assert resp.status_code == 400
+    assert resp.get_json() == {"error": "Invalid quantity or rate"}
+    assert db.session.get(ExchangeListing, listing.id).filled_amount == 0
+    assert matching.book.get(listing.id).remaining == 50
+
+
+def test_buy_rejects_json_infinity(client, make_user, auth_header, listing):
+    buyer = make_user("buyer", fiat="1000")
+    resp = client.post("/api/exchange/buy", data='{"quantity": Infinity}', content_type="application/json",
+                       headers=auth_header(buyer))
+    assert resp.status_code == 400
+
+
+def test_buy_quantizes_quantity(client, make_user, auth_header, listing):
+    buyer = make_user("buyer", fiat="1000")
+    resp = client.post("/api/exchange/buy", json={"quantity": "1.234"}, headers=auth_header(buyer))
+
+    assert resp.status_code == 200
+    assert resp.get_json()["blocks_bought"] == "1.23"
+    assert Wallet.query.filter_by(user_id=buyer.id).one().block_balance == Decimal("1.23")
+
+
+@pytest.mark.parametrize("body, error", [
+    ({"quantity": "Infinity", "price_per_unit": 2}, "Invalid quantity or price"),
+    ({"quantity": 5, "price_per_unit": "NaN"}, "Invalid quantity or price"),
+    ({"quantity": "0.001", "price_per_unit": 2}, "Invalid quantity or price"),
+    ({"quantity": 5, "price_per_unit": "two"}, "Invalid quantity or price"),
+    ({"quantity": 5, "price_per_unit": 2, "min_purchase": "Infinity"}, "Invalid purchase limits"),
+    ({"quantity": 5, "price_per_unit": 2, "max_purchase": -1}, "Invalid purchase limits"),
+    ({"quantity": 5, "price_per_unit": 2, "min_purchase": 4, "max_purchase": 3}, "Invalid purchase limits"),
+])
+def test_list_rejects_bad_amounts(client, make_user, auth_header, body, error):
+    seller = make_user("seller")
+    credit_blocks(seller.id, 10, "Seed", LedgerEntryType.ALLOCATION)
+    resp = client.post("/api/exchange/list", json=body, headers=auth_header(seller))
+
+    assert resp.status_code == 400
+    assert resp.get_json() == {"error": error}
+    assert ExchangeListing.query.count() == 0
@@ -0,0 +1,81 @@
+# tests/test_metrics.py
+
+import json
+import os
+
+import pytest
+
+from app.metrics import REGISTRY, Counter, Gauge, Histogram, collect, render_prometheus, write_snapshot
+
+DEAD_PID = 2 ** 22 + 1   # above Linux's pid_max, so never a live process
+
+
+@pytest.fixture
+def registry():
+    """Metrics for one test, kept out of the app-wide REGISTRY afterwards."""
+    metrics = {
+        "test_jobs_total": Counter("test_jobs_total", "Jobs.", ("queue",)),
+        "test_queue_depth": Gauge("test_queue_depth", "Depth."),
+        "test_job_seconds": Histogram("test_job_seconds", "Job time.", buckets=(1, 5)),
+    }
+    yield metrics
+    for name in metrics:
+        REGISTRY.pop(name, None)
+
+
+def fake_worker(directory, pid, registry):
+    """Write `registry` as if process `pid` had."""
+    write_snapshot(directory, registry)
+    os.replace(os.path.join(directory, f"metrics-{os.getpid()}.json"), os.path.join(directory, f"metrics-{pid}.json"))
+
+
+def test_collect_merges_workers(tmp_path, registry):
+    registry["test_jobs_total"].inc(2, queue="a")
+    registry["test_queue_depth"].set(7)
+    registry["test_job_seconds"].observe(0.5)
+    fake_worker(tmp_path, DEAD_PID, registry)
+
+    registry["test_jobs_total"].inc(1, queue="b")
+    registry["test_job_seconds"].observe(3)
+    write_snapshot(tmp_path, registry)
+
+    merged = collect(tmp_path)
+    assert merged["test_jobs_total"].snapshot() == {("a",): 4, ("b",): 1}
+    histogram = merged["test_job_seconds"].snapshot()[()]
+    assert histogram == {"buckets": [2, 3], "sum": 4.0, "count": 3}
+    # Gauges are per process; the exited worker's is dropped
+    assert merged["test_queue_depth"].snapshot() == {(str(os.getpid()),): 7}
+
+    text = render_prometheus(merged)
+    assert 'test_jobs_total{queue="a"} 4' in text
+    assert f'test_queue_depth{{pid="{os.getpid()}"}} 7' in text
+    assert 'test_job_seconds_bucket{le="+Inf"} 3' in text
+
+
+def test_collect_skips_a_half_written_file(tmp_path, registry):
+    registry["test_jobs_total"].inc(queue="a")
+    write_snapshot(tmp_path, registry)
+    (tmp_path / f"metrics-{DEAD_PID}.json").write_text('{"test_jobs_total": ')
+
+    assert collect(tmp_path)["test_jobs_total"].snapshot() == {("a",): 1}
+
+
+def test_metrics_endpoint_reports_every_worker(app, client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_MULTIPROC_DIR", str(tmp_path))
+    other = {
+        "http_request_duration_seconds": {
+            "kind": "histogram", "help": "Time spent handling HTTP requests, by route.",
+            "labels": ["method", "route", "status"], "buckets": list(Histogram.DEFAULT_BUCKETS),
+            "series": [[["GET", "/elsewhere", "200"], {"buckets": [1] * 11, "sum": 0.001, "count": 1}]],
+        },
+    }
+    (tmp_path / f"metrics-{DEAD_PID}.json").write_text(json.dumps(other))
+
+    client.get("/api/product/list")
+    assert client.get("/metrics").status_code == 401
+    token = {"Authorization": f"Bearer {app.config['METRICS_TOKEN']}"}
+    text = client.get("/metrics", headers=token).get_data(as_text=True)
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/elsewhere",status="200"} 1' in text
+    assert 'route="/api/product/list"' in text
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
@@ -0,0 +1,66 @@
+# tests/test_migrations.py
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+VERSIONS = Path(__file__).resolve().parent.parent / "migrations" / "versions"
+
+
+def load_migration(revision):
+    [path] = VERSIONS.glob(f"{revision}_*.py")
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(db, step):
+    """Run a migration function the way `flask db upgrade` would, on the test database."""
+    with db.engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        with Operations.context(context):
+            with context.begin_transaction():
+                step()
+        connection.commit()
+
+
+@pytest.fixture
+def entry_type_migration(db):
+    migration = load_migration("029d69243c2d")
+    db.session.remove()
+    run(db, migration.downgrade)
+    return migration
+
+
+def test_entry_type_backfill_counts_old_delivery_rewards_as_transfers(db, make_user, entry_type_migration, monkeypatch):
+    user = make_user("buyer")
+    reasons = [
+        "Initial allocation on signup",
+        "Referral reward for inviting 7",
+        "Listed 5 blocks for sale",
+        "Platform mining reward",
+        "Reward for confirming delivery of product 3",   # old combined transfer + mined row
+        "Transfer to user 9",
+    ]
+    with db.engine.begin() as connection:
+        for reason in reasons:
+            connection.execute(
+                sa.text("INSERT INTO block_ledger (user_id, change, balance_after, reason) VALUES (:u, 1, 1, :r)"),
+                {"u": user.id, "r": reason},
+            )
+    monkeypatch.setattr(entry_type_migration, "BATCH_SIZE", 4)   # more than one batch
+
+    run(db, entry_type_migration.upgrade)
+
+    with db.engine.connect() as connection:
+        rows = connection.execute(sa.text("SELECT reason, entry_type FROM block_ledger ORDER BY id")).all()
+        indexes = {index["name"] for index in sa.inspect(connection).get_indexes("block_ledger")}
+    assert [entry_type for _, entry_type in rows] == [
+        "allocation", "referral", "listing", "mining", "transfer", "transfer",
+    ]
+    assert "ix_block_ledger_user_id_entry_type_timestamp" in indexes
@@ -0,0 +1,74 @@
+# tests/test_orders.py
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.models import Order, Product
+
+
+@pytest.fixture
+def trader(db, make_user):
+    """A user who both buys and sells, with orders interleaved in time."""
+    user, other = make_user("trader"), make_user("other")
+    mine = Product(seller_id=user.id, title="Mine", description="x", price=Decimal("10.00"), category="fashion")
+    theirs = Product(seller_id=other.id, title="Theirs", description="x", price=Decimal("20.00"), category="fashion")
+    db.session.add_all([mine, theirs])
+    db.session.flush()
+    base = datetime(2026, 3, 1)
+    for i in range(9):
+        sold = i % 3 == 0
+        product = mine if sold else theirs
+        db.session.add(Order(
+            product_id=product.id, seller_id=product.seller_id, buyer_id=other.id if sold else user.id,
+            price=product.price, status="COMPLETED" if i % 2 else "ESCROWED",
+            created_at=base + timedelta(hours=i // 2),   # pairs share a created_at
+        ))
+    db.session.commit()
+    return user
+
+
+def pages(client, headers, **params):
+    seen, cursor = [], None
+    while True:
+        query = dict(params, limit=2, **({"cursor": cursor} if cursor else {}))
+        resp = client.get("/api/product/orders/mine", query_string=query, headers=headers)
+        assert resp.status_code == 200
+        seen += resp.get_json()
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            return seen
+
+
+def test_all_roles_page_through_every_order_once_newest_first(client, auth_header, trader):
+    orders = pages(client, auth_header(trader))
+    expected = Order.query.order_by(Order.created_at.desc(), Order.id.desc()).all()
+    assert [o["id"] for o in orders] == [o.id for o in expected]
+
+    sold = pages(client, auth_header(trader), role="seller")
+    assert [o["id"] for o in sold] == [o.id for o in expected if o.seller_id == trader.id]
+    assert {o["product_name"] for o in sold} == {"Mine"}
+
+    escrowed = pages(client, auth_header(trader), role="buyer", status="escrowed")
+    assert escrowed and all(o["status"] == "ESCROWED" and o["buyer_id"] == trader.id for o in escrowed)
+
+
+def test_totals_group_by_role_and_status(client, auth_header, trader):
+    resp = client.get("/api/product/orders/totals", headers=auth_header(trader))
+    assert resp.status_code == 200
+    totals = resp.get_json()
+
+    for role, column in (("buyer", Order.buyer_id), ("seller", Order.seller_id)):
+        rows = Order.query.filter(column == trader.id).all()
+        expected = {}
+        for order in rows:
+            entry = expected.setdefault(order.status, {"count": 0, "total_price": Decimal("0")})
+            entry["count"] += 1
+            entry["total_price"] += order.price
+        assert {s: {"count": v["count"], "total_price": Decimal(v["total_price"])} for s, v in totals[role].items()} == expected
+
+
+def test_unknown_role_is_rejected(client, auth_header, trader):
+    resp = client.get("/api/product/orders/mine", query_string={"role": "courier"}, headers=auth_header(trader))
+    assert resp.status_code == 400
@@ -0,0 +1,87 @@
+# tests/test_pagination.py
+
+import pytest
+
+from app.models import Product
+from app.pagination import CursorError, decode_cursor, encode_cursor, keyset_page
+
+
+def walk(query, columns, limit, descending=True):
+    """Every page of `query` in order, following next_cursor to the end."""
+    pages, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(query, columns, cursor=cursor, limit=limit, descending=descending)
+        pages.append(rows)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("limit", [1, 4, 7, 25, 100])
+def test_keyset_pages_return_each_row_once(db, products, descending, limit):
+    columns = [Product.created_at, Product.id]
+    pages = walk(Product.query, columns, limit, descending)
+
+    seen = [p.id for page in pages for p in page]
+    expected = sorted(products, key=lambda p: (p.created_at, p.id), reverse=descending)
+    assert seen == [p.id for p in expected]
+    assert all(len(page) <= limit for page in pages)
+    assert len(pages) == max(1, -(-len(products) // limit))
+
+
+def test_keyset_pages_respect_filters(db, products):
+    query = Product.query.filter(Product.category == "technology")
+    seen = [p.id for page in walk(query, [Product.created_at, Product.id], 4) for p in page]
+    assert sorted(seen) == sorted(p.id for p in products if p.category == "technology")
+    assert len(seen) == len(set(seen))
+
+
+def test_cursor_round_trip(db, products):
+    product = products[3]
+    columns = [Product.created_at, Product.id]
+    cursor = encode_cursor((product.created_at, product.id))
+    assert decode_cursor(cursor, columns) == (product.created_at, product.id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage!",
+    "bm90IGpzb24",                       # base64 of "not json"
+    encode_cursor(["2026-01-01T00:00:00"]),  # wrong arity
+    encode_cursor(["yesterday", 3]),     # not a timestamp
+    encode_cursor(["2026-01-01T00:00:00", "three"]),
+])
+def test_bad_cursor_is_rejected(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, [Product.created_at, Product.id])
+
+
+def test_product_list_pages_through_headers(client, products):
+    seen, cursor = [], None
+    while True:
+        resp = client.get("/api/product/list", query_string={"limit": 6, **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200
+        seen += [p["id"] for p in resp.get_json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(p.id for p in products)
+    assert len(seen) == len(set(seen))
+
+
+def test_next_cursor_header_is_readable_cross_origin(client, products):
+    resp = client.get("/api/product/list", query_string={"limit": 6}, headers={"Origin": "http://localhost:8080"})
+    assert resp.headers["X-Next-Cursor"]
+    assert "X-Next-Cursor" in resp.headers["Access-Control-Expose-Headers"]
+
+
+@pytest.mark.parametrize("path", ["/api/product/list", "/api/wallet/ledger", "/api/product/orders/mine"])
+def test_bad_cursor_gives_400(client, make_user, auth_header, path):
+    headers = auth_header(make_user("reader"))
+    resp = client.get(path, query_string={"cursor": "not-a-cursor"}, headers=headers)
+    assert resp.status_code == 400
+    assert resp.get_json() == {"error": "Invalid cursor"}
+
+
+def test_bad_limit_gives_400(client, products):
+    resp = client.get("/api/product/list", query_string={"limit": "ten"})
+    assert resp.status_code == 400
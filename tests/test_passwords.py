@@ -0,0 +1,49 @@
+# tests/test_passwords.py
+
+import pytest
+
+from app.auth import passwords
+
+
+@pytest.fixture
+def hashers(app, monkeypatch):
+    """Cheap PBKDF2 hashes; the per-app hasher cache is dropped around each test."""
+    monkeypatch.setitem(app.config, "PASSWORD_HASHER", "pbkdf2")
+    monkeypatch.setattr(passwords, "_hashers", {})
+    return app.config
+
+
+def test_outdated_hash_is_replaced_on_a_successful_verify(app, hashers, monkeypatch):
+    with app.app_context():
+        old = passwords.hash_password("correct horse")
+        assert passwords.verify_and_update(old, "correct horse") == (True, None)
+        assert passwords.verify_and_update(old, "wrong") == (False, None)
+
+        monkeypatch.setitem(hashers, "PASSWORD_PBKDF2_ITERATIONS", hashers["PASSWORD_PBKDF2_ITERATIONS"] * 2)
+        monkeypatch.setattr(passwords, "_hashers", {})
+        valid, new = passwords.verify_and_update(old, "correct horse")
+        assert valid and new and new != old
+        assert passwords.verify_and_update(new, "correct horse") == (True, None)
+
+
+@pytest.mark.parametrize("stored", [None, "", "plaintext", "md5$abc"])
+def test_unknown_hash_formats_never_verify(app, hashers, stored):
+    with app.app_context():
+        assert passwords.verify_password(stored, "plaintext") is False
+
+
+def test_login_upgrades_the_stored_hash(client, db, make_user, hashers, monkeypatch):
+    from app.models import User
+
+    user = make_user("member")
+    user.password = passwords.hash_password("secret-pass")
+    db.session.commit()
+    old = user.password
+
+    monkeypatch.setitem(hashers, "PASSWORD_PBKDF2_ITERATIONS", hashers["PASSWORD_PBKDF2_ITERATIONS"] + 1)
+    monkeypatch.setattr(passwords, "_hashers", {})
+    resp = client.post("/api/login", json={"phone": user.phone, "password": "secret-pass"})
+    assert resp.status_code == 200
+
+    db.session.expire_all()
+    assert db.session.get(User, user.id).password != old
@@ -0,0 +1,85 @@
+# tests/test_paystack_client.py
+
+import pytest
+import requests
+
+from app.paystack.client import CircuitOpenError, PaystackClient, PaystackError
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self._body = body if body is not None else {"status": True}
+
+    def json(self):
+        return self._body
+
+
+class ScriptedSession:
+    """Stands in for requests.Session: each call returns or raises the next scripted outcome."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+
+    def request(self, *args, **kwargs):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def tripped_client(*outcomes, reset=0):
+    client = PaystackClient(secret="sk_test", max_retries=0, backoff=0, breaker_threshold=1, breaker_reset=reset)
+    client.session = ScriptedSession(requests.ConnectionError("down"), *outcomes)
+    with pytest.raises(PaystackError):
+        client.list_banks()
+    return client
+
+
+@pytest.mark.parametrize("error", [
+    requests.TooManyRedirects("loop"),
+    requests.exceptions.ChunkedEncodingError("cut off"),
+    requests.exceptions.InvalidHeader("bad header"),
+])
+def test_any_requests_error_settles_the_half_open_trial(error):
+    client = tripped_client(error, FakeResponse())
+    breaker = client.breaker("bank")
+    assert breaker.state == "half_open"
+
+    with pytest.raises(PaystackError):
+        client.list_banks()
+    assert not breaker._trial_in_flight
+
+    assert client.list_banks() == {"status": True}
+    assert breaker.state == "closed"
+
+
+def test_unexpected_error_still_releases_the_trial():
+    client = tripped_client(RuntimeError("bug"), FakeResponse())
+    with pytest.raises(RuntimeError):
+        client.list_banks()
+    assert client.list_banks() == {"status": True}
+    assert client.breaker("bank").state == "closed"
+
+
+def test_open_circuit_refuses_fast():
+    client = tripped_client(reset=60)
+    with pytest.raises(CircuitOpenError):
+        client.list_banks()
+
+
+def test_retryable_status_is_retried_for_gets():
+    client = PaystackClient(secret="sk_test", max_retries=2, backoff=0)
+    client.session = ScriptedSession(FakeResponse(503), requests.Timeout("slow"), FakeResponse(body={"status": True, "data": []}))
+    assert client.list_banks() == {"status": True, "data": []}
+    assert client.breaker("bank").state == "closed"
+
+
+def test_verify_transfer_reports_a_missing_reference_as_none():
+    client = PaystackClient(secret="sk_test", max_retries=0, backoff=0)
+    client.session = ScriptedSession(
+        FakeResponse(404, {"status": False, "message": "Transfer not found"}),
+        FakeResponse(200, {"status": True, "data": {"status": "pending"}}),
+    )
+    assert client.verify_transfer("wd_1") is None
+    assert client.verify_transfer("wd_1")["data"]["status"] == "pending"
@@ -0,0 +1,53 @@
+# tests/test_paystack_webhooks.py
+
+from decimal import Decimal
+
+import pytest
+
+from app.models import PaystackEvent, Transaction, Wallet, Withdrawal
+from app.paystack.webhooks import process_pending_events, store_event
+from app.paystack.withdrawals import request_withdrawal
+
+
+@pytest.fixture
+def withdrawal(db, make_user):
+    user = make_user("payee", fiat="1000.00")
+    return request_withdrawal(user, Decimal("250.00"), "058", "0123456789")
+
+
+def deliver(event_type, withdrawal, amount_kobo):
+    assert store_event({"event": event_type, "data": {"reference": withdrawal.reference, "amount": amount_kobo}})
+    process_pending_events()
+
+
+def state(db, withdrawal):
+    db.session.expire_all()
+    wallet = Wallet.query.filter_by(user_id=withdrawal.user_id).one()
+    tx = Transaction.query.filter_by(reference=withdrawal.reference).one()
+    return wallet.fiat_balance, tx.status, db.session.get(Withdrawal, withdrawal.id).status
+
+
+def test_failed_transfer_refunds_the_stored_amount(db, withdrawal):
+    assert state(db, withdrawal)[0] == Decimal("750.00")
+    deliver("transfer.failed", withdrawal, 25000)
+    assert state(db, withdrawal) == (Decimal("1000.00"), "failed", Withdrawal.FAILED)
+
+
+def test_mismatched_amount_is_not_refunded(db, withdrawal):
+    deliver("transfer.failed", withdrawal, 9_999_900)
+    assert state(db, withdrawal)[0] == Decimal("750.00")
+    event = PaystackEvent.query.one()
+    assert event.status == "IGNORED"
+    assert "mismatch" in event.last_error
+
+
+def test_reversal_after_success_refunds_once(db, withdrawal):
+    deliver("transfer.success", withdrawal, 25000)
+    assert state(db, withdrawal) == (Decimal("750.00"), "successful", Withdrawal.SETTLED)
+
+    deliver("transfer.reversed", withdrawal, 25000)
+    assert state(db, withdrawal) == (Decimal("1000.00"), "reversed", Withdrawal.REVERSED)
+
+    # A late failure for the same transfer must not refund again
+    deliver("transfer.failed", withdrawal, 25000)
+    assert state(db, withdrawal)[0] == Decimal("1000.00")
@@ -0,0 +1,49 @@
+# tests/test_platform_metrics.py
+
+from decimal import Decimal
+
+from app.ledger import platform
+from app.models import PlatformMetric
+
+
+def test_reconcile_corrects_drift_as_increments(db, make_user):
+    for i in range(3):
+        make_user(f"member{i}")
+    assert platform.get_platform_metrics()[platform.TOTAL_USERS] == 3
+
+    db.session.execute(
+        db.update(PlatformMetric).where(PlatformMetric.name == platform.TOTAL_USERS)
+        .values(value=PlatformMetric.value + 5)
+    )
+    db.session.commit()
+
+    assert platform.reconcile_platform_metrics() == {platform.TOTAL_USERS: Decimal("-5")}
+    stored = platform.get_platform_metrics()
+    actual = platform.compute_platform_metrics()
+    assert {k: v for k, v in stored.items() if v} == {k: v for k, v in actual.items() if v}
+    assert platform.reconcile_platform_metrics() == {}
+
+
+def test_reconcile_keeps_writes_made_after_it(db, make_user):
+    make_user("first")
+    platform.reconcile_platform_metrics()
+    make_user("second")
+    assert platform.get_platform_metrics()[platform.TOTAL_USERS] == 2
+    assert platform.reconcile_platform_metrics() == {}
+
+
+def test_listing_status_change_on_an_expired_row_moves_the_count(db, make_user):
+    from app.models import ExchangeListing
+
+    seller = make_user("seller")
+    listing = ExchangeListing(seller_id=seller.id, block_amount=Decimal("5"), rate_per_block=Decimal("2"))
+    db.session.add(listing)
+    db.session.commit()
+
+    listing.status = "CANCELLED"   # expired by the commit; the old status isn't loaded
+    db.session.commit()
+
+    metrics = platform.get_platform_metrics()
+    assert metrics[platform.listings_metric("ACTIVE")] == 0
+    assert metrics[platform.listings_metric("CANCELLED")] == 1
+    assert platform.reconcile_platform_metrics() == {}
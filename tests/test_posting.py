@@ -0,0 +1,69 @@
+# tests/test_posting.py
+
+from decimal import Decimal
+
+import pytest
+
+from app.ledger import platform
+from app.ledger.posting import BURN, MINT, Entry, InsufficientFunds, PostingError, post
+from app.ledger.summaries import rebuild_summaries
+from app.models import BlockLedger, LedgerEntryType, LedgerSummary, Wallet
+
+
+def summaries():
+    return {row.user_id: dict(row.to_dict(), updated_at=None) for row in LedgerSummary.query}
+
+
+def balance(user):
+    return Wallet.query.filter_by(user_id=user.id).one().block_balance
+
+
+def test_journal_stamps_balances_and_keeps_rollups_in_step(db, make_user):
+    a, b = make_user("a"), make_user("b")
+    post([Entry(a.id, "50.00", "Initial allocation", LedgerEntryType.ALLOCATION), Entry(MINT, "-50.00")])
+    balances = post([
+        Entry(a.id, "-20.00", "Sent", LedgerEntryType.TRANSFER),
+        Entry(b.id, "15.00", "Received", LedgerEntryType.TRANSFER),
+        Entry(b.id, "5.00", "Received", LedgerEntryType.TRANSFER),
+    ], reference="order:1")
+    db.session.commit()
+
+    assert balances == {a.id: Decimal("30.00"), b.id: Decimal("20.00")}
+    legs = BlockLedger.query.filter_by(reference="order:1").order_by(BlockLedger.id).all()
+    assert [(leg.user_id, leg.balance_after) for leg in legs] == [
+        (a.id, Decimal("30.00")), (b.id, Decimal("15.00")), (b.id, Decimal("20.00")),
+    ]
+
+    incremental = summaries()
+    rebuild_summaries()
+    assert summaries() == incremental
+    assert platform.reconcile_platform_metrics() == {}
+
+
+@pytest.mark.parametrize("entries, message", [
+    ([Entry(1, "5.00")], "at least two legs"),
+    ([Entry(1, "5.00"), Entry(MINT, "-4.00")], "does not balance"),
+    ([Entry(1, "5.00"), Entry("VAULT", "-5.00")], "Unknown system account"),
+    ([Entry(1, "0"), Entry(MINT, "0")], "non-zero"),
+])
+def test_malformed_journal_is_refused(db, entries, message):
+    with pytest.raises(PostingError, match=message):
+        post(entries)
+
+
+def test_overdraft_changes_nothing_once_rolled_back(db, make_user):
+    a, b = make_user("a"), make_user("b")
+    post([Entry(a.id, "10.00", "Initial allocation", LedgerEntryType.ALLOCATION), Entry(MINT, "-10.00")])
+    db.session.commit()
+
+    with pytest.raises(InsufficientFunds):
+        post([
+            Entry(b.id, "25.00", "Received", LedgerEntryType.TRANSFER),
+            Entry(a.id, "-25.00", "Sent", LedgerEntryType.TRANSFER),
+        ])
+    db.session.rollback()
+
+    assert (balance(a), balance(b)) == (Decimal("10.00"), Decimal("0.00"))
+    assert BlockLedger.query.count() == 1
+    with pytest.raises(InsufficientFunds):
+        post([Entry(b.id, "-1.00", "Burned", LedgerEntryType.LISTING), Entry(BURN, "1.00")])
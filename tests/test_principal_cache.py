@@ -0,0 +1,36 @@
+# tests/test_principal_cache.py
+
+import time
+
+from app import cache
+from app.auth.views import invalidate_principal, load_principal, principal_cache
+from app.models import User
+
+
+def rename(db, user_id, name):
+    db.session.execute(db.update(User).where(User.id == user_id).values(name=name))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def test_invalidation_is_immediate_in_this_worker(db, make_user):
+    user_id = make_user("member").id
+    load_principal(user_id)
+
+    rename(db, user_id, "renamed")
+    invalidate_principal(user_id)
+    assert load_principal(user_id).name == "renamed"
+
+
+def test_other_workers_pick_up_an_edit_within_the_ttl(app, db, make_user, monkeypatch):
+    user_id = make_user("member").id
+    load_principal(user_id)
+    rename(db, user_id, "renamed")   # invalidated in the worker that made the edit, not this one
+
+    assert load_principal(user_id).name == "member"
+    db.session.expunge_all()
+
+    assert principal_cache.ttl == app.config["PRINCIPAL_CACHE_TTL"] <= 15
+    later = time.monotonic() + principal_cache.ttl
+    monkeypatch.setattr(cache.time, "monotonic", lambda: later)
+    assert load_principal(user_id).name == "renamed"
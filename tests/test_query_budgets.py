@@ -0,0 +1,154 @@
+# tests/test_query_budgets.py
+#
+# conftest profiles every request with budgets enforced, so any view over its
+# @query_budget raises QueryBudgetExceeded. These tests load each budgeted
+# endpoint with enough rows that an N+1 would show, and check a deliberate
+# N+1 is caught.
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify
+
+from app.models import ExchangeListing, Order, Product, Referral
+from app.pagination import iter_json_array, streamed_json
+from app import profiler
+from app.profiler import QueryBudgetExceeded, query_budget
+
+
+@pytest.fixture
+def market(db, make_user):
+    """Several sellers' products, listings and orders, and a referrer with referrals."""
+    sellers = [make_user(f"seller{i}") for i in range(6)]
+    buyer = make_user("buyer")
+    base = datetime(2026, 1, 1)
+    products = []
+    for i in range(24):
+        seller = sellers[i % len(sellers)]
+        products.append(Product(seller_id=seller.id, title=f"Product {i}", description="test product",
+                                price=Decimal(100 + i), category="technology", created_at=base + timedelta(hours=i)))
+        db.session.add(ExchangeListing(seller_id=seller.id, block_amount=Decimal(10), rate_per_block=Decimal(2)))
+    db.session.add_all(products)
+    db.session.flush()
+    for i, product in enumerate(products):
+        db.session.add(Order(product_id=product.id, buyer_id=buyer.id, seller_id=product.seller_id,
+                             price=product.price, status="COMPLETED", created_at=base + timedelta(hours=i)))
+    for i, seller in enumerate(sellers):
+        db.session.add(Referral(referrer_id=buyer.id, referred_id=seller.id, referral_code="CODE",
+                                created_at=base + timedelta(minutes=i)))
+    db.session.commit()
+    return {"sellers": sellers, "buyer": buyer}
+
+
+def last_profile(client, endpoint):
+    token = {"Authorization": f"Bearer {client.application.config['METRICS_TOKEN']}"}
+    return client.get("/debug/sql-profiles", query_string={"endpoint": endpoint}, headers=token).get_json()[0]
+
+
+BUDGETED = [
+    ("product.list_products", "/api/product/list?limit=50", None),
+    ("exchange.get_all_listings", "/api/exchange/listings", None),
+    ("product.my_orders", "/api/product/orders/mine?limit=50", "buyer"),
+    ("wallet.get_my_referrals", "/api/wallet/my_referrals", "buyer"),
+]
+
+
+def test_every_budgeted_endpoint_is_covered(app):
+    budgeted = {name for name, view in app.view_functions.items() if hasattr(view, "query_budget")}
+    assert budgeted == {endpoint for endpoint, _, _ in BUDGETED}
+
+
+@pytest.mark.parametrize("endpoint, path, as_user", BUDGETED)
+def test_budgeted_endpoints_stay_within_budget(app, client, auth_header, market, endpoint, path, as_user):
+    headers = auth_header(market[as_user]) if as_user else {}
+    resp = client.get(path, headers=headers)   # raises QueryBudgetExceeded if over
+    assert resp.status_code == 200
+    assert len(resp.get_json()) >= 4
+    resp.close()
+
+    profile = last_profile(client, endpoint)
+    assert profile["queries"] <= app.view_functions[endpoint].query_budget
+    assert profile["n_plus_one"] == []
+
+
+@query_budget(3)
+def listings_with_sellers():
+    """The N+1 get_all_listings avoids: one lazy load of the seller per listing."""
+    listings = ExchangeListing.query.all()
+    return jsonify([{"id": listing.id, "seller": listing.seller.name} for listing in listings])
+
+
+@query_budget(3)
+def streamed_listings_with_sellers():
+    listings = ExchangeListing.query.all()
+    return streamed_json(iter_json_array(listings, lambda listing: {"seller": listing.seller.name}))
+
+
+@pytest.fixture
+def n_plus_one_view(app, monkeypatch):
+    def install(view):
+        monkeypatch.setitem(app.view_functions, "exchange.get_all_listings", view)
+    return install
+
+
+def test_n_plus_one_is_detected_and_over_budget_raises(client, market, n_plus_one_view, app_logs):
+    n_plus_one_view(listings_with_sellers)
+
+    with pytest.raises(QueryBudgetExceeded, match="exchange.get_all_listings ran [0-9]+ queries \\(budget 3\\)"):
+        client.get("/api/exchange/listings")
+
+    profile = last_profile(client, "exchange.get_all_listings")
+    assert profile["queries"] > 3
+    [repeated] = profile["n_plus_one"]
+    assert "FROM users" in repeated["statement"]
+    assert repeated["count"] == len(market["sellers"])
+    assert any(r.getMessage() == "possible N+1" for r in app_logs.records)
+
+
+def test_streamed_n_plus_one_raises_when_the_body_is_done(client, market, n_plus_one_view):
+    n_plus_one_view(streamed_listings_with_sellers)
+
+    resp = client.get("/api/exchange/listings")
+    assert resp.status_code == 200
+    with pytest.raises(QueryBudgetExceeded):
+        resp.get_data()
+        resp.close()
+
+
+def test_budget_override_from_config(app, client, market, monkeypatch):
+    monkeypatch.setitem(app.config, "SQL_QUERY_BUDGETS", {"exchange.get_all_listings": 0})
+    with pytest.raises(QueryBudgetExceeded, match="budget 0"):
+        client.get("/api/exchange/listings")
+
+
+def test_profiles_need_the_metrics_token(client):
+    assert client.get("/debug/sql-profiles").status_code == 401
+    assert client.get("/debug/sql-profiles", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+
+def test_profiles_are_not_served_without_a_token(app):
+    bare = Flask(__name__)
+    bare.config.update(SQL_PROFILER="all", SQL_PROFILER_HISTORY=app.config["SQL_PROFILER_HISTORY"], METRICS_TOKEN=None)
+    profiler.init_app(bare)
+    assert "sql_profiles" not in bare.view_functions
+
+
+def test_failed_statement_does_not_skew_later_timings(app, db, client, market, monkeypatch):
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+
+    @query_budget(3)
+    def failing_then_listing():
+        with pytest.raises(DBAPIError):
+            db.session.execute(text("SELECT * FROM no_such_table"))
+        db.session.rollback()
+        return jsonify(len(ExchangeListing.query.all()))
+
+    monkeypatch.setitem(app.view_functions, "exchange.get_all_listings", failing_then_listing)
+    assert client.get("/api/exchange/listings").status_code == 200
+
+    profile = last_profile(client, "exchange.get_all_listings")
+    assert [s["count"] for s in profile["statements"]] == [1, 1]
+    with db.engine.connect() as connection:
+        assert not any(key.startswith("sql_profile") for key in connection.info)
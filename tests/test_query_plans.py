@@ -0,0 +1,135 @@
+# tests/test_query_plans.py
+#
+# The paged ledger, order and catalog queries must be served by the composite
+# indexes from the hot-lookup migration (and never sort in a temp B-tree). The
+# statements are captured from the real paging helpers and EXPLAINed as run.
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+from werkzeug.datastructures import MultiDict
+
+from app.ledger.views import query_ledger_page
+from app.models import BlockLedger, Order, Product, Referral
+from app.pagination import keyset_page
+from app.product.views import query_orders_page
+from app.wallet.referrals import query_referrals_page
+
+
+@contextmanager
+def captured(db):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def explain(db, statement, parameters):
+    """
+    The plan as one string. Postgres is told to avoid seq and bitmap scans,
+    which tiny test tables would favour; a sort then still shows up if no
+    index can produce the order.
+    """
+    conn = db.session.connection()
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        conn.exec_driver_sql("SET LOCAL enable_bitmapscan = off")
+        conn.exec_driver_sql("ANALYZE")
+        rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters)
+        return "\n".join(row[0] for row in rows)
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+    return "\n".join(row[-1] for row in rows)
+
+
+def plan_of(db, run, table):
+    """Run `run()` and return the plan of its first statement against `table`."""
+    with captured(db) as statements:
+        run()
+    statement, parameters = next(
+        (s, p) for s, p in statements if s.lstrip().upper().startswith("SELECT") and f"FROM {table}" in s
+    )
+    return explain(db, statement, parameters)
+
+
+def assert_index_scan(plan, index):
+    assert index in plan, plan
+    assert "TEMP B-TREE" not in plan, plan   # SQLite: the ORDER BY came from the index
+    assert "Sort" not in plan.split(index)[0], plan   # Postgres: no sort above the index scan
+
+
+@pytest.fixture
+def ledger_user(db, make_user):
+    user = make_user("ledger")
+    base = datetime(2026, 1, 1)
+    for i in range(30):
+        db.session.add(BlockLedger(
+            user_id=user.id, change=Decimal("1.00"), balance_after=Decimal(i + 1),
+            entry_type="mining" if i % 2 else "transfer", timestamp=base + timedelta(minutes=i),
+        ))
+    db.session.commit()
+    return user
+
+
+def test_ledger_page_uses_user_timestamp_index(db, ledger_user):
+    _, cursor = query_ledger_page(ledger_user.id, MultiDict({"limit": "10"}))
+    plan = plan_of(db, lambda: query_ledger_page(ledger_user.id, MultiDict({"limit": "10", "cursor": cursor})),
+                   "block_ledger")
+    assert_index_scan(plan, "ix_block_ledger_user_id_timestamp")
+
+
+def test_filtered_ledger_page_uses_entry_type_index(db, ledger_user):
+    plan = plan_of(db, lambda: query_ledger_page(ledger_user.id, MultiDict({"type": "mining"})), "block_ledger")
+    assert_index_scan(plan, "ix_block_ledger_user_id_entry_type_timestamp")
+
+
+def test_order_page_uses_role_index(db, make_user, products):
+    buyer = make_user("buyer")
+    base = datetime(2026, 2, 1)
+    for i in range(400):
+        product = products[i % len(products)]
+        db.session.add(Order(
+            product_id=product.id, buyer_id=buyer.id, seller_id=product.seller_id,
+            price=product.price, status="PENDING" if i % 20 == 0 else "COMPLETED",
+            created_at=base + timedelta(hours=i),
+        ))
+    db.session.commit()
+
+    plan = plan_of(db, lambda: query_orders_page(buyer.id, MultiDict({"role": "buyer"})), "orders")
+    assert_index_scan(plan, "ix_orders_buyer_id_created_at_id")
+
+    plan = plan_of(db, lambda: query_orders_page(buyer.id, MultiDict({"role": "buyer", "status": "pending"})),
+                   "orders")
+    assert_index_scan(plan, "ix_orders_buyer_id_status_created_at")
+
+
+def test_catalog_pages_use_created_at_indexes(db, products):
+    columns = [Product.created_at, Product.id]
+    _, cursor = keyset_page(Product.query, columns, limit=5)
+
+    plan = plan_of(db, lambda: keyset_page(Product.query, columns, cursor=cursor, limit=5), "products")
+    assert_index_scan(plan, "ix_products_created_at_id")
+
+    by_category = Product.query.filter(Product.category == "technology")
+    plan = plan_of(db, lambda: keyset_page(by_category, columns, cursor=cursor, limit=5), "products")
+    assert_index_scan(plan, "ix_products_category_created_at_id")
+
+
+def test_referral_page_uses_referrer_index(db, make_user):
+    referrer = make_user("referrer")
+    for i in range(12):
+        referred = make_user(f"referred{i}")
+        db.session.add(Referral(referrer_id=referrer.id, referred_id=referred.id, referral_code="CODE",
+                                created_at=datetime(2026, 3, 1) + timedelta(minutes=i // 4)))
+    db.session.commit()
+
+    plan = plan_of(db, lambda: query_referrals_page(referrer.id, MultiDict({"limit": "5"})), "referrals")
+    assert_index_scan(plan, "ix_referrals_referrer_id_created_at_id")
@@ -0,0 +1,80 @@
+# tests/test_realtime.py
+
+import pytest
+
+from app import realtime
+from app.models import Wallet
+from app.wallet.service import credit_fiat
+
+
+@pytest.fixture
+def emitted(db, monkeypatch):
+    sent = []
+    monkeypatch.setattr(realtime.socketio, "emit", lambda name, payload, to: sent.append((name, payload, to)))
+    return sent
+
+
+def test_events_wait_for_commit_and_drop_on_rollback(db, emitted):
+    realtime.queue_event("ping", {"n": 1}, "room")
+    db.session.execute(db.select(Wallet.id))
+    assert emitted == []
+    db.session.rollback()
+    db.session.commit()
+    assert emitted == []
+
+    realtime.queue_event("ping", {"n": 2}, "room")
+    db.session.commit()
+    assert emitted == [("ping", {"n": 2}, "room")]
+
+
+def test_savepoint_rollback_drops_only_its_events(db, emitted):
+    db.session.execute(db.select(Wallet.id))
+    realtime.queue_event("outer", {}, "room")
+    with pytest.raises(RuntimeError):
+        with db.session.begin_nested():
+            realtime.queue_event("inner", {}, "room")
+            with db.session.begin_nested():
+                realtime.queue_event("innermost", {}, "room")
+            raise RuntimeError
+    with db.session.begin_nested():
+        realtime.queue_event("released", {}, "room")
+    assert emitted == []   # releasing a savepoint is not the commit
+    db.session.commit()
+
+    assert [name for name, _, _ in emitted] == ["outer", "released"]
+
+
+def test_released_savepoint_events_drop_with_the_outer_rollback(db, emitted):
+    db.session.execute(db.select(Wallet.id))
+    with db.session.begin_nested():
+        realtime.queue_event("inner", {}, "room")
+    db.session.rollback()
+    db.session.commit()
+    assert emitted == []
+
+
+def test_rolled_back_savepoint_does_not_leak_into_a_coalesced_balance(db, emitted, make_user):
+    user = make_user("member")
+    emitted.clear()
+
+    credit_fiat(user.id, 100)
+    with pytest.raises(RuntimeError):
+        with db.session.begin_nested():
+            credit_fiat(user.id, 50)
+            raise RuntimeError
+    db.session.commit()
+
+    assert emitted == [("wallet.balance", {"fiat_balance": "100.00"}, realtime.user_room(user.id))]
+
+
+def test_failed_push_is_logged_not_raised(db, monkeypatch, app_logs):
+    def refuse(*args, **kwargs):
+        raise ConnectionError("message queue is down")
+
+    monkeypatch.setattr(realtime.socketio, "emit", refuse)
+    realtime.queue_event("ping", {}, "room")
+    db.session.commit()
+
+    [record] = [r for r in app_logs.records if r.name == "app.realtime"]
+    assert (record.event, record.room) == ("ping", "room")
+    assert record.exc_info[0] is ConnectionError
@@ -0,0 +1,32 @@
+# tests/test_referrals.py
+
+from app.models import Referral, ReferralStat
+from app.wallet import referrals
+
+
+def stats():
+    return {row.referrer_id: (row.referral_count, row.rewarded_count, row.reward_total)
+            for row in ReferralStat.query}
+
+
+def test_stats_match_a_rebuild_and_a_reward_is_counted_once(db, make_user):
+    referrer, other = make_user("referrer"), make_user("other")
+    invited = [make_user(f"invited{i}") for i in range(4)]
+    rows = [Referral(referrer_id=referrer.id, referred_id=user.id, referral_code="CODE") for user in invited[:3]]
+    rows.append(Referral(referrer_id=other.id, referred_id=invited[3].id, referral_code="OTHER",
+                         rewarded=True, bonus_amount=2.5))
+    db.session.add_all(rows)
+    db.session.commit()
+
+    assert referrals.mark_rewarded(rows[0], "5")
+    assert not referrals.mark_rewarded(rows[0], "5")   # a concurrent request already rewarded it
+    db.session.commit()
+    db.session.delete(rows[2])
+    db.session.commit()
+
+    incremental = stats()
+    assert {k: (c, r, str(t)) for k, (c, r, t) in incremental.items()} == {
+        referrer.id: (2, 1, "5.00"), other.id: (1, 1, "2.50"),
+    }
+    referrals.rebuild_referral_stats()
+    assert stats() == incremental
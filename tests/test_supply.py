@@ -0,0 +1,72 @@
+# tests/test_supply.py
+
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func
+
+from app.ledger import supply
+from app.ledger.platform import MINTING_TYPES
+from app.models import BlockLedger, LedgerEntryType, ReconciledBalance, Wallet
+from app.wallet.service import credit_blocks, debit_blocks, transfer_blocks
+
+
+@pytest.fixture
+def reconcile_now(app, monkeypatch):
+    monkeypatch.setitem(app.config, "SUPPLY_RECONCILE_LAG_SECONDS", 0)
+    monkeypatch.setitem(app.config, "SUPPLY_RECONCILE_BATCH_SIZE", 3)
+
+
+@pytest.fixture
+def economy(db, make_user):
+    """Allocations, a referral reward, mining, transfers and a listing burn, as the ledger records them."""
+    users = [make_user(f"member{i}") for i in range(3)]
+    a, b, c = (user.id for user in users)
+    for user_id in (a, b, c):
+        credit_blocks(user_id, "100.00", "Initial allocation", LedgerEntryType.ALLOCATION)
+    credit_blocks(a, "5.00", "Referral reward", LedgerEntryType.REFERRAL)
+    credit_blocks(b, "2.50", "Platform mining reward", LedgerEntryType.MINING)
+    transfer_blocks(a, b, "30.00", "Sent", "Received")
+    transfer_blocks(b, c, "12.25", "Sent", "Received")
+    debit_blocks(c, "7.00", "Listed 7 blocks", LedgerEntryType.LISTING)
+    db.session.commit()
+    return users
+
+
+def rebuilt_balances(db):
+    """Per-user ledger sums, recomputed from scratch."""
+    return dict(db.session.query(BlockLedger.user_id, func.sum(BlockLedger.change)).group_by(BlockLedger.user_id))
+
+
+def test_incremental_reconcile_matches_a_rebuild(db, economy, reconcile_now):
+    result = supply.reconcile_supply(max_batches=2)   # stops part-way
+    assert 0 < result["last_ledger_id"] < db.session.query(func.max(BlockLedger.id)).scalar()
+
+    result = supply.reconcile_supply()
+    assert result["last_ledger_id"] == db.session.query(func.max(BlockLedger.id)).scalar()
+    assert result["entries_folded"] == BlockLedger.query.count()
+
+    ledger_total = db.session.query(func.sum(BlockLedger.change)).scalar()
+    minted = db.session.query(func.sum(BlockLedger.change)).filter(BlockLedger.entry_type.in_(MINTING_TYPES)).scalar()
+    assert Decimal(result["ledger_total"]) == ledger_total == Decimal("300.50")
+    assert Decimal(result["minted_total"]) == minted == Decimal("307.50")
+    assert Decimal(result["circulating_drift"]) == 0
+    assert Decimal(result["minted_drift"]) == 0
+    assert result["wallets_drifting"] == 0
+
+    reconciled = {row.user_id: row.ledger_balance for row in ReconciledBalance.query}
+    assert reconciled == rebuilt_balances(db)
+    assert reconciled == {w.user_id: w.block_balance for w in Wallet.query}
+
+
+def test_reconcile_flags_a_wallet_edited_outside_the_ledger(db, economy, reconcile_now):
+    supply.reconcile_supply()
+    tampered = economy[0].id
+    db.session.execute(db.update(Wallet).where(Wallet.user_id == tampered).values(block_balance=Wallet.block_balance + 1))
+    credit_blocks(tampered, "1.00", "Platform mining reward", LedgerEntryType.MINING)   # so the wallet is re-checked
+    db.session.commit()
+
+    result = supply.reconcile_supply()
+    assert result["wallets_drifting"] == 1
+    assert Decimal(result["wallet_drift_total"]) == Decimal("1.00")
+    assert [(row.user_id, row.drift) for row in supply.drifting_wallets(10)] == [(tampered, Decimal("1.00"))]
@@ -0,0 +1,211 @@
+# tests/test_wallet_concurrency.py
+#
+# Threaded stress tests for the conditional-UPDATE ledger and the exchange
+# settlement. Only meaningful with real row locks, so they need
+# TEST_DATABASE_URL pointing at Postgres. Every thread has its own app context
+# (and so its own session and connection); a monitor thread watches for a
+# negative balance ever becoming visible while they run.
+
+import random
+import threading
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, or_, select
+
+from app.exchange import matching
+from app.exchange.orderbook import OrderBook
+from app.ledger.posting import ESCROW
+from app.models import BlockLedger, ExchangeListing, ExchangeTx, LedgerEntryType, PlatformAccount, Wallet
+from app.wallet.service import WalletError, credit_blocks, debit_blocks, transfer_blocks
+
+
+@pytest.fixture
+def pg(db):
+    if db.engine.dialect.name != "postgresql":
+        pytest.skip("needs TEST_DATABASE_URL on PostgreSQL (row locks)")
+    return db
+
+
+def run_concurrently(app, db, workers):
+    """
+    Start every worker together, each in its own app context, while a monitor
+    polls for negative balances. Returns the negative balances it saw.
+    """
+    start = threading.Barrier(len(workers) + 1)
+    done = threading.Event()
+    errors, negatives = [], []
+
+    def run(worker):
+        with app.app_context():
+            try:
+                start.wait()
+                worker()
+            except BaseException as e:   # surfaced in the main thread below
+                errors.append(e)
+                db.session.rollback()
+
+    def monitor():
+        with app.app_context():
+            start.wait()
+            while not done.is_set():
+                negatives.extend(db.session.execute(
+                    select(Wallet.user_id, Wallet.block_balance, Wallet.fiat_balance)
+                    .where(or_(Wallet.block_balance < 0, Wallet.fiat_balance < 0))
+                ).all())
+                db.session.rollback()
+
+    threads = [threading.Thread(target=run, args=(worker,)) for worker in workers]
+    watcher = threading.Thread(target=monitor)
+    for thread in threads + [watcher]:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=120)
+    done.set()
+    watcher.join(timeout=10)
+
+    assert not any(thread.is_alive() for thread in threads), "a worker is stuck (lock wait?)"
+    if errors:
+        raise errors[0]
+    return negatives
+
+
+def assert_balances_match_ledger(db):
+    db.session.expire_all()
+    sums = dict(db.session.query(BlockLedger.user_id, func.sum(BlockLedger.change)).group_by(BlockLedger.user_id))
+    for wallet in Wallet.query:
+        assert wallet.block_balance >= 0
+        assert wallet.fiat_balance >= 0
+        assert wallet.block_balance == sums.get(wallet.user_id, 0), wallet.user_id
+
+    # balance_after on each wallet's last leg is the balance it ended with
+    for wallet in Wallet.query:
+        last = (BlockLedger.query.filter_by(user_id=wallet.user_id)
+                .order_by(BlockLedger.id.desc()).first())
+        if last is not None:
+            assert last.balance_after == wallet.block_balance
+
+
+def funded_members(db, make_user, count, blocks="0", fiat="0"):
+    users = [make_user(f"member{i}", fiat=fiat) for i in range(count)]
+    for user in users:
+        if Decimal(blocks):
+            credit_blocks(user.id, blocks, "Seed", LedgerEntryType.ALLOCATION)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+def test_parallel_debits_and_transfers_keep_the_ledger_balanced(app, pg, make_user):
+    member_ids = funded_members(pg, make_user, 4, blocks="100")
+
+    def worker(seed):
+        rng = random.Random(seed)
+
+        def work():
+            for _ in range(40):
+                amount = Decimal(rng.randint(1, 40))
+                sender, receiver = rng.sample(member_ids, 2)
+                try:
+                    if rng.random() < 0.2:
+                        debit_blocks(sender, amount, "Burn", LedgerEntryType.TRANSFER)
+                    else:
+                        transfer_blocks(sender, receiver, amount, "Sent", "Received")
+                    pg.session.commit()
+                except WalletError:
+                    pg.session.rollback()
+        return work
+
+    negatives = run_concurrently(app, pg, [worker(seed) for seed in range(8)])
+
+    assert negatives == []
+    assert_balances_match_ledger(pg)
+    burned = -pg.session.query(func.sum(BlockLedger.change)).filter(BlockLedger.reason == "Burn").scalar()
+    total = pg.session.query(func.sum(Wallet.block_balance)).scalar()
+    assert total + (burned or 0) == Decimal("400")
+
+
+def list_blocks(seller_id, quantity, rate):
+    """What POST /exchange/list does: escrow the blocks, then record the listing."""
+    debit_blocks(seller_id, quantity, f"Listed {quantity} blocks for sale",
+                 LedgerEntryType.LISTING, sink=ESCROW)
+    return ExchangeListing(seller_id=seller_id, block_amount=Decimal(quantity), rate_per_block=Decimal(rate),
+                           min_purchase=Decimal(0), max_purchase=Decimal(0))
+
+
+def other_worker_buy(buyer_id, quantity):
+    """A buy settled from a freshly loaded book, as another worker process would."""
+    book = OrderBook()
+    for listing in ExchangeListing.query.filter_by(status="ACTIVE"):
+        book.add(matching.ask_from_listing(listing))
+    fills = book.match(Decimal(quantity), exclude_seller=buyer_id)
+    if not fills:
+        raise matching.MatchError("No listings match this order")
+    return matching._settle(buyer_id, fills)
+
+
+def test_parallel_buys_settle_each_block_once(app, pg, make_user, monkeypatch):
+    seller_ids = funded_members(pg, make_user, 3, blocks="200")
+    buyer_ids = funded_members(pg, make_user, 5, fiat="3000")
+    rng = random.Random(7)
+    for seller_id in seller_ids:
+        for _ in range(4):
+            pg.session.add(list_blocks(seller_id, rng.randint(5, 40), rng.choice([10, 11, 12, 15])))
+    pg.session.commit()
+    escrowed = pg.session.query(func.sum(ExchangeListing.block_amount)).scalar()
+    fiat_before = pg.session.query(func.sum(Wallet.fiat_balance)).scalar()
+
+    reloads = []
+    reload = matching._reload
+    monkeypatch.setattr(matching, "_reload", lambda ids: (reloads.append(set(ids)), reload(ids)))
+
+    # This worker's book is loaded, then another worker takes the whole best
+    # listing: the first buy here must hit _StaleBook and match again.
+    matching.rebuild_book()
+    best = matching.book.best()
+    other_worker_buy(buyer_ids[0], best.remaining)
+    assert pg.session.get(ExchangeListing, best.id).status == "COMPLETED"
+
+    def buyer(buyer_id, seed, settle):
+        rng = random.Random(seed)
+
+        def work():
+            for _ in range(15):
+                try:
+                    settle(buyer_id, Decimal(rng.randint(1, 25)))
+                except matching.MatchError:
+                    pg.session.rollback()
+                    return
+                except WalletError:
+                    pg.session.rollback()
+        return work
+
+    def settle_elsewhere(buyer_id, quantity):
+        try:
+            other_worker_buy(buyer_id, quantity)
+        except matching._StaleBook:
+            pg.session.rollback()
+
+    workers = [buyer(buyer_id, seed, lambda b, q: matching.buy(b, q)) for seed, buyer_id in enumerate(buyer_ids)]
+    workers += [buyer(buyer_id, 100 + seed, settle_elsewhere) for seed, buyer_id in enumerate(buyer_ids[:2])]
+    negatives = run_concurrently(app, pg, workers)
+
+    assert negatives == []
+    assert any(best.id in ids for ids in reloads), "the stale ask was never reloaded"
+    assert_balances_match_ledger(pg)
+
+    # Every escrowed block is either still listed or with exactly one buyer
+    sold = dict(pg.session.query(ExchangeTx.listing_id, func.sum(ExchangeTx.block_value)).group_by(ExchangeTx.listing_id))
+    for listing in ExchangeListing.query:
+        assert listing.filled_amount == sold.get(listing.id, 0)
+        assert 0 <= listing.filled_amount <= listing.block_amount
+        assert (listing.status == "COMPLETED") == (listing.filled_amount == listing.block_amount)
+    bought = pg.session.query(func.sum(BlockLedger.change)).filter(BlockLedger.user_id.in_(buyer_ids)).scalar()
+    assert len(sold) > 1
+    assert bought == sum(sold.values())
+    assert escrowed == sum(sold.values()) + sum(l.remaining_amount for l in ExchangeListing.query)
+
+    # Naira only moved between members and the platform fee account
+    fiat_after = pg.session.query(func.sum(Wallet.fiat_balance)).scalar()
+    fees = pg.session.get(PlatformAccount, 1).fiat_balance
+    assert fiat_after + fees == fiat_before
+    assert fees == pg.session.query(func.sum(ExchangeTx.admin_fee)).scalar()
@@ -0,0 +1,184 @@
+# tests/test_withdrawals.py
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.models import Transaction, User, Wallet, Withdrawal
+from app.paystack import withdrawals
+from app.paystack.client import PaystackError, paystack
+from app.paystack.withdrawals import advance_withdrawal, request_withdrawal, stalled_withdrawal_ids
+
+DUPLICATE = {"status": False, "message": "Duplicate Transaction Reference"}
+
+
+@pytest.fixture
+def withdrawal(db, make_user):
+    user = make_user("payee", fiat="1000.00")
+    withdrawal = request_withdrawal(user, Decimal("250.00"), "058", "0123456789")
+    withdrawal.status = Withdrawal.RECIPIENT_READY
+    withdrawal.recipient_code = "RCP_1"
+    withdrawal.account_name = "Ada Obi"
+    db.session.commit()
+    return withdrawal
+
+
+@pytest.fixture
+def transfers(monkeypatch):
+    """Script Paystack's answers to the transfer and verify calls."""
+    script = {"initiate": [], "verify": []}
+
+    def answer(name):
+        outcome = script[name].pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(paystack, "initiate_transfer", lambda payload: answer("initiate"))
+    monkeypatch.setattr(paystack, "verify_transfer", lambda reference: answer("verify"))
+    return script
+
+
+def state(db, withdrawal):
+    db.session.expire_all()
+    wallet = Wallet.query.filter_by(user_id=withdrawal.user_id).one()
+    tx = Transaction.query.filter_by(reference=withdrawal.reference).one()
+    return wallet.fiat_balance, tx.status, db.session.get(Withdrawal, withdrawal.id).status
+
+
+def test_duplicate_reference_waits_for_the_webhook_instead_of_refunding(db, withdrawal, transfers):
+    # An earlier attempt timed out after Paystack had accepted it
+    transfers["initiate"].append(DUPLICATE)
+    transfers["verify"].append({"status": True, "data": {"status": "pending", "transfer_code": "TRF_1"}})
+
+    assert advance_withdrawal(withdrawal.id) == Withdrawal.TRANSFER_SENT
+    assert state(db, withdrawal) == (Decimal("750.00"), "pending", Withdrawal.TRANSFER_SENT)
+    assert db.session.get(Withdrawal, withdrawal.id).transfer_code == "TRF_1"
+
+
+def test_refused_transfer_is_refunded_when_paystack_has_none(db, withdrawal, transfers):
+    transfers["initiate"].append({"status": False, "message": "Insufficient balance"})
+    transfers["verify"].append(None)
+
+    assert advance_withdrawal(withdrawal.id) == Withdrawal.FAILED
+    assert state(db, withdrawal) == (Decimal("1000.00"), "failed", Withdrawal.FAILED)
+
+
+def test_refused_transfer_that_cannot_be_verified_is_retried(db, withdrawal, transfers):
+    transfers["initiate"].append(DUPLICATE)
+    transfers["verify"].append({"status": False, "message": "Invalid key"})
+
+    with pytest.raises(PaystackError):
+        advance_withdrawal(withdrawal.id)
+    assert state(db, withdrawal) == (Decimal("750.00"), "pending", Withdrawal.RECIPIENT_READY)
+
+
+# -------------------------------------------------
+# Recipient step, retries and the stall sweep
+# -------------------------------------------------
+
+@pytest.fixture
+def requested(db, make_user):
+    user = make_user("payee", fiat="1000.00")
+    return request_withdrawal(user, Decimal("250.00"), "058", "0123456789")
+
+
+@pytest.fixture
+def recipients(monkeypatch):
+    """Script account resolution and recipient creation; counts recipient creations."""
+    script = {"resolve": [], "create": []}
+
+    def answer(name):
+        outcome = script[name].pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(withdrawals, "resolve_account", lambda account_number, bank_code: answer("resolve"))
+    monkeypatch.setattr(paystack, "create_transfer_recipient", lambda payload: answer("create"))
+    return script
+
+
+RESOLVED = {"status": True, "data": {"account_name": "Ada Obi"}}
+RECIPIENT = {"status": True, "data": {"recipient_code": "RCP_1"}}
+ACCEPTED = {"status": True, "data": {"status": "pending", "transfer_code": "TRF_1"}}
+
+
+def test_withdrawal_runs_to_transfer_sent_and_reuses_the_recipient(db, make_user, requested, recipients, transfers):
+    recipients["resolve"].append(RESOLVED)
+    recipients["create"].append(RECIPIENT)
+    transfers["initiate"].append(ACCEPTED)
+
+    assert advance_withdrawal(requested.id) == Withdrawal.TRANSFER_SENT
+    saga = db.session.get(Withdrawal, requested.id)
+    assert (saga.recipient_code, saga.account_name, saga.transfer_code) == ("RCP_1", "Ada Obi", "TRF_1")
+    assert state(db, requested) == (Decimal("750.00"), "pending", Withdrawal.TRANSFER_SENT)
+
+    # Same account again: no second resolve/create call (the scripts are empty)
+    again = request_withdrawal(db.session.get(User, saga.user_id), Decimal("100.00"), "058", "0123456789")
+    transfers["initiate"].append(ACCEPTED)
+    assert advance_withdrawal(again.id) == Withdrawal.TRANSFER_SENT
+
+
+def test_unresolvable_account_fails_and_refunds_once(db, requested, recipients):
+    recipients["resolve"].append({"status": False, "message": "Could not resolve account name"})
+
+    assert advance_withdrawal(requested.id) == Withdrawal.FAILED
+    assert state(db, requested) == (Decimal("1000.00"), "failed", Withdrawal.FAILED)
+
+    # Re-running a finished withdrawal (e.g. from a duplicate task) changes nothing
+    assert advance_withdrawal(requested.id) == Withdrawal.FAILED
+    assert state(db, requested)[0] == Decimal("1000.00")
+
+
+def test_recipient_step_retries_then_fails_after_max_attempts(app, db, requested, recipients, monkeypatch):
+    monkeypatch.setitem(app.config, "WITHDRAWAL_MAX_ATTEMPTS", 3)
+    recipients["resolve"].extend([PaystackError("timed out")] * 3)
+
+    for attempt in (1, 2):
+        with pytest.raises(PaystackError):
+            advance_withdrawal(requested.id)
+        saga = db.session.get(Withdrawal, requested.id)
+        assert (saga.status, saga.attempts, saga.last_error) == (Withdrawal.REQUESTED, attempt, "timed out")
+        assert state(db, requested)[0] == Decimal("750.00")
+
+    assert advance_withdrawal(requested.id) == Withdrawal.FAILED
+    assert state(db, requested) == (Decimal("1000.00"), "failed", Withdrawal.FAILED)
+
+
+def test_transfer_step_is_never_auto_failed(app, db, withdrawal, transfers, monkeypatch):
+    monkeypatch.setitem(app.config, "WITHDRAWAL_MAX_ATTEMPTS", 2)
+    transfers["initiate"].extend([PaystackError("read timed out")] * 4)
+
+    for _ in range(4):
+        with pytest.raises(PaystackError):
+            advance_withdrawal(withdrawal.id)
+    assert db.session.get(Withdrawal, withdrawal.id).attempts == 4
+    assert state(db, withdrawal) == (Decimal("750.00"), "pending", Withdrawal.RECIPIENT_READY)
+
+    # The retry finds Paystack accepted one of the timed-out attempts
+    transfers["initiate"].append(DUPLICATE)
+    transfers["verify"].append(ACCEPTED)
+    assert advance_withdrawal(withdrawal.id) == Withdrawal.TRANSFER_SENT
+    saga = db.session.get(Withdrawal, withdrawal.id)
+    assert saga.attempts == 0
+    assert state(db, withdrawal) == (Decimal("750.00"), "pending", Withdrawal.TRANSFER_SENT)
+
+
+def test_sweep_picks_up_only_stalled_in_flight_withdrawals(app, db, make_user):
+    user = make_user("payee", fiat="1000.00")
+    old = datetime.utcnow() - timedelta(seconds=app.config["WITHDRAWAL_STALE_SECONDS"] + 1)
+    made = {}
+    for status in (Withdrawal.REQUESTED, Withdrawal.RECIPIENT_READY, Withdrawal.TRANSFER_SENT, Withdrawal.FAILED):
+        made[status] = request_withdrawal(user, Decimal("10.00"), "058", "0123456789")
+        made[status].status = status
+    fresh = request_withdrawal(user, Decimal("10.00"), "058", "0123456789")
+    db.session.flush()
+    db.session.execute(
+        db.update(Withdrawal).where(Withdrawal.id.in_([w.id for w in made.values()])).values(updated_at=old)
+    )
+    db.session.commit()
+
+    assert stalled_withdrawal_ids() == [made[Withdrawal.REQUESTED].id, made[Withdrawal.RECIPIENT_READY].id]
+    assert fresh.id not in stalled_withdrawal_ids()